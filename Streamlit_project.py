@@ -1,669 +1,1017 @@
+import json
+import time
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 
+from ativos import carregar_ativos, html_imagem
+from busca import termos_busca
+from ingestao import BaseCompartilhada, CargaProgressiva, deltas_pendentes
+from cache_resultados import CacheLRU, chave_filtros
+from consultas import (colunas_padrao, consultar_cidades, consultar_paises, consultar_principal, margens_aproximadas,
+                       nota_corte)
+from graficos import FabricaGraficos
+from instrumentacao import HistoricoPerfis, PerfilRerun
+from particionado import BaseParticionada, modo_dados
+from ranking import tamanho_ranking, topo
+
+# Copy-on-Write: views do dataset compartilhado não copiam dados e nunca o
+# alteram (já é o comportamento padrão a partir do pandas 3)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
 # Configuração da página
 st.set_page_config(
     page_title="Dashboard Rango Serpa",
     initial_sidebar_state="expanded"
 )
 
-# Função para padronizar culinárias
-def padronizar_culinarias(df):
-    """
-    Padroniza os nomes das culinárias para melhor análise:
-    1. Padroniza nomes (ex: sempre usar "Italian" como base)
-    2. Separa estilos múltiplos e conta individualmente
-    3. Agrupa por culinária principal
-    """
-    
-    # Dicionário de padronização de nomes
-    padronizacao = {
-        # Culinárias italianas
-        'Italian': 'Italian',
-        'Pizza': 'Italian',
-        'Pasta': 'Italian',
-        'Mediterranean': 'Italian',
-        
-        # Culinárias asiáticas
-        'Chinese': 'Chinese',
-        'Japanese': 'Japanese',
-        'Thai': 'Thai',
-        'Korean': 'Korean',
-        'Vietnamese': 'Vietnamese',
-        'Asian': 'Asian',
-        
-        # Culinárias indianas
-        'Indian': 'Indian',
-        'North Indian': 'Indian',
-        'South Indian': 'Indian',
-        'Mughlai': 'Indian',
-        'Hyderabadi': 'Indian',
-        
-        # Culinárias americanas
-        'American': 'American',
-        'Mexican': 'Mexican',
-        'BBQ': 'American',
-        'Burgers': 'American',
-        'Steakhouse': 'American',
-        
-        # Culinárias europeias
-        'French': 'French',
-        'German': 'German',
-        'Spanish': 'Spanish',
-        'Greek': 'Greek',
-        'Turkish': 'Turkish',
-        
-        # Fast Food e outras
-        'Fast Food': 'Fast Food',
-        'Street Food': 'Street Food',
-        'Cafe': 'Cafe',
-        'Bakery': 'Bakery',
-        'Desserts': 'Desserts',
-        'Ice Cream': 'Desserts',
-        
-        # Culinárias específicas
-        'Seafood': 'Seafood',
-        'Vegetarian': 'Vegetarian',
-        'Vegan': 'Vegetarian',
-        'Halal': 'Halal',
-        'Kosher': 'Kosher'
-    }
-    
-    # Criar cópia do dataframe
-    df_padronizado = df.copy()
-    
-    # Lista para armazenar todas as culinárias individuais
-    todas_culinarias = []
-    
-    # Processar cada linha
-    for idx, row in df_padronizado.iterrows():
-        cuisines_str = str(row['Cuisines'])
-        
-        # Pular valores nulos ou vazios
-        if pd.isna(cuisines_str) or cuisines_str in ['nan', 'NaN', 'None', '', 'Não especificado']:
-            todas_culinarias.append(['Não especificado'])
-            continue
-        
-        # Separar culinárias múltiplas (separadas por vírgula)
-        cuisines_list = [c.strip() for c in cuisines_str.split(',')]
-        
-        # Padronizar cada culinária individual
-        cuisines_padronizadas = []
-        for cuisine in cuisines_list:
-            cuisine = cuisine.strip()
-            if cuisine:
-                # Aplicar padronização se existir no dicionário
-                if cuisine in padronizacao:
-                    cuisines_padronizadas.append(padronizacao[cuisine])
-                else:
-                    # Se não estiver no dicionário, manter o nome original
-                    cuisines_padronizadas.append(cuisine)
-        
-        todas_culinarias.append(cuisines_padronizadas)
-    
-    # Adicionar colunas com culinárias padronizadas
-    df_padronizado['Cuisines_Padronizadas'] = todas_culinarias
-    df_padronizado['Cuisine_Principal'] = [cuisines[0] if cuisines else 'Não especificado' for cuisines in todas_culinarias]
-    df_padronizado['Total_Cuisines'] = [len(cuisines) for cuisines in todas_culinarias]
-    
-    return df_padronizado
-
 # Função para carregar dados
-@st.cache_data
-def load_data():
-    df = pd.read_csv('dataset_atualizado.csv')
-    # Converter colunas numéricas
-    df['Aggregate rating'] = pd.to_numeric(df['Aggregate rating'], errors='coerce')
-    df['Price range'] = pd.to_numeric(df['Price range'], errors='coerce')
-    df['Average Cost for two'] = pd.to_numeric(df['Average Cost for two'], errors='coerce')
-    df['Votes'] = pd.to_numeric(df['Votes'], errors='coerce')
-    
-    # CORREÇÃO CRÍTICA: Limpar dados da coluna Cuisines
-    # Remover valores NaN e converter tudo para string
-    df['Cuisines'] = df['Cuisines'].fillna('Não especificado').astype(str)
-    # Remover valores vazios ou apenas espaços
-    df['Cuisines'] = df['Cuisines'].replace(['', 'nan', 'NaN', 'None'], 'Não especificado')
-    # Remover espaços em branco no início e fim
-    df['Cuisines'] = df['Cuisines'].str.strip()
-    
-    # CORREÇÃO AUTOMÁTICA DOS NOMES DAS CIDADES
-    df['City'] = df['City'].fillna('').astype(str)
-    
-    # Corrigir nomes de cidades corrompidas
-    city_corrections = {
-        'Brasí_lia': 'Brasília',
-        'Sí£o Paulo': 'São Paulo',
-        'Sí£o paulo': 'São Paulo',
-        'Sí£o paulo': 'São Paulo',
-        'Brasí_lia': 'Brasília',
-        'Brasí_lia': 'Brasília'
-    }
-    
-    # Aplicar correções
-    for wrong_name, correct_name in city_corrections.items():
-        df.loc[df['City'] == wrong_name, 'City'] = correct_name
-    
-    # Limpar dados da coluna City (remover valores nulos)
-    df = df.dropna(subset=['City'])
-    
-    # APLICAR PADRONIZAÇÃO DE CULINÁRIAS
-    df = padronizar_culinarias(df)
-    
-    return df
-
-# Carregar dados
-df = load_data()
-
-# Sidebar com logo
-st.sidebar.image('img/img1.png', width=200)
-
-# Navegação entre páginas
-page = st.sidebar.selectbox(
-    "📱 Navegação",
-    ["Página Principal", "Países", "Cidades"]
-)
+# cache_resource: uma única cópia em memória, compartilhada por todas as
+# sessões (o cache_data entregaria uma cópia desserializada a cada rerun).
+# A base reúne o dataset limpo, os índices dos filtros, da busca e do mapa
+# e o cubo de agregados, todos da mesma versão; os deltas da pasta deltas/
+# são aplicados por cima sem reconstruir tudo. Datasets maiores que a
+# memória (ou RANGO_MODO_DADOS=particionado) são consultados direto do
+# Parquet particionado por país, sem índices em memória
+@st.cache_resource
+def load_base():
+    # (sem monitor: o armazenamento particionado só muda ao ser regravado)
+    if modo_dados('dataset_atualizado.csv') == 'particionado':
+        return BaseCompartilhada(BaseParticionada.carregar('dataset_atualizado.csv'))
+    # Base completa da carga inicial (snapshot Parquet quando o CSV e as
+    # regras não mudaram); se a carga falhar, o próximo rerun tenta de novo
+    try:
+        base = load_carga().aguardar()
+    except Exception:
+        load_carga.clear()
+        raise
+    # Troca do CSV ou deltas novos: a versão nova é montada em segundo plano
+    base.iniciar_monitor(intervalo=10)
+    return base
+
+# Carga inicial em segundo plano: sem snapshot, o CSV é lido em blocos e
+# as métricas e a primeira página das linhas já lidas aparecem antes do fim
+@st.cache_resource
+def load_carga():
+    return CargaProgressiva('dataset_atualizado.csv').iniciar()
 
-# PÁGINA PRINCIPAL
-if page == "Página Principal":
+# Tela da carga em andamento, atualizada a cada bloco até a base ficar pronta
+def mostrar_carga_parcial(carga, intervalo=0.5):
     st.title("🍕 O Melhor lugar para encontrar seu mais novo restaurante favorito!")
-    
-    # Filtros no sidebar
-    st.sidebar.header("🔍 Filtros")
-
-    # Se o botão de limpar tiver sido clicado, aplicar valores padrão ANTES de instanciar widgets
-    if st.session_state.get("do_reset_filters", False):
-        st.session_state["f_country"] = "Todos"
-        st.session_state["f_city"] = "Todos"
-        st.session_state["f_cuisine"] = "Todas"
-        st.session_state["f_min_rating"] = 0.0
-        st.session_state["f_price"] = "Todos"
-        st.session_state["do_reset_filters"] = False
-    
-    # Filtro por país
-    countries = ['Todos'] + sorted(df['Country'].unique().tolist())
-    selected_country = st.sidebar.selectbox("🌍 País", countries, key="f_country")
-    
-    # Filtro por cidade (dependente do país)
-    if selected_country == 'Todos':
-        cities = ['Todos'] + sorted(df['City'].unique().tolist())
+    parcial = carga.parcial
+    if parcial is None or 'resumo' not in parcial:
+        st.progress(0.0, text="⏳ Carregando o dataset...")
     else:
-        country_df = df[df['Country'] == selected_country]
-        cities = ['Todos'] + sorted(country_df['City'].unique().tolist())
-    selected_city = st.sidebar.selectbox("🏙️ Cidade", cities, key="f_city")
-    
-    # Filtro por culinária (usando culinárias padronizadas)
-    cuisines_principais = ['Todas'] + sorted(df['Cuisine_Principal'].unique().tolist())
-    selected_cuisine = st.sidebar.selectbox("🍽️ Culinária Principal", cuisines_principais, key="f_cuisine")
-    
-    # Filtro por avaliação
-    min_rating = st.sidebar.slider("⭐ Avaliação Mínima", 0.0, 5.0, 0.0, 0.1, key="f_min_rating")
-    
-    # Filtro por tipo de preço
-    price_types = ['Todos'] + sorted(df['Price Type'].unique().tolist())
-    selected_price_type = st.sidebar.selectbox("💰 Tipo de Preço", price_types, key="f_price")
-    
-    # Aplicar filtros
-    filtered_df = df.copy()
-    
-    if selected_country != 'Todos':
-        filtered_df = filtered_df[filtered_df['Country'] == selected_country]
-    
-    if selected_city != 'Todos':
-        filtered_df = filtered_df[filtered_df['City'] == selected_city]
-    
-    if selected_cuisine != 'Todas':
-        filtered_df = filtered_df[filtered_df['Cuisine_Principal'] == selected_cuisine]
-    
-    filtered_df = filtered_df[filtered_df['Aggregate rating'] >= min_rating]
-    
-    if selected_price_type != 'Todos':
-        filtered_df = filtered_df[filtered_df['Price Type'] == selected_price_type]
-    
-    # Botão para limpar filtros
-    # Botão para limpar filtros: apenas seta flag; a aplicação do reset ocorre antes dos widgets
-    def _trigger_reset_filters():
-        st.session_state["do_reset_filters"] = True
-
-    st.sidebar.button("🔄 Limpar Filtros", on_click=_trigger_reset_filters)
-    
-    # Conteúdo principal
-    st.subheader("📍 Restaurantes Encontrados")
-    st.dataframe(
-        filtered_df[['Restaurant Name', 'City', 'Cuisine_Principal', 'Cuisines', 'Aggregate rating', 'Price Type']],
-        use_container_width=True
-    )
-    
-    # Estatísticas da página principal
-    st.markdown("---")
-    st.subheader("📊 Estatísticas Gerais")
-    
-    # Métricas em colunas
-    col1, col2, col3, col4, col5 = st.columns(5)
-    
-    with col1:
-        st.metric(
-            label="🌍 Países",
-            value=df['Country'].nunique(),
-            help="Total de países disponíveis no dataset"
-        )
-    
-    with col2:
-        st.metric(
-            label="🏙️ Cidades",
-            value=df['City'].nunique(),
-            help="Total de cidades disponíveis no dataset"
-        )
-    
-    with col3:
-        st.metric(
-            label="🍽️ Restaurantes",
-            value=len(df),
-            help="Total de restaurantes no dataset"
-        )
-    
-    with col4:
-        st.metric(
-            label="🍕 Culinárias Principais",
-            value=df['Cuisine_Principal'].nunique(),
-            help="Total de tipos de culinária principal disponíveis"
-        )
-    
-    with col5:
-        st.metric(
-            label="⭐ Avaliação Média",
-            value=f"{df['Aggregate rating'].mean():.2f}",
-            help="Avaliação média geral de todos os restaurantes"
-        )
-    
-    # Estatísticas dos filtros aplicados
-    st.markdown("---")
-    st.subheader("🎯 Estatísticas dos Filtros Aplicados")
-    
-    col6, col7, col8, col9 = st.columns(4)
-    
-    with col6:
-        st.metric(
-            label="🔍 Restaurantes Filtrados",
-            value=len(filtered_df),
-            help="Quantidade de restaurantes após aplicar os filtros"
-        )
-    
-    with col7:
-        st.metric(
-            label="🏙️ Cidades Filtradas",
-            value=filtered_df['City'].nunique(),
-            help="Quantidade de cidades nos resultados filtrados"
-        )
-    
-    with col8:
-        st.metric(
-            label="🍕 Culinárias Principais Filtradas",
-            value=filtered_df['Cuisine_Principal'].nunique(),
-            help="Quantidade de culinárias principais nos resultados filtrados"
-        )
-    
-    with col9:
-        st.metric(
-            label="⭐ Avaliação Média Filtrada",
-            value=f"{filtered_df['Aggregate rating'].mean():.2f}",
-            help="Avaliação média dos restaurantes filtrados"
-        )
-    
-    # Footer da página principal
-    st.markdown("---")
-    st.markdown("**Criado com Streamlit por Leonardo Serpa**")
-
-# PAÍSES (mantido como estava, mas usando culinárias padronizadas)
-elif page == "Países":
-    st.title("🌍 Análise de Países")
-    
-    # Filtro por país (MÚLTIPLO) - igual ao da aba Cidades
-    countries_paises = sorted(df['Country'].unique().tolist())
-    selected_countries_paises = st.sidebar.multiselect(
-        "🌍 Países (Selecione quantos quiser)",
-        countries_paises,
-        default=countries_paises[:3],  # Seleciona os 3 primeiros por padrão
-        help="Clique para selecionar/deselecionar países. Você pode escolher quantos quiser!"
-    )
-    
-    # Aplicar filtro de países
-    if len(selected_countries_paises) > 0:
-        df_filtered_paises = df[df['Country'].isin(selected_countries_paises)]
-        countries_text_paises = ", ".join(selected_countries_paises)
-        if len(selected_countries_paises) == 1:
-            countries_text_paises = selected_countries_paises[0]
+        resumo = parcial['resumo']
+        if parcial['etapa'] == 'leitura':
+            st.progress(parcial['progresso'], text=f"⏳ Lendo o dataset: {resumo['restaurantes']:,} restaurantes até agora")
+        else:
+            st.progress(1.0, text="⏳ Montando os índices dos filtros, da busca e do mapa...")
+        col1, col2, col3, col4, col5 = st.columns(5)
+        col1.metric("🌍 Países", resumo['paises'])
+        col2.metric("🏙️ Cidades", resumo['cidades'])
+        col3.metric("🍽️ Restaurantes", resumo['restaurantes'])
+        col4.metric("🍕 Culinárias Principais", resumo['culinarias'])
+        col5.metric("⭐ Avaliação Média", f"{resumo['nota_media']:.2f}")
+        st.subheader("📍 Restaurantes Encontrados")
+        st.dataframe(parcial['pagina'][colunas_padrao], width='stretch')
+        st.caption("Filtros disponíveis ao fim da carga; os números acima ainda estão crescendo.")
+    time.sleep(intervalo)
+    st.rerun()
+
+# Cache de resultados compartilhado entre todas as sessões
+@st.cache_resource
+def load_cache_resultados():
+    return CacheLRU(max_itens=256, ttl=600)
+
+# Figuras Plotly construídas uma vez por conteúdo de dados
+@st.cache_resource
+def load_fabrica_graficos():
+    return FabricaGraficos(max_itens=128)
+
+# Imagens da interface no tamanho de exibição (geradas uma vez por processo)
+# e servidas como arquivos estáticos: o rerun envia só o HTML com os endereços
+@st.cache_resource
+def load_ativos():
+    return carregar_ativos()
+
+# Histórico de perfis dos reruns (resumo por etapa na Administração)
+@st.cache_resource
+def load_historico_perfis():
+    return HistoricoPerfis(max_registros=500)
+
+# Instrumentação do rerun (painel de depuração com ?debug=1)
+modo_debug = st.query_params.get("debug") == "1"
+perfil = PerfilRerun(pagina=None, medir_memoria=modo_debug)
+
+# O perfil é fechado mesmo quando o rerun é interrompido (st.rerun, widget alterado)
+try:
+    # Carregar dados: a versão da base é lida uma vez e usada no rerun inteiro
+    with perfil.etapa("carga") as etapa_carga:
+        if modo_dados('dataset_atualizado.csv') == 'memoria' and load_carga().em_andamento():
+            mostrar_carga_parcial(load_carga())
+        base = load_base().atual
+        etapa_carga['linhas'] = len(base)
+    cache_resultados = load_cache_resultados()
+    fabrica_graficos = load_fabrica_graficos()
+
+    # Mostrar um gráfico (construído pela fábrica) medindo construção e envio
+    def mostrar_grafico(nome, dados, construir, parametros=None):
+        with perfil.etapa(f"grafico:{nome}", linhas=len(dados)):
+            figura = fabrica_graficos.obter(nome, dados, construir, parametros)
+        with perfil.etapa(f"serializacao:{nome}"):
+            st.plotly_chart(figura, width='stretch')
+
+    # Sidebar com logo (a imagem original se as variantes não puderam ser geradas)
+    ativos = load_ativos()
+    if 'logo' in ativos and st.get_option('server.enableStaticServing'):
+        st.sidebar.markdown(html_imagem(ativos, 'logo', alt="Rango Serpa"), unsafe_allow_html=True)
     else:
-        df_filtered_paises = df.copy()
-        countries_text_paises = "Todos os países"
-    
-    # Mostrar informações do filtro aplicado
-    st.info(f"📍 **Países selecionados:** {countries_text_paises} | **Total de cidades:** {df_filtered_paises['City'].nunique()} | **Total de restaurantes:** {len(df_filtered_paises)}")
-    
-    # Gráficos organizados em grade 2x2
-    st.subheader("📊 Análise Comparativa por País")
-    
-    # Primeira linha de gráficos
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # Gráfico 1: Quantidade de restaurantes por país
-        country_restaurants = df_filtered_paises['Country'].value_counts()
-        fig_restaurants = px.bar(
-            x=country_restaurants.values,
-            y=country_restaurants.index,
-            orientation='h',
-            title="🍽️ Quantidade de Restaurantes por País",
-            color_discrete_sequence=['#2E86AB'],  # Azul profissional para restaurantes
-            labels={'x': 'Quantidade de Restaurantes', 'y': 'País'}
-        )
-        fig_restaurants.update_layout(
-            showlegend=False,
-            height=400,
-            xaxis_title="Quantidade de Restaurantes",
-            yaxis_title="País",
-            margin=dict(l=20, r=20, t=40, b=20)
-        )
-        st.plotly_chart(fig_restaurants, width='stretch')
-    
-    with col2:
-        # Gráfico 2: Média de preço para duas pessoas por país
-        country_avg_cost = df_filtered_paises.groupby('Country')['Average Cost for two'].mean().sort_values(ascending=False)
-        fig_avg_cost = px.bar(
-            x=country_avg_cost.values,
-            y=country_avg_cost.index,
-            orientation='h',
-            title="💰 Média de Preço para Duas Pessoas por País",
-            color_discrete_sequence=['#C73E1D'],  # Vermelho escuro para preços
-            labels={'x': 'Preço Médio', 'y': 'País'}
-        )
-        fig_avg_cost.update_layout(
-            showlegend=False,
-            height=400,
-            xaxis_title="Preço Médio para Duas Pessoas",
-            yaxis_title="País",
-            margin=dict(l=20, r=20, t=40, b=20)
-        )
-        st.plotly_chart(fig_avg_cost, width='stretch')
-    
-    # Segunda linha de gráficos
-    col3, col4 = st.columns(2)
-    
-    with col3:
-        # Gráfico 3: Quantidade de cidades por país
-        country_cities = df_filtered_paises.groupby('Country')['City'].nunique().sort_values(ascending=False)
-        fig_cities = px.bar(
-            x=country_cities.values,
-            y=country_cities.index,
-            orientation='h',
-            title="🏙️ Quantidade de Cidades por País",
-            color_discrete_sequence=['#A23B72'],  # Roxo elegante para cidades
-            labels={'x': 'Quantidade de Cidades', 'y': 'País'}
-        )
-        fig_cities.update_layout(
-            showlegend=False,
-            height=400,
-            xaxis_title="Quantidade de Cidades",
-            yaxis_title="País",
-            margin=dict(l=20, r=20, t=40, b=20)
+        st.sidebar.image('img/img1.png', width=200)
+
+    # Navegação entre páginas (a página de administração só aparece com ?admin=1)
+    # (o mapa depende do índice espacial em memória)
+    paginas = ["Página Principal", "Países", "Cidades"]
+    if not base.fora_da_memoria:
+        paginas.append("Mapa")
+    if st.query_params.get("admin") == "1":
+        paginas.append("Administração")
+    page = st.sidebar.selectbox(
+        "📱 Navegação",
+        paginas
+    )
+    perfil.pagina = page
+    if base.fora_da_memoria:
+        st.sidebar.caption("💾 Modo particionado: sem atualização automática. Mudanças no CSV só entram "
+                           "ao regravar o armazenamento (`python particionado.py`) e reiniciar o app.")
+
+    # PÁGINA PRINCIPAL
+    if page == "Página Principal":
+        st.title("🍕 O Melhor lugar para encontrar seu mais novo restaurante favorito!")
+        
+        # Filtros no sidebar
+        st.sidebar.header("🔍 Filtros")
+
+        # Se o botão de limpar tiver sido clicado, aplicar valores padrão ANTES de instanciar widgets
+        if st.session_state.get("do_reset_filters", False):
+            st.session_state["f_busca"] = ""
+            st.session_state["f_country"] = "Todos"
+            st.session_state["f_city"] = "Todos"
+            st.session_state["f_cuisine"] = "Todas"
+            st.session_state["f_culinarias"] = []
+            st.session_state["f_modo_culinarias"] = "Qualquer uma"
+            st.session_state["f_min_rating"] = 0.0
+            st.session_state["f_price"] = "Todos"
+            st.session_state["f_pagina"] = 1
+            st.session_state["do_reset_filters"] = False
+        
+        # Busca textual (sem acentos e por início de palavra, resolvida pelo índice)
+        # (no modo particionado não há índice de busca)
+        texto_busca = st.sidebar.text_input(
+            "🔎 Buscar", placeholder="Nome, cidade, bairro ou endereço", key="f_busca",
+            disabled=base.fora_da_memoria,
+            help="Indisponível no modo particionado" if base.fora_da_memoria else None
         )
-        st.plotly_chart(fig_cities, width='stretch')
-    
-    with col4:
-        # Gráfico 4: Quantidade de avaliações por país
-        country_votes = df_filtered_paises.groupby('Country')['Votes'].sum().sort_values(ascending=False)
-        fig_votes = px.bar(
-            x=country_votes.values,
-            y=country_votes.index,
-            orientation='h',
-            title="⭐ Quantidade de Avaliações por País",
-            color_discrete_sequence=['#F18F01'],  # Laranja vibrante para avaliações
-            labels={'x': 'Total de Avaliações', 'y': 'País'}
+        termos = () if base.fora_da_memoria else termos_busca(texto_busca)
+        
+        # Filtro por país
+        countries = ['Todos'] + base.valores('Country')
+        selected_country = st.sidebar.selectbox("🌍 País", countries, key="f_country")
+        
+        # Filtro por cidade (dependente do país)
+        if selected_country == 'Todos':
+            cities = ['Todos'] + base.valores('City')
+        else:
+            cities = ['Todos'] + base.valores('City', {'Country': selected_country})
+        selected_city = st.sidebar.selectbox("🏙️ Cidade", cities, key="f_city")
+        
+        # Tamanho da seleção de local, lido do catálogo das dimensões
+        if selected_city != 'Todos':
+            filtro_pais = None if selected_country == 'Todos' else {'Country': selected_country}
+            st.sidebar.caption(f"📊 {base.catalogo.contagem('City', selected_city, filtro_pais):,} restaurantes em {selected_city}")
+        elif selected_country != 'Todos':
+            st.sidebar.caption(f"📊 {base.catalogo.contagem('Country', selected_country):,} restaurantes e "
+                               f"{len(cities) - 1} cidades em {selected_country}")
+        
+        # Filtro por culinária (usando culinárias padronizadas)
+        cuisines_principais = ['Todas'] + base.valores('Cuisine_Principal')
+        selected_cuisine = st.sidebar.selectbox("🍽️ Culinária Principal", cuisines_principais, key="f_cuisine")
+        
+        # Filtro por qualquer culinária servida (resolvido pelo índice invertido)
+        selected_cuisines = st.sidebar.multiselect("🥢 Culinárias Servidas", base.valores('Cuisines_Padronizadas'), key="f_culinarias")
+        cuisines_mode = st.sidebar.radio("Combinar culinárias", ["Qualquer uma", "Todas"], horizontal=True, key="f_modo_culinarias")
+        todas_culinarias = cuisines_mode == "Todas"
+        
+        # Filtro por avaliação
+        min_rating = st.sidebar.slider("⭐ Avaliação Mínima", 0.0, 5.0, 0.0, 0.1, key="f_min_rating")
+        
+        # Filtro por tipo de preço
+        price_types = ['Todos'] + base.valores('Price Type')
+        selected_price_type = st.sidebar.selectbox("💰 Tipo de Preço", price_types, key="f_price")
+        
+        # Aplicar filtros (resolvidos pelo índice, sem copiar o DataFrame inteiro)
+        filtros = {}
+        if selected_country != 'Todos':
+            filtros['Country'] = selected_country
+        if selected_city != 'Todos':
+            filtros['City'] = selected_city
+        if selected_cuisine != 'Todas':
+            filtros['Cuisine_Principal'] = selected_cuisine
+        if selected_price_type != 'Todos':
+            filtros['Price Type'] = selected_price_type
+        
+        with perfil.etapa("filtro") as etapa_filtro:
+            resultado_principal = cache_resultados.obter(
+                chave_filtros(
+                    'principal',
+                    versao=base.versao,
+                    paises=[filtros['Country']] if 'Country' in filtros else None,
+                    cidade=filtros.get('City'),
+                    culinaria=filtros.get('Cuisine_Principal'),
+                    nota_minima=min_rating,
+                    preco=filtros.get('Price Type'),
+                    culinarias=selected_cuisines,
+                    todas_culinarias=todas_culinarias,
+                    busca=termos,
+                ),
+                lambda: consultar_principal(base, filtros, min_rating, selected_cuisines, todas_culinarias, termos)
+            )
+            etapa_filtro['linhas'] = len(resultado_principal['linhas'])
+        linhas_filtradas = resultado_principal['linhas']
+        
+        # Botão para limpar filtros
+        # Botão para limpar filtros: apenas seta flag; a aplicação do reset ocorre antes dos widgets
+        def _trigger_reset_filters():
+            st.session_state["do_reset_filters"] = True
+
+        st.sidebar.button("🔄 Limpar Filtros", on_click=_trigger_reset_filters)
+        
+        # Conteúdo principal
+        st.subheader("📍 Restaurantes Encontrados")
+        
+        # Controles da tabela: só a página visível é ordenada e enviada ao navegador
+        colunas_opcionais = ['Country', 'Locality', 'Address', 'Average Cost for two', 'Currency', 'Votes', 'Rating text']
+        colunas_tabela = st.multiselect(
+            "🧾 Colunas",
+            colunas_padrao + colunas_opcionais,
+            default=colunas_padrao,
+            key="f_colunas"
+        ) or colunas_padrao
+        
+        col_ordem, col_direcao, col_tamanho, col_pagina = st.columns([3, 2, 2, 2])
+        
+        with col_ordem:
+            ordenar_por = st.selectbox(
+                "↕️ Ordenar por", ['(nenhuma)'] + colunas_tabela, key="f_ordem",
+                help="Sem ordenação, o resultado de uma busca aparece por relevância"
+            )
+        
+        with col_direcao:
+            direcao = st.selectbox("Direção", ["Decrescente", "Crescente"], key="f_direcao")
+        
+        with col_tamanho:
+            tamanho_pagina = st.selectbox("Linhas por página", [25, 50, 100, 250], index=1, key="f_tamanho")
+        
+        total_filtrados = len(linhas_filtradas)
+        total_paginas = max(1, -(-total_filtrados // tamanho_pagina))
+        if st.session_state.get("f_pagina", 1) > total_paginas:
+            st.session_state["f_pagina"] = total_paginas
+        
+        with col_pagina:
+            numero_pagina = st.number_input("Página", min_value=1, max_value=total_paginas, value=1, step=1, key="f_pagina")
+        
+        with perfil.etapa("tabela", linhas=len(linhas_filtradas)):
+            pagina_df = base.tabela.pagina(
+                linhas_filtradas,
+                colunas_tabela,
+                numero=numero_pagina,
+                tamanho=tamanho_pagina,
+                ordenar_por=None if ordenar_por == '(nenhuma)' else ordenar_por,
+                crescente=direcao == "Crescente"
+            )
+        with perfil.etapa("serializacao:tabela", linhas=len(pagina_df)):
+            st.dataframe(
+                pagina_df,
+                width='stretch'
+            )
+        primeira_linha = (numero_pagina - 1) * tamanho_pagina + 1 if len(pagina_df) else 0
+        ultima_linha = primeira_linha + len(pagina_df) - 1 if len(pagina_df) else 0
+        st.caption(f"Mostrando {primeira_linha}–{ultima_linha} de {total_filtrados} restaurantes | Página {numero_pagina} de {total_paginas}")
+        
+        # Estatísticas da página principal
+        st.markdown("---")
+        st.subheader("📊 Estatísticas Gerais")
+        
+        # Métricas em colunas
+        resumo = base.resumo()
+        col1, col2, col3, col4, col5 = st.columns(5)
+        
+        with col1:
+            st.metric(
+                label="🌍 Países",
+                value=resumo['paises'],
+                help="Total de países disponíveis no dataset"
+            )
+        
+        with col2:
+            st.metric(
+                label="🏙️ Cidades",
+                value=resumo['cidades'],
+                help="Total de cidades disponíveis no dataset"
+            )
+        
+        with col3:
+            st.metric(
+                label="🍽️ Restaurantes",
+                value=resumo['restaurantes'],
+                help="Total de restaurantes no dataset"
+            )
+        
+        with col4:
+            st.metric(
+                label="🍕 Culinárias Principais",
+                value=resumo['culinarias'],
+                help="Total de tipos de culinária principal disponíveis"
+            )
+        
+        with col5:
+            st.metric(
+                label="⭐ Avaliação Média",
+                value=f"{resumo['nota_media']:.2f}",
+                help="Avaliação média geral de todos os restaurantes"
+            )
+        
+        # Estatísticas dos filtros aplicados
+        st.markdown("---")
+        st.subheader("🎯 Estatísticas dos Filtros Aplicados")
+        
+        col6, col7, col8, col9 = st.columns(4)
+        
+        with col6:
+            st.metric(
+                label="🔍 Restaurantes Filtrados",
+                value=total_filtrados,
+                help="Quantidade de restaurantes após aplicar os filtros"
+            )
+        
+        with col7:
+            st.metric(
+                label="🏙️ Cidades Filtradas",
+                value=resultado_principal['cidades'],
+                help="Quantidade de cidades nos resultados filtrados"
+            )
+        
+        with col8:
+            st.metric(
+                label="🍕 Culinárias Principais Filtradas",
+                value=resultado_principal['culinarias'],
+                help="Quantidade de culinárias principais nos resultados filtrados"
+            )
+        
+        with col9:
+            st.metric(
+                label="⭐ Avaliação Média Filtrada",
+                value=f"{resultado_principal['nota_media']:.2f}",
+                help="Avaliação média dos restaurantes filtrados"
+            )
+        
+        # Footer da página principal
+        st.markdown("---")
+        st.markdown("**Criado com Streamlit por Leonardo Serpa**")
+
+    # PAÍSES (mantido como estava, mas usando culinárias padronizadas)
+    elif page == "Países":
+        st.title("🌍 Análise de Países")
+        
+        # Filtro por país (MÚLTIPLO) - igual ao da aba Cidades
+        countries_paises = base.valores('Country')
+        selected_countries_paises = st.sidebar.multiselect(
+            "🌍 Países (Selecione quantos quiser)",
+            countries_paises,
+            default=countries_paises[:3],  # Seleciona os 3 primeiros por padrão
+            help="Clique para selecionar/deselecionar países. Você pode escolher quantos quiser!"
         )
-        fig_votes.update_layout(
-            showlegend=False,
-            height=400,
-            xaxis_title="Total de Avaliações",
-            yaxis_title="País",
-            margin=dict(l=20, r=20, t=40, b=20)
+        
+        # Modo aproximado (só no modo particionado): responde pela amostra
+        # estratificada, sem percorrer o armazenamento, com margem de erro
+        exato = True
+        if base.cubo_aproximado is not None:
+            exato = st.sidebar.toggle(
+                "🎯 Valores exatos", value=True, key="f_exato_paises",
+                help="Desligado, os gráficos saem da amostra estratificada (bem mais rápido, com margem de erro de 95%)"
+            )
+        
+        # Aplicar filtro de países (consolidando o cubo de agregados)
+        if len(selected_countries_paises) > 0:
+            countries_text_paises = ", ".join(selected_countries_paises)
+            if len(selected_countries_paises) == 1:
+                countries_text_paises = selected_countries_paises[0]
+        else:
+            countries_text_paises = "Todos os países"
+        with perfil.etapa("agregacao"):
+            agregados_paises, (total_cidades_paises, total_restaurantes_paises), margens = cache_resultados.obter(
+                chave_filtros('paises' if exato else 'paises_aproximado', paises=selected_countries_paises, versao=base.versao),
+                lambda: (*consultar_paises(base, selected_countries_paises, exato),
+                         margens_aproximadas(base, selected_countries_paises, exato))
+            )
+        
+        # Mostrar informações do filtro aplicado
+        st.info(f"📍 **Países selecionados:** {countries_text_paises} | **Total de cidades:** {total_cidades_paises} | **Total de restaurantes:** {total_restaurantes_paises}")
+        if margens is not None:
+            st.caption(f"≈ Valores aproximados (95% de confiança): restaurantes e cidades exatos; custo médio até "
+                       f"±{margens['custo_medio']:.1%} e avaliações até ±{margens['votos']:.1%} por país")
+        
+        # Gráficos organizados em grade 2x2
+        st.subheader("📊 Análise Comparativa por País")
+        
+        # Primeira linha de gráficos
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # Gráfico 1: Quantidade de restaurantes por país
+            country_restaurants = agregados_paises['restaurantes'].sort_values(ascending=False)
+            def _construir_restaurants():
+                fig_restaurants = px.bar(
+                    x=country_restaurants.values,
+                    y=country_restaurants.index,
+                    orientation='h',
+                    title="🍽️ Quantidade de Restaurantes por País",
+                    color_discrete_sequence=['#2E86AB'],  # Azul profissional para restaurantes
+                    labels={'x': 'Quantidade de Restaurantes', 'y': 'País'}
+                )
+                fig_restaurants.update_layout(
+                    showlegend=False,
+                    height=400,
+                    xaxis_title="Quantidade de Restaurantes",
+                    yaxis_title="País",
+                    margin=dict(l=20, r=20, t=40, b=20)
+                )
+                return fig_restaurants
+
+            mostrar_grafico('paises_restaurantes', country_restaurants, _construir_restaurants)
+        
+        with col2:
+            # Gráfico 2: Média de preço para duas pessoas por país
+            country_avg_cost = agregados_paises['custo_medio'].sort_values(ascending=False)
+            def _construir_avg_cost():
+                fig_avg_cost = px.bar(
+                    x=country_avg_cost.values,
+                    y=country_avg_cost.index,
+                    orientation='h',
+                    title="💰 Média de Preço para Duas Pessoas por País",
+                    color_discrete_sequence=['#C73E1D'],  # Vermelho escuro para preços
+                    labels={'x': 'Preço Médio', 'y': 'País'}
+                )
+                fig_avg_cost.update_layout(
+                    showlegend=False,
+                    height=400,
+                    xaxis_title="Preço Médio para Duas Pessoas",
+                    yaxis_title="País",
+                    margin=dict(l=20, r=20, t=40, b=20)
+                )
+                return fig_avg_cost
+
+            mostrar_grafico('paises_custo_medio', country_avg_cost, _construir_avg_cost)
+        
+        # Segunda linha de gráficos
+        col3, col4 = st.columns(2)
+        
+        with col3:
+            # Gráfico 3: Quantidade de cidades por país
+            country_cities = agregados_paises['cidades'].sort_values(ascending=False)
+            def _construir_cities():
+                fig_cities = px.bar(
+                    x=country_cities.values,
+                    y=country_cities.index,
+                    orientation='h',
+                    title="🏙️ Quantidade de Cidades por País",
+                    color_discrete_sequence=['#A23B72'],  # Roxo elegante para cidades
+                    labels={'x': 'Quantidade de Cidades', 'y': 'País'}
+                )
+                fig_cities.update_layout(
+                    showlegend=False,
+                    height=400,
+                    xaxis_title="Quantidade de Cidades",
+                    yaxis_title="País",
+                    margin=dict(l=20, r=20, t=40, b=20)
+                )
+                return fig_cities
+
+            mostrar_grafico('paises_cidades', country_cities, _construir_cities)
+        
+        with col4:
+            # Gráfico 4: Quantidade de avaliações por país
+            country_votes = agregados_paises['votos'].sort_values(ascending=False)
+            def _construir_votes():
+                fig_votes = px.bar(
+                    x=country_votes.values,
+                    y=country_votes.index,
+                    orientation='h',
+                    title="⭐ Quantidade de Avaliações por País",
+                    color_discrete_sequence=['#F18F01'],  # Laranja vibrante para avaliações
+                    labels={'x': 'Total de Avaliações', 'y': 'País'}
+                )
+                fig_votes.update_layout(
+                    showlegend=False,
+                    height=400,
+                    xaxis_title="Total de Avaliações",
+                    yaxis_title="País",
+                    margin=dict(l=20, r=20, t=40, b=20)
+                )
+                return fig_votes
+
+            mostrar_grafico('paises_avaliacoes', country_votes, _construir_votes)
+        
+        # Footer da página países
+        st.markdown("---")
+        st.markdown("**Criado com Streamlit por Leonardo Serpa**")
+
+    # CIDADES (mantido como estava, mas usando culinárias padronizadas)
+    elif page == "Cidades":
+        st.title("🏙️ Análise de Cidades")
+        
+        # Filtro por país (MÚLTIPLO)
+        countries_cities = base.valores('Country')
+        selected_countries_cities = st.sidebar.multiselect(
+            "🌍 Países (Selecione quantos quiser)",
+            countries_cities,
+            default=countries_cities[:3],  # Seleciona os 3 primeiros por padrão
+            help="Clique para selecionar/deselecionar países. Você pode escolher quantos quiser!"
         )
-        st.plotly_chart(fig_votes, width='stretch')
-    
-    # Footer da página países
-    st.markdown("---")
-    st.markdown("**Criado com Streamlit por Leonardo Serpa**")
-
-# CIDADES (mantido como estava, mas usando culinárias padronizadas)
-elif page == "Cidades":
-    st.title("🏙️ Análise de Cidades")
-    
-    # Filtro por país (MÚLTIPLO)
-    countries_cities = sorted(df['Country'].unique().tolist())
-    selected_countries_cities = st.sidebar.multiselect(
-        "🌍 Países (Selecione quantos quiser)",
-        countries_cities,
-        default=countries_cities[:3],  # Seleciona os 3 primeiros por padrão
-        help="Clique para selecionar/deselecionar países. Você pode escolher quantos quiser!"
-    )
-    
-    # Aplicar filtro de países
-    if len(selected_countries_cities) > 0:
-        df_filtered = df[df['Country'].isin(selected_countries_cities)]
-        countries_text = ", ".join(selected_countries_cities)
-        if len(selected_countries_cities) == 1:
-            countries_text = selected_countries_cities[0]
-    else:
-        df_filtered = df.copy()
-        countries_text = "Todos os países"
-    
-    # Limpar valores nulos da coluna City
-    df_filtered = df_filtered.dropna(subset=['City'])
-    
-    # Mostrar informações do filtro aplicado
-    st.info(f"📍 **Países selecionados:** {countries_text} | **Total de cidades:** {df_filtered['City'].nunique()} | **Total de restaurantes:** {len(df_filtered)}")
-    
-    # Gráfico 1: Culinárias principais mais populares (usando culinárias padronizadas)
-    st.subheader("🍕 Culinárias Principais Mais Populares - Diversidade Gastronômica")
-    cuisine_principal_counts = df_filtered['Cuisine_Principal'].value_counts().head(10)
-    fig_cuisine_pie = px.pie(
-        values=cuisine_principal_counts.values,
-        names=cuisine_principal_counts.index,
-        title="🍕 Top 10 Culinárias Principais Mais Populares",
-        labels={'value': 'Quantidade de Restaurantes', 'name': 'Tipo de Culinária'}
-    )
-    st.plotly_chart(fig_cuisine_pie, width='stretch')
-    
-    # Gráficos organizados em grade 2x2
-    st.subheader("🏆 Análise de Cidades e Diversidade Culinária")
-    
-    # Calcular dados para ambos os gráficos
-    city_counts = df_filtered['City'].value_counts()
-    
-    # Calcular para cada cidade: quantidade de restaurantes e tipos de culinárias principais únicos
-    city_diversity = df_filtered.groupby('City').agg({
-        'Restaurant Name': 'count',  # Conta restaurantes
-        'Cuisine_Principal': 'nunique'        # Conta tipos de culinárias principais únicos
-    }).rename(columns={
-        'Restaurant Name': 'Total_Restaurantes',
-        'Cuisine_Principal': 'Tipos_Culinarias_Principais_Unicos'
-    })
-    
-    # Ordenar por quantidade de restaurantes (critério principal)
-    city_diversity = city_diversity.sort_values('Total_Restaurantes', ascending=False)
-    
-    # Primeira linha de gráficos
-    col_cities, col_diversity = st.columns(2)
-    
-    with col_cities:
-        # Gráfico 2: Ranking das cidades com mais restaurantes
-        # Adaptar o número de cidades mostradas
-        if len(city_counts) >= 15:
-            max_cities = 15
-            title_cities = "Top 15 Cidades"
-        elif len(city_counts) >= 10:
-            max_cities = 10
-            title_cities = "Top 10 Cidades"
-        elif len(city_counts) >= 5:
-            max_cities = 5
-            title_cities = "Top 5 Cidades"
+        
+        # Modo aproximado (só no modo particionado): responde pela amostra
+        # estratificada, sem percorrer o armazenamento, com margem de erro
+        exato = True
+        if base.cubo_aproximado is not None:
+            exato = st.sidebar.toggle(
+                "🎯 Valores exatos", value=True, key="f_exato_cidades",
+                help="Desligado, os gráficos saem da amostra estratificada (bem mais rápido, com margem de erro de 95%)"
+            )
+        
+        # Aplicar filtro de países (consolidando o cubo de agregados)
+        if len(selected_countries_cities) > 0:
+            countries_text = ", ".join(selected_countries_cities)
+            if len(selected_countries_cities) == 1:
+                countries_text = selected_countries_cities[0]
         else:
-            max_cities = len(city_counts)
-            title_cities = f"Todas as {len(city_counts)} Cidades"
+            countries_text = "Todos os países"
+        with perfil.etapa("agregacao"):
+            agregados_cidades, culinarias_cidades, (total_cidades, total_restaurantes), margens = cache_resultados.obter(
+                chave_filtros('cidades' if exato else 'cidades_aproximado', paises=selected_countries_cities, versao=base.versao),
+                lambda: (*consultar_cidades(base, selected_countries_cities, exato),
+                         margens_aproximadas(base, selected_countries_cities, exato))
+            )
         
-        city_counts_display = city_counts.head(max_cities)
+        # Mostrar informações do filtro aplicado
+        st.info(f"📍 **Países selecionados:** {countries_text} | **Total de cidades:** {total_cidades} | **Total de restaurantes:** {total_restaurantes}")
+        if margens is not None:
+            st.caption(f"≈ Valores aproximados (95% de confiança): restaurantes por cidade exatos; restaurantes por "
+                       f"culinária (top 10) até ±{margens['restaurantes_culinaria']:.1%}, culinárias por cidade até "
+                       f"±{margens['culinarias']:.1%} e nota média até ±{margens['nota_media']:.2f} ponto")
         
-        fig_cities_ranking = px.bar(
-            x=city_counts_display.values,
-            y=city_counts_display.index,
-            orientation='h',
-            title="🏆 Ranking das Cidades com Mais Restaurantes",
-            color_discrete_sequence=['#4ECDC4']
+        # Gráfico 1: Culinárias principais mais populares (usando culinárias padronizadas)
+        st.subheader("🍕 Culinárias Principais Mais Populares - Diversidade Gastronômica")
+        cuisine_principal_counts = culinarias_cidades.head(10)
+        def _construir_cuisine_pie():
+            fig_cuisine_pie = px.pie(
+                values=cuisine_principal_counts.values,
+                names=cuisine_principal_counts.index,
+                title="🍕 Top 10 Culinárias Principais Mais Populares",
+                labels={'value': 'Quantidade de Restaurantes', 'name': 'Tipo de Culinária'}
+            )
+            return fig_cuisine_pie
+
+        mostrar_grafico('cidades_culinarias', cuisine_principal_counts, _construir_cuisine_pie)
+        
+        # Gráficos organizados em grade 2x2
+        st.subheader("🏆 Análise de Cidades e Diversidade Culinária")
+        
+        # Ranking das cidades por restaurantes: listas já ordenadas por país do
+        # catálogo (ou seleção parcial no cubo, sem ordenar todas as cidades)
+        def ranking_restaurantes(k):
+            ranking = base.catalogo.ranking_cidades(selected_countries_cities, k)
+            return topo(agregados_cidades['restaurantes'], k) if ranking is None else ranking
+        
+        # Calcular para cada cidade: quantidade de restaurantes e tipos de culinárias principais únicos
+        city_diversity = agregados_cidades[['restaurantes', 'culinarias']].rename(columns={
+            'restaurantes': 'Total_Restaurantes',
+            'culinarias': 'Tipos_Culinarias_Principais_Unicos'
+        })
+        
+        # Primeira linha de gráficos
+        col_cities, col_diversity = st.columns(2)
+        
+        with col_cities:
+            # Gráfico 2: Ranking das cidades com mais restaurantes
+            # Adaptar o número de cidades mostradas (15, 10, 5 ou todas)
+            city_counts_display = ranking_restaurantes(tamanho_ranking(len(agregados_cidades), (15, 10, 5)))
+            
+            def _construir_cities_ranking():
+                fig_cities_ranking = px.bar(
+                    x=city_counts_display.values,
+                    y=city_counts_display.index,
+                    orientation='h',
+                    title="🏆 Ranking das Cidades com Mais Restaurantes",
+                    color_discrete_sequence=['#4ECDC4']
+                )
+                fig_cities_ranking.update_layout(
+                    showlegend=False, 
+                    height=400,
+                    xaxis_title="Quantidade de Restaurantes",
+                    yaxis_title="Cidade",
+                    margin=dict(l=20, r=20, t=40, b=20)
+                )
+                return fig_cities_ranking
+
+            mostrar_grafico('cidades_ranking', city_counts_display, _construir_cities_ranking)
+        
+        with col_diversity:
+            # Gráfico 3: Top cidades com mais restaurantes e tipos de culinárias principais distintos
+            if len(city_diversity) > 0:
+                # Adaptar o número de cidades mostradas (10, 7, 5 ou todas), pela quantidade de restaurantes
+                top_diversity = city_diversity.loc[ranking_restaurantes(tamanho_ranking(len(city_diversity), (10, 7, 5))).index]
+                
+                # Criar gráfico de barras com duas métricas
+                def _construir_diversity():
+                    fig_diversity = px.bar(
+                         x=top_diversity.index,
+                         y=top_diversity['Total_Restaurantes'],
+                         title="🍕 Top Cidades com Mais Restaurantes e Diversidade Culinária",
+                         color_discrete_sequence=['#FFD700'],  # Cor dourada para destacar
+                         labels={'x': 'Cidade', 'y': 'Total de Restaurantes'}
+                     )
+                
+                    # Anotações com a quantidade de tipos de culinárias principais (aplicadas de uma vez)
+                    anotacoes = [
+                        dict(
+                            x=city,
+                            y=total + (total * 0.05),  # Posicionar acima da barra
+                            text=f"🍕 {int(tipos)} tipos",
+                            showarrow=False,
+                            font=dict(size=10, color='#FF6B6B'),
+                            bgcolor='rgba(255, 255, 255, 0.8)',
+                            bordercolor='#FF6B6B',
+                            borderwidth=1
+                        )
+                        for city, total, tipos in zip(
+                            top_diversity.index,
+                            top_diversity['Total_Restaurantes'],
+                            top_diversity['Tipos_Culinarias_Principais_Unicos']
+                        )
+                    ]
+                
+                    fig_diversity.update_layout(
+                        annotations=anotacoes,
+                        showlegend=False,
+                        height=400,
+                        xaxis_title="Cidade",
+                        yaxis_title="Total de Restaurantes",
+                        margin=dict(l=20, r=20, t=40, b=20)
+                    )
+                    return fig_diversity
+
+                mostrar_grafico('cidades_diversidade', top_diversity, _construir_diversity)
+            else:
+                st.info(f"Nenhuma cidade encontrada nos países selecionados")
+        
+        # Segunda linha de gráficos
+        st.subheader("⭐ Análise de Qualidade por Cidade - Média de Avaliação")
+        
+        # Calcular média de avaliação por cidade, separada pela nota de corte (4)
+        notas_cidades = agregados_cidades['nota_media']
+        city_ratings_above_4 = notas_cidades[notas_cidades > nota_corte]
+        city_ratings_below_4 = notas_cidades[notas_cidades < nota_corte]
+        
+        # Criar duas colunas para os gráficos
+        col_above_4, col_below_4 = st.columns(2)
+        
+        with col_above_4:
+            # Gráfico 4: Cidades com média acima de 4
+            if len(city_ratings_above_4) > 0:
+                # Adaptar o número de cidades mostradas (7, 5, 3 ou todas), maiores médias primeiro
+                top_cities = topo(city_ratings_above_4, tamanho_ranking(len(city_ratings_above_4), (7, 5, 3)))
+                
+                def _construir_top_cities():
+                    fig_top_cities = px.bar(
+                        x=top_cities.values,
+                        y=top_cities.index,
+                        orientation='h',
+                        title="⭐ Cidades com Média Acima de 4",
+                        color_discrete_sequence=['#FF6B6B']
+                    )
+                    fig_top_cities.update_layout(
+                        showlegend=False, 
+                        height=400,
+                        xaxis_title="Avaliação Média",
+                        yaxis_title="Cidade",
+                        margin=dict(l=20, r=20, t=40, b=20)
+                    )
+                    return fig_top_cities
+
+                mostrar_grafico('cidades_acima_4', top_cities, _construir_top_cities)
+            else:
+                st.info(f"Nenhuma cidade encontrada com média de avaliação acima de 4.0")
+        
+        with col_below_4:
+            # Gráfico 5: Cidades com média abaixo de 4
+            if len(city_ratings_below_4) > 0:
+                # Adaptar o número de cidades mostradas (10, 7, 5 ou todas), menores médias primeiro
+                below_4_cities = topo(city_ratings_below_4, tamanho_ranking(len(city_ratings_below_4), (10, 7, 5)),
+                                      crescente=True)
+                
+                def _construir_below_4_cities():
+                    fig_below_4_cities = px.bar(
+                        x=below_4_cities.values,
+                        y=below_4_cities.index,
+                        orientation='h',
+                        title="⭐ Cidades com Média Abaixo de 4",
+                        color_discrete_sequence=['#FFA500']  # Cor laranja para diferenciar
+                    )
+                    fig_below_4_cities.update_layout(
+                        showlegend=False, 
+                        height=400,
+                        xaxis_title="Avaliação Média",
+                        yaxis_title="Cidade",
+                        margin=dict(l=20, r=20, t=40, b=20)
+                    )
+                    return fig_below_4_cities
+
+                mostrar_grafico('cidades_abaixo_4', below_4_cities, _construir_below_4_cities)
+            else:
+                st.info(f"Nenhuma cidade encontrada com média de avaliação abaixo de 4.0")
+        
+        # Footer da página cidades
+        st.markdown("---")
+        st.markdown("**Criado com Streamlit por Leonardo Serpa**")
+
+    # MAPA (com muitos restaurantes na área, os pontos são agrupados no servidor)
+    elif page == "Mapa":
+        st.title("🗺️ Mapa de Restaurantes")
+        df = base.df
+        
+        # Acima deste número de restaurantes na área o mapa mostra agrupamentos
+        limite_pontos_mapa = 2000
+        
+        # Filtros no sidebar
+        st.sidebar.header("🔍 Filtros")
+        
+        countries_mapa = ['Todos'] + base.valores('Country')
+        selected_country_mapa = st.sidebar.selectbox("🌍 País", countries_mapa, key="f_mapa_pais")
+        
+        if selected_country_mapa == 'Todos':
+            cities_mapa = ['Todos'] + base.valores('City')
+        else:
+            cities_mapa = ['Todos'] + base.valores('City', {'Country': selected_country_mapa})
+        selected_city_mapa = st.sidebar.selectbox("🏙️ Cidade", cities_mapa, key="f_mapa_cidade")
+        
+        min_rating_mapa = st.sidebar.slider("⭐ Avaliação Mínima", 0.0, 5.0, 0.0, 0.1, key="f_mapa_nota")
+        resolucao_mapa = st.sidebar.slider("🔲 Resolução do Agrupamento", 20, 150, 60, 10, key="f_mapa_resolucao")
+        
+        filtros_mapa = {}
+        if selected_country_mapa != 'Todos':
+            filtros_mapa['Country'] = selected_country_mapa
+        if selected_city_mapa != 'Todos':
+            filtros_mapa['City'] = selected_city_mapa
+        
+        indice_espacial = base.indice_espacial
+        
+        def _area_mapa():
+            linhas = base.indice_filtros.filtrar(filtros_mapa, nota_minima=min_rating_mapa)
+            localizadas = linhas[indice_espacial.validas[linhas]]
+            sem_localizacao = len(linhas) - len(localizadas)
+            if not len(localizadas):
+                return {'linhas': linhas, 'visiveis': localizadas, 'limites': None, 'sem_localizacao': sem_localizacao}
+            # Área visível: extensão da seleção sem os 0,5% de pontos mais afastados
+            lon = indice_espacial.lon[localizadas]
+            lat = indice_espacial.lat[localizadas]
+            limites = (
+                float(np.quantile(lon, 0.005)), float(np.quantile(lat, 0.005)),
+                float(np.quantile(lon, 0.995)), float(np.quantile(lat, 0.995)),
+            )
+            visiveis = base.indice_filtros.filtrar(
+                filtros_mapa, nota_minima=min_rating_mapa, restringir_a=indice_espacial.na_area(*limites)
+            )
+            linhas.setflags(write=False)
+            visiveis.setflags(write=False)
+            return {'linhas': linhas, 'visiveis': visiveis, 'limites': limites, 'sem_localizacao': sem_localizacao}
+        
+        chave_mapa = chave_filtros(
+            'mapa',
+            paises=[selected_country_mapa] if selected_country_mapa != 'Todos' else None,
+            cidade=filtros_mapa.get('City'),
+            nota_minima=min_rating_mapa,
+            versao=base.versao,
         )
-        fig_cities_ranking.update_layout(
-            showlegend=False, 
-            height=400,
-            xaxis_title="Quantidade de Restaurantes",
-            yaxis_title="Cidade",
-            margin=dict(l=20, r=20, t=40, b=20)
+        with perfil.etapa("filtro") as etapa_filtro:
+            area_mapa = cache_resultados.obter(chave_mapa, _area_mapa)
+            etapa_filtro['linhas'] = len(area_mapa['visiveis'])
+        visiveis_mapa = area_mapa['visiveis']
+        limites_mapa = area_mapa['limites']
+        
+        st.info(
+            f"📍 **Restaurantes na área:** {len(visiveis_mapa)} | "
+            f"**Sem localização:** {area_mapa['sem_localizacao']}"
         )
-        st.plotly_chart(fig_cities_ranking, width='stretch')
-    
-    with col_diversity:
-        # Gráfico 3: Top cidades com mais restaurantes e tipos de culinárias principais distintos
-        if len(city_diversity) > 0:
-            # Adaptar o número de cidades mostradas
-            if len(city_diversity) >= 10:
-                top_diversity = city_diversity.head(10)
-                title_diversity = "Top 10 Cidades"
-            elif len(city_diversity) >= 7:
-                top_diversity = city_diversity.head(7)
-                title_diversity = "Top 7 Cidades"
-            elif len(city_diversity) >= 5:
-                top_diversity = city_diversity.head(5)
-                title_diversity = "Top 5 Cidades"
+        
+        if limites_mapa is None:
+            st.warning("Nenhum restaurante com localização encontrado para os filtros selecionados.")
+        else:
+            # Centro e zoom que enquadram a área visível
+            centro_mapa = {'lon': (limites_mapa[0] + limites_mapa[2]) / 2, 'lat': (limites_mapa[1] + limites_mapa[3]) / 2}
+            extensao = max(limites_mapa[2] - limites_mapa[0], (limites_mapa[3] - limites_mapa[1]) * 2, 0.01)
+            zoom_mapa = float(np.clip(np.log2(360 / extensao) - 0.5, 0, 15))
+            
+            if len(visiveis_mapa) <= limite_pontos_mapa:
+                pontos_mapa = df.iloc[visiveis_mapa][
+                    ['Restaurant Name', 'City', 'Cuisine_Principal', 'Aggregate rating', 'Longitude', 'Latitude']
+                ]
+                def _construir_pontos_mapa():
+                    fig_mapa = px.scatter_map(
+                        pontos_mapa,
+                        lon='Longitude',
+                        lat='Latitude',
+                        color='Aggregate rating',
+                        color_continuous_scale='RdYlGn',
+                        range_color=[0, 5],
+                        hover_name='Restaurant Name',
+                        hover_data={'City': True, 'Cuisine_Principal': True, 'Longitude': False, 'Latitude': False},
+                        center=centro_mapa,
+                        zoom=zoom_mapa,
+                        title="📍 Restaurantes",
+                        labels={'Aggregate rating': 'Avaliação', 'City': 'Cidade', 'Cuisine_Principal': 'Culinária'}
+                    )
+                    fig_mapa.update_layout(height=600, margin=dict(l=0, r=0, t=40, b=0))
+                    return fig_mapa
+
+                mostrar_grafico('mapa_pontos', pontos_mapa, _construir_pontos_mapa,
+                                parametros={'centro': centro_mapa, 'zoom': zoom_mapa})
             else:
-                top_diversity = city_diversity
-                title_diversity = f"Todas as {len(city_diversity)} Cidades"
+                with perfil.etapa("agregacao", linhas=len(visiveis_mapa)):
+                    grade_mapa = cache_resultados.obter(
+                        (chave_mapa, 'grade', resolucao_mapa),
+                        lambda: indice_espacial.agrupar(
+                            visiveis_mapa, divisoes=resolucao_mapa, notas=df['Aggregate rating'].to_numpy(dtype=float)
+                        )
+                    )
+                st.caption(f"{len(visiveis_mapa)} restaurantes agrupados em {len(grade_mapa)} áreas (tamanho = quantidade, cor = nota média)")
+                def _construir_grade_mapa():
+                    fig_mapa = px.scatter_map(
+                        grade_mapa,
+                        lon='Longitude',
+                        lat='Latitude',
+                        size='restaurantes',
+                        color='nota_media',
+                        color_continuous_scale='RdYlGn',
+                        range_color=[0, 5],
+                        size_max=40,
+                        hover_data={'restaurantes': True, 'nota_media': ':.2f', 'Longitude': False, 'Latitude': False},
+                        center=centro_mapa,
+                        zoom=zoom_mapa,
+                        title="📍 Restaurantes Agrupados por Área",
+                        labels={'restaurantes': 'Restaurantes', 'nota_media': 'Nota Média'}
+                    )
+                    fig_mapa.update_layout(height=600, margin=dict(l=0, r=0, t=40, b=0))
+                    return fig_mapa
+
+                mostrar_grafico('mapa_grade', grade_mapa, _construir_grade_mapa,
+                                parametros={'centro': centro_mapa, 'zoom': zoom_mapa})
             
-            # Criar gráfico de barras com duas métricas
-            fig_diversity = px.bar(
-                 x=top_diversity.index,
-                 y=top_diversity['Total_Restaurantes'],
-                 title="🍕 Top Cidades com Mais Restaurantes e Diversidade Culinária",
-                 color_discrete_sequence=['#FFD700'],  # Cor dourada para destacar
-                 labels={'x': 'Cidade', 'y': 'Total de Restaurantes'}
-             )
+            # Restaurantes mais próximos de um ponto (entre os filtrados)
+            st.subheader("📍 Restaurantes Próximos de um Ponto")
+            col1, col2, col3 = st.columns([2, 2, 1])
             
-            # Adicionar anotações com a quantidade de tipos de culinárias principais
-            for i, (city, row) in enumerate(top_diversity.iterrows()):
-                fig_diversity.add_annotation(
-                    x=city,
-                    y=row['Total_Restaurantes'] + (row['Total_Restaurantes'] * 0.05),  # Posicionar acima da barra
-                    text=f"🍕 {int(row['Tipos_Culinarias_Principais_Unicos'])} tipos",
-                    showarrow=False,
-                    font=dict(size=10, color='#FF6B6B'),
-                    bgcolor='rgba(255, 255, 255, 0.8)',
-                    bordercolor='#FF6B6B',
-                    borderwidth=1
-                )
+            with col1:
+                lat_ponto = st.number_input("Latitude", -90.0, 90.0, round(centro_mapa['lat'], 4), format="%.4f")
             
-            fig_diversity.update_layout(
-                showlegend=False,
-                height=400,
-                xaxis_title="Cidade",
-                yaxis_title="Total de Restaurantes",
-                margin=dict(l=20, r=20, t=40, b=20)
-            )
+            with col2:
+                lon_ponto = st.number_input("Longitude", -180.0, 180.0, round(centro_mapa['lon'], 4), format="%.4f")
             
-            st.plotly_chart(fig_diversity, width='stretch')
-        else:
-            st.info(f"Nenhuma cidade encontrada nos países selecionados")
-    
-    # Segunda linha de gráficos
-    st.subheader("⭐ Análise de Qualidade por Cidade - Média de Avaliação")
-    
-    # Calcular média de avaliação por cidade
-    city_ratings = df_filtered.groupby('City')['Aggregate rating'].mean()
-    
-    # Criar duas colunas para os gráficos
-    col_above_4, col_below_4 = st.columns(2)
-    
-    with col_above_4:
-        # Gráfico 4: Cidades com média acima de 4
-        city_ratings_above_4 = city_ratings[city_ratings > 4.0].sort_values(ascending=False)
-        
-        if len(city_ratings_above_4) > 0:
-            # Adaptar o número de cidades mostradas
-            if len(city_ratings_above_4) >= 7:
-                top_cities = city_ratings_above_4.head(7)
-                title_top = "Top 7 Cidades com Média Acima de 4"
-            elif len(city_ratings_above_4) >= 5:
-                top_cities = city_ratings_above_4.head(5)
-                title_top = "Top 5 Cidades com Média Acima de 4"
-            elif len(city_ratings_above_4) >= 3:
-                top_cities = city_ratings_above_4.head(3)
-                title_top = "Top 3 Cidades com Média Acima de 4"
-            else:
-                top_cities = city_ratings_above_4
-                title_top = f"Todas as {len(city_ratings_above_4)} Cidades com Média Acima de 4"
+            with col3:
+                k_proximos = st.number_input("Quantidade", 1, 100, 10)
+            
+            def _proximos():
+                permitidas = np.zeros(len(df), dtype=bool)
+                permitidas[area_mapa['linhas']] = True
+                linhas, distancias = indice_espacial.proximos(lon_ponto, lat_ponto, k=k_proximos, permitidas=permitidas)
+                linhas.setflags(write=False)
+                distancias.setflags(write=False)
+                return linhas, distancias
+            
+            # Um ponto longe dos restaurantes examina quase todas as linhas: fica no cache
+            with perfil.etapa("proximos"):
+                linhas_proximas, distancias = cache_resultados.obter(
+                    (chave_mapa, 'proximos', lon_ponto, lat_ponto, k_proximos), _proximos
+                )
             
-            fig_top_cities = px.bar(
-                x=top_cities.values,
-                y=top_cities.index,
-                orientation='h',
-                title="⭐ Cidades com Média Acima de 4",
-                color_discrete_sequence=['#FF6B6B']
+            proximos_df = df.iloc[linhas_proximas][['Restaurant Name', 'City', 'Address', 'Cuisine_Principal', 'Aggregate rating']].copy()
+            proximos_df.insert(0, 'Distância (km)', np.round(distancias, 2))
+            st.dataframe(proximos_df, width='stretch', hide_index=True)
+        
+        # Footer da página mapa
+        st.markdown("---")
+        st.markdown("**Criado com Streamlit por Leonardo Serpa**")
+
+    # ADMINISTRAÇÃO (estado do cache compartilhado)
+    elif page == "Administração":
+        st.title("⚙️ Administração")
+        
+        st.subheader("🗄️ Cache de Resultados")
+        estatisticas = cache_resultados.estatisticas()
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric(
+                label="Itens",
+                value=f"{estatisticas['itens']} / {estatisticas['max_itens']}",
+                help="Resultados guardados no cache e limite máximo"
             )
-            fig_top_cities.update_layout(
-                showlegend=False, 
-                height=400,
-                xaxis_title="Avaliação Média",
-                yaxis_title="Cidade",
-                margin=dict(l=20, r=20, t=40, b=20)
+        
+        with col2:
+            st.metric(
+                label="Acertos",
+                value=estatisticas['acertos'],
+                help="Consultas respondidas pelo cache"
             )
-            st.plotly_chart(fig_top_cities, width='stretch')
-        else:
-            st.info(f"Nenhuma cidade encontrada com média de avaliação acima de 4.0")
-    
-    with col_below_4:
-        # Gráfico 5: Cidades com média abaixo de 4
-        city_ratings_below_4 = city_ratings[city_ratings < 4.0].sort_values(ascending=True)
-        
-        if len(city_ratings_below_4) > 0:
-            # Adaptar o número de cidades mostradas
-            if len(city_ratings_below_4) >= 10:
-                below_4_cities = city_ratings_below_4.head(10)
-                title_below_4 = "Top 10 Cidades com Média Abaixo de 4"
-            elif len(city_ratings_below_4) >= 7:
-                below_4_cities = city_ratings_below_4.head(7)
-                title_below_4 = "Top 7 Cidades com Média Abaixo de 4"
-            elif len(city_ratings_below_4) >= 5:
-                below_4_cities = city_ratings_below_4.head(5)
-                title_below_4 = "Top 5 Cidades com Média Abaixo de 4"
-            else:
-                below_4_cities = city_ratings_below_4
-                title_below_4 = f"Todas as {len(city_ratings_below_4)} Cidades com Média Abaixo de 4"
-            
-            fig_below_4_cities = px.bar(
-                x=below_4_cities.values,
-                y=below_4_cities.index,
-                orientation='h',
-                title="⭐ Cidades com Média Abaixo de 4",
-                color_discrete_sequence=['#FFA500']  # Cor laranja para diferenciar
+        
+        with col3:
+            st.metric(
+                label="Falhas",
+                value=estatisticas['falhas'],
+                help="Consultas que precisaram ser calculadas"
+            )
+        
+        with col4:
+            st.metric(
+                label="Taxa de Acerto",
+                value=f"{estatisticas['taxa_acerto']:.1%}",
+                help="Acertos sobre o total de consultas"
+            )
+        
+        st.caption(f"TTL: {estatisticas['ttl']}s | Descartes (LRU): {estatisticas['descartes']} | Expirados: {estatisticas['expirados']}")
+        
+        st.subheader("📈 Gráficos")
+        estatisticas_graficos = fabrica_graficos.estatisticas()
+        st.caption(f"Figuras em cache: {estatisticas_graficos['itens']} / {estatisticas_graficos['max_itens']} | Reaproveitamento: {estatisticas_graficos['taxa_acerto']:.1%}")
+        st.dataframe(
+            fabrica_graficos.tempos().rename(columns={
+                'construcoes': 'Construções',
+                'usos': 'Usos',
+                'construcao_ms': 'Construção (ms)',
+                'serializacao_ms': 'Serialização (ms)'
+            }),
+            width='stretch'
+        )
+        
+        st.subheader("⏱️ Tempo por Etapa (últimos reruns)")
+        st.dataframe(load_historico_perfis().resumo(), width='stretch')
+        
+        st.subheader("📥 Ingestão Incremental")
+        if base.fora_da_memoria:
+            st.caption(
+                f"Modo particionado: {len(base)} restaurantes em {base.pasta} "
+                f"({base.armazem.grupos_total} row groups). Os deltas e a atualização automática só funcionam no modo em memória."
             )
-            fig_below_4_cities.update_layout(
-                showlegend=False, 
-                height=400,
-                xaxis_title="Avaliação Média",
-                yaxis_title="Cidade",
-                margin=dict(l=20, r=20, t=40, b=20)
+        pendentes = [] if base.fora_da_memoria else deltas_pendentes(aplicados=base.deltas)
+        st.caption(
+            f"Versão da base: {base.versao} | Restaurantes: {len(base)} | "
+            f"Deltas aplicados: {len(base.deltas)} | Pendentes na pasta deltas/: {len(pendentes)}"
+        )
+        compartilhada = load_base()
+        if compartilhada.ultima_verificacao:
+            st.caption(
+                "Atualização automática: última verificação às "
+                f"{pd.Timestamp(compartilhada.ultima_verificacao, unit='s', tz='UTC'):%H:%M:%S} UTC"
             )
-            st.plotly_chart(fig_below_4_cities, width='stretch')
-        else:
-            st.info(f"Nenhuma cidade encontrada com média de avaliação abaixo de 4.0")
-    
-    # Footer da página cidades
-    st.markdown("---")
-    st.markdown("**Criado com Streamlit por Leonardo Serpa**")
\ No newline at end of file
+        if compartilhada.ultimo_erro:
+            st.warning(f"A última recarga falhou e a versão anterior continua no ar: {compartilhada.ultimo_erro}")
+        if st.button("📥 Aplicar Deltas Pendentes", disabled=not pendentes):
+            resumo_deltas = compartilhada.aplicar_pendentes()
+            st.session_state["resumo_deltas"] = resumo_deltas
+            st.rerun()
+        if st.session_state.get("resumo_deltas"):
+            st.dataframe(pd.DataFrame(st.session_state["resumo_deltas"]), width='stretch', hide_index=True)
+        
+        if st.button("🧹 Limpar Cache"):
+            cache_resultados.limpar()
+            st.rerun()
+finally:
+    # Fechar o perfil do rerun: registro no log e histórico
+    registro_perfil = perfil.finalizar()
+    load_historico_perfis().adicionar(registro_perfil)
+
+# Painel de depuração (só nos reruns que chegaram ao fim)
+if modo_debug:
+    with st.sidebar.expander("🐞 Perfil do Rerun", expanded=True):
+        st.caption(f"Total: {registro_perfil['total_ms']:.1f} ms")
+        st.dataframe(perfil.tabela(), width='stretch', hide_index=True)
+        st.download_button(
+            "⬇️ Exportar JSON",
+            data=json.dumps(registro_perfil, ensure_ascii=False, indent=2),
+            file_name="perfil_rerun.json",
+            mime="application/json"
+        )
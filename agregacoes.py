@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+# Dimensões do cubo
+dimensoes = ['Country', 'City', 'Cuisine_Principal']
+
+# Medidas agregadas: nome curto -> coluna do dataset
+medidas = {
+    'custo': 'Average Cost for two',
+    'nota': 'Aggregate rating',
+    'votos': 'Votes',
+}
+
+
+def _contribuicoes(df):
+    """Células do cubo calculadas só com as linhas de `df`."""
+    base = df[dimensoes].copy()
+    base['restaurantes'] = 1
+    for nome, coluna in medidas.items():
+        valores = df[coluna].astype('float64')
+        base[f'{nome}_n'] = valores.notna().astype(np.int64)
+        base[f'{nome}_soma'] = valores.fillna(0)
+        base[f'{nome}_quad'] = valores.fillna(0) ** 2
+    return base.groupby(dimensoes, dropna=False, sort=True, observed=True).sum().reset_index()
+
+
+class CuboAgregado:
+    """
+    Cubo materializado país × cidade × culinária principal.
+
+    Cada célula guarda a quantidade de restaurantes e, para cada medida,
+    a quantidade de valores não nulos, a soma e a soma dos quadrados.
+    As contagens distintas (cidades por país, culinárias por cidade) saem
+    exatas das próprias chaves do cubo. As páginas Países e Cidades
+    consolidam apenas as células dos países selecionados, então o custo
+    depende do número de grupos e não do número de restaurantes.
+    """
+
+    def __init__(self, df):
+        self._montar(_contribuicoes(df))
+
+    @classmethod
+    def de_lotes(cls, lotes):
+        """
+        Cubo somado lote a lote (DataFrames com as dimensões e as medidas),
+        sem ter todas as linhas em memória ao mesmo tempo: cada lote vira
+        células e só as células são juntadas.
+        """
+        partes = [_contribuicoes(lote) for lote in lotes]
+        if not partes:
+            partes = [_contribuicoes(pd.DataFrame({coluna: pd.Series(dtype=object) for coluna in dimensoes}
+                                                  | {coluna: pd.Series(dtype=float) for coluna in medidas.values()}))]
+        cubo = pd.concat(partes, ignore_index=True).groupby(dimensoes, dropna=False, sort=True).sum().reset_index()
+        cubo = cubo.astype({dimensao: 'category' for dimensao in dimensoes})
+
+        novo = cls.__new__(cls)
+        novo._montar(cubo)
+        return novo
+
+    def _montar(self, cubo):
+        self.celulas = cubo
+
+        # Fatias contíguas do cubo por país (o cubo está ordenado por país)
+        self._fatias = {}
+        for pais, posicoes in cubo.groupby('Country', dropna=False, sort=False, observed=True).indices.items():
+            self._fatias[pais] = slice(posicoes[0], posicoes[-1] + 1)
+
+    def atualizar(self, removidas, adicionadas):
+        """
+        Cubo após um delta: subtrai as células das linhas `removidas` (com
+        os valores antigos), soma as das `adicionadas` e descarta as células
+        que ficaram vazias. O custo depende do número de células e do
+        tamanho do delta, não do número de restaurantes.
+        """
+        diferenca = _contribuicoes(removidas)
+        colunas = diferenca.columns.difference(dimensoes)
+        diferenca[colunas] = -diferenca[colunas]
+        # Categorias novas no delta: as dimensões viram texto antes de juntar
+        como_texto = {dimensao: object for dimensao in dimensoes}
+        partes = [parte.astype(como_texto) for parte in (self.celulas, diferenca, _contribuicoes(adicionadas))]
+        cubo = pd.concat(partes, ignore_index=True).groupby(dimensoes, dropna=False, sort=True).sum().reset_index()
+        cubo = cubo[cubo['restaurantes'] > 0].reset_index(drop=True)
+        cubo = cubo.astype({dimensao: 'category' for dimensao in dimensoes})
+
+        novo = CuboAgregado.__new__(CuboAgregado)
+        novo._montar(cubo)
+        return novo
+
+    def selecionar(self, paises=None):
+        """Células do cubo dos países escolhidos (todos se vazio)."""
+        if not paises:
+            return self.celulas
+        fatias = [self.celulas.iloc[self._fatias[pais]] for pais in paises if pais in self._fatias]
+        if not fatias:
+            return self.celulas.iloc[:0]
+        return pd.concat(fatias)
+
+    def totais(self, paises=None):
+        """Total de cidades e de restaurantes da seleção."""
+        celulas = self.selecionar(paises)
+        return celulas['City'].nunique(), int(celulas['restaurantes'].sum())
+
+    def por_pais(self, paises=None):
+        """Restaurantes, custo médio para dois, cidades e votos por país."""
+        grupos = self.selecionar(paises).groupby('Country', observed=True)
+        return pd.DataFrame({
+            'restaurantes': grupos['restaurantes'].sum(),
+            'custo_medio': grupos['custo_soma'].sum() / grupos['custo_n'].sum(),
+            'cidades': grupos['City'].nunique(),
+            'votos': grupos['votos_soma'].sum().astype(np.int64),
+        })
+
+    def por_cidade(self, paises=None):
+        """Restaurantes, culinárias principais distintas e nota média por cidade."""
+        grupos = self.selecionar(paises).groupby('City', observed=True)
+        return pd.DataFrame({
+            'restaurantes': grupos['restaurantes'].sum(),
+            'culinarias': grupos['Cuisine_Principal'].nunique(),
+            'nota_media': grupos['nota_soma'].sum() / grupos['nota_n'].sum(),
+        })
+
+    def por_culinaria(self, paises=None):
+        """Quantidade de restaurantes por culinária principal (decrescente)."""
+        contagens = self.selecionar(paises).groupby('Cuisine_Principal', observed=True)['restaurantes'].sum()
+        return contagens.sort_values(ascending=False, kind='stable')
@@ -0,0 +1,141 @@
+"""
+API HTTP/JSON local com as consultas do dashboard (consultas.py).
+
+Rotas:
+    GET  /v1/restaurantes  filtros da Página Principal e uma página da tabela
+                           (pais, cidade, culinaria, nota_minima, preco,
+                           culinarias, todas, busca, pagina, tamanho,
+                           ordenar_por, crescente, coluna)
+    GET  /v1/paises        agregados por país (?pais=Brazil&pais=India)
+    GET  /v1/cidades       ranking, diversidade e notas por cidade (?pais=...)
+    POST /v1/lote          {"consultas": [{"rota", "parametros", "etag"}]},
+                           todas respondidas sobre a mesma versão da base
+    GET  /v1/saude         versão e tamanho da base
+
+As respostas têm ETag; com If-None-Match igual à ETag atual a resposta é
+304 sem corpo. A base é recarregada em segundo plano como no app; a API
+usa sempre o modo em memória, mesmo para CSVs grandes.
+
+Uso:
+    python api.py --porta 8502
+    curl 'http://localhost:8502/v1/restaurantes?pais=Brazil&nota_minima=4'
+"""
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from consultas import MotorConsultas
+from ingestao import BaseCompartilhada, pasta_deltas
+
+prefixo = '/v1/'
+
+# Maior corpo aceito no POST /v1/lote
+tamanho_maximo_lote = 1_000_000
+
+
+class ManipuladorConsultas(BaseHTTPRequestHandler):
+    # Conexões persistentes: clientes com muitas consultas não reabrem o socket
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalhos e corpo saem em dois envios; com Nagle o segundo espera o ACK
+    disable_nagle_algorithm = True
+
+    @property
+    def motor(self):
+        return self.server.motor
+
+    def log_message(self, formato, *args):
+        if self.server.verboso:
+            super().log_message(formato, *args)
+
+    def _responder(self, status, corpo=b'', etag=None):
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        if status != 304:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(corpo)
+
+    def _erro(self, status, mensagem):
+        self._responder(status, json.dumps({'erro': mensagem}, ensure_ascii=False).encode('utf-8'))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if not url.path.startswith(prefixo):
+            return self._erro(404, f"rota desconhecida: {url.path}")
+        rota = url.path[len(prefixo):].strip('/')
+        if rota == 'saude':
+            base = self.motor.compartilhada.atual
+            corpo = {'versao': base.versao, 'restaurantes': len(base), 'deltas': list(base.deltas)}
+            return self._responder(200, json.dumps(corpo).encode('utf-8'))
+        try:
+            status, etag, corpo = self.motor.consultar(rota, parse_qs(url.query), self.headers.get('If-None-Match'))
+        except KeyError:
+            return self._erro(404, f"rota desconhecida: {url.path}")
+        except ValueError as erro:
+            return self._erro(400, str(erro))
+        self._responder(status, corpo, etag)
+
+    def do_POST(self):
+        if urlsplit(self.path).path.rstrip('/') != prefixo + 'lote':
+            return self._erro(404, f"rota desconhecida: {self.path}")
+        try:
+            tamanho = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            tamanho = -1
+        if tamanho < 0:
+            # Sem saber onde o corpo acaba, a conexão não pode ser reaproveitada
+            self.close_connection = True
+            return self._erro(400, "Content-Length inválido")
+        if tamanho > tamanho_maximo_lote:
+            # O corpo não é lido: a conexão não pode ser reaproveitada
+            self.close_connection = True
+            return self._erro(413, "lote grande demais")
+        try:
+            pedido = json.loads(self.rfile.read(tamanho) or b'{}')
+            consultas = pedido['consultas']
+            if not isinstance(consultas, list):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            return self._erro(400, 'o corpo deve ser {"consultas": [...]}')
+        self._responder(200, self.motor.lote(consultas))
+
+
+def criar_servidor(motor, host='127.0.0.1', porta=8502, verboso=False):
+    servidor = ThreadingHTTPServer((host, porta), ManipuladorConsultas)
+    servidor.daemon_threads = True
+    servidor.motor = motor
+    servidor.verboso = verboso
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8502)
+    parser.add_argument('--dataset', default='dataset_atualizado.csv')
+    parser.add_argument('--deltas', default=pasta_deltas)
+    parser.add_argument('--intervalo', type=float, default=10.0,
+                        help="Segundos entre as verificações do CSV e dos deltas")
+    parser.add_argument('--verboso', action='store_true', help="Registra cada requisição")
+    args = parser.parse_args()
+
+    compartilhada = BaseCompartilhada.carregar(args.dataset, pasta=args.deltas)
+    compartilhada.iniciar_monitor(intervalo=args.intervalo)
+    servidor = criar_servidor(MotorConsultas(compartilhada), args.host, args.porta, args.verboso)
+    print(f"API em http://{args.host}:{args.porta}{prefixo} (versão {compartilhada.atual.versao})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        compartilhada.parar_monitor()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""
+Modo aproximado das páginas Países e Cidades no modo particionado.
+
+No modo particionado a primeira consulta de uma seleção de países soma o
+cubo percorrendo todo o armazenamento desses países (com todos os
+países, o dataset inteiro). O modo aproximado responde sem ler o
+armazenamento, a partir do que é mantido por estrato (país × cidade)
+durante a gravação:
+- a quantidade exata de restaurantes: restaurantes e cidades saem exatos
+- uma amostra uniforme do estrato: cada restaurante recebe uma chave
+  aleatória e ficam as `linhas_por_estrato` menores chaves e todas as
+  abaixo de `fracao_amostra` (cidades grandes têm amostras maiores); a
+  amostra de cada lote se junta à dos anteriores sem reler nada
+- um esboço HyperLogLog das culinárias principais da cidade
+
+Médias, somas e restaurantes por culinária vêm da amostra estratificada,
+com margem de erro de 95% (com correção de população finita: um estrato
+que cabe inteiro na amostra não tem erro); as culinárias distintas por
+cidade vêm dos esboços, com erro padrão relativo de 1.04 / √m.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from agregacoes import medidas
+
+# Amostra de cada estrato (país × cidade): pelo menos estas linhas (ou o
+# estrato inteiro) e, nos estratos grandes, esta fração deles
+linhas_por_estrato = 100
+fracao_amostra = 0.01
+
+# Registradores de cada esboço HyperLogLog: 2 ** precisao_hll
+precisao_hll = 8
+
+# Intervalo de confiança de 95%
+z_confianca = 1.96
+
+# Arquivos gravados ao lado do Parquet particionado (o "_" os tira do dataset)
+arquivo_amostra = '_amostra.parquet'
+arquivo_estratos = '_estratos.parquet'
+
+estratos = ['Country', 'City']
+colunas_amostra = estratos + ['Cuisine_Principal'] + list(medidas.values())
+
+
+def _hash(valores):
+    """Hash de 64 bits de cada valor (o mesmo entre execuções)."""
+    return pd.util.hash_array(np.asarray(valores, dtype=object))
+
+
+def registros_hll(hashes, grupos, n_grupos, precisao=precisao_hll):
+    """
+    Registradores HyperLogLog de cada grupo: os `precisao` bits altos do
+    hash escolhem o registrador, que guarda a maior posição do primeiro
+    bit 1 nos 32 bits seguintes.
+    """
+    indice = (hashes >> np.uint64(64 - precisao)).astype(np.int64)
+    resto = ((hashes >> np.uint64(32 - precisao)) & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    posicao = np.where(resto > 0, 32 - np.floor(np.log2(np.maximum(resto, 1))), 33).astype(np.uint8)
+    registros = np.zeros((n_grupos, 1 << precisao), dtype=np.uint8)
+    np.maximum.at(registros, (grupos, indice), posicao)
+    return registros
+
+
+def estimar_distintos(registros):
+    """Valores distintos estimados por linha de registradores (contagem linear nos pequenos)."""
+    m = registros.shape[-1]
+    alfa = 0.7213 / (1 + 1.079 / m)
+    estimativa = alfa * m * m / np.ldexp(1.0, -registros.astype(np.int64)).sum(axis=-1)
+    zeros = np.count_nonzero(registros == 0, axis=-1)
+    pequena = (estimativa <= 2.5 * m) & (zeros > 0)
+    return np.where(pequena, m * np.log(m / np.maximum(zeros, 1)), estimativa)
+
+
+class AmostraEstratificada:
+    """
+    Amostra, população e esboços por estrato, montados lote a lote na
+    gravação do armazenamento particionado.
+    """
+
+    def __init__(self, linhas_estrato=linhas_por_estrato, fracao=fracao_amostra, precisao=precisao_hll, semente=0):
+        self.linhas_estrato = linhas_estrato
+        self.fracao = fracao
+        self.precisao = precisao
+        self._aleatorio = np.random.default_rng(semente)
+        self._amostra = None
+        self._populacao = []
+        self._esbocos = {}
+
+    def adicionar(self, lote):
+        """Soma um lote limpo à população, à amostra e aos esboços."""
+        lote = lote[colunas_amostra].dropna(subset=estratos)
+        grupos = lote.groupby(estratos, sort=False)
+        self._populacao.append(grupos.size())
+
+        # As menores chaves do lote disputam com as da amostra atual
+        candidatas = lote.assign(_chave=self._aleatorio.random(len(lote)))
+        if self._amostra is not None:
+            candidatas = pd.concat([self._amostra, candidatas], ignore_index=True)
+        candidatas = candidatas.sort_values('_chave', kind='stable')
+        primeiras = candidatas.groupby(estratos, sort=False).cumcount() < self.linhas_estrato
+        self._amostra = candidatas[primeiras | (candidatas['_chave'] < self.fracao)]
+
+        culinarias = lote['Cuisine_Principal'].notna().to_numpy()
+        codigos = grupos.ngroup().to_numpy()
+        registros = registros_hll(_hash(lote['Cuisine_Principal'].to_numpy()[culinarias]), codigos[culinarias],
+                                  grupos.ngroups, self.precisao)
+        for chave, linha in zip(grupos.size().index, registros):
+            atual = self._esbocos.get(chave)
+            self._esbocos[chave] = linha if atual is None else np.maximum(atual, linha)
+
+    def gravar(self, pasta):
+        """Grava a amostra e a tabela de estratos (população e esboço) em `pasta`."""
+        populacao = pd.concat(self._populacao).groupby(level=[0, 1]).sum().sort_index()
+        tabela = pa.table({
+            'Country': pa.array(populacao.index.get_level_values(0), pa.string()),
+            'City': pa.array(populacao.index.get_level_values(1), pa.string()),
+            'restaurantes': pa.array(populacao.to_numpy(), pa.int64()),
+            'esboco': pa.array([self._esbocos[chave].tobytes() for chave in populacao.index],
+                               pa.binary(1 << self.precisao)),
+        })
+        pq.write_table(tabela, os.path.join(pasta, arquivo_estratos))
+        amostra = self._amostra.drop(columns='_chave').sort_values(estratos, kind='stable')
+        pq.write_table(pa.Table.from_pandas(amostra, preserve_index=False), os.path.join(pasta, arquivo_amostra))
+
+
+def _margem(variancia):
+    return z_confianca * np.sqrt(np.maximum(variancia, 0))
+
+
+class CuboAproximado:
+    """
+    Mesma interface do CuboAgregado (por_pais, por_cidade, por_culinaria,
+    totais), respondida pelos estratos. As médias, os votos e as
+    culinárias por cidade vêm com a coluna `<medida>_erro` (meia largura
+    do intervalo de 95%); `margens` resume o erro de uma seleção.
+
+    Na abertura a amostra é resumida por estrato, então cada consulta
+    consolida só os estratos dos países escolhidos.
+    """
+
+    def __init__(self, estratos_tabela, amostra):
+        estratos_df = estratos_tabela.select(estratos + ['restaurantes']).to_pandas()
+        m = estratos_tabela.schema.field('esboco').type.byte_width
+        registros = np.frombuffer(b''.join(estratos_tabela.column('esboco').to_pylist()), dtype=np.uint8)
+        self._registros = registros.reshape(-1, m)
+        self.erro_distintos = 1.04 / np.sqrt(m)
+
+        grupos = amostra.groupby(estratos, sort=False)
+        resumo = pd.DataFrame({'n': grupos.size()})
+        for nome, coluna in medidas.items():
+            resumo[f'{nome}_n'] = grupos[coluna].count()
+            resumo[f'{nome}_media'] = grupos[coluna].mean()
+            resumo[f'{nome}_var'] = grupos[coluna].var()
+        # Votos somam como no cubo exato (nulo conta zero)
+        votos = amostra[medidas['votos']].fillna(0).groupby([amostra[coluna] for coluna in estratos], sort=False)
+        resumo['votos_soma_media'] = votos.mean()
+        resumo['votos_soma_var'] = votos.var()
+        estratos_df = estratos_df.join(resumo, on=estratos)
+        # Fração de população fora da amostra (0 = estrato inteiro na amostra)
+        estratos_df['fpc'] = 1 - estratos_df['n'] / estratos_df['restaurantes']
+        self.estratos = estratos_df
+
+        # Estrato inteiro na amostra: culinárias distintas exatas
+        distintos = estimar_distintos(self._registros)
+        completos = amostra.groupby(estratos, sort=False)['Cuisine_Principal'].nunique()
+        exatos = estratos_df.join(completos.rename('exatas'), on=estratos)['exatas']
+        self._culinarias_exatas = np.where(estratos_df['fpc'].to_numpy() <= 0, exatos.to_numpy(), np.nan)
+        self._culinarias_estimadas = distintos
+
+        # Restaurantes por culinária principal de cada estrato na amostra
+        contagens = amostra.groupby(estratos + ['Cuisine_Principal'], sort=False).size().rename('c').reset_index()
+        contagens = contagens.merge(estratos_df[estratos + ['restaurantes', 'n', 'fpc']], on=estratos)
+        p = contagens['c'] / contagens['n']
+        contagens['estimativa'] = contagens['restaurantes'] * p
+        contagens['variancia'] = (contagens['restaurantes'] ** 2 * p * (1 - p)
+                                  / np.maximum(contagens['n'] - 1, 1) * contagens['fpc'])
+        self._contagens = contagens
+
+    @classmethod
+    def abrir(cls, pasta):
+        """Cubo aproximado do armazenamento em `pasta` (None se ele foi gravado sem amostra)."""
+        caminho_estratos = os.path.join(pasta, arquivo_estratos)
+        caminho_amostra = os.path.join(pasta, arquivo_amostra)
+        if not (os.path.exists(caminho_estratos) and os.path.exists(caminho_amostra)):
+            return None
+        return cls(pq.read_table(caminho_estratos), pq.read_table(caminho_amostra).to_pandas())
+
+    def _selecionar(self, paises):
+        if not paises:
+            return np.ones(len(self.estratos), dtype=bool)
+        return self.estratos['Country'].isin(list(paises)).to_numpy()
+
+    def totais(self, paises=None):
+        """Total de cidades e de restaurantes da seleção (exatos)."""
+        selecao = self.estratos[self._selecionar(paises)]
+        return selecao['City'].nunique(), int(selecao['restaurantes'].sum())
+
+    @staticmethod
+    def _media(estratos_df, nome, por):
+        """Média estratificada da medida (valores não nulos) e margem por grupo."""
+        n_validos = estratos_df[f'{nome}_n']
+        peso = (estratos_df['restaurantes'] * n_validos / estratos_df['n']).where(n_validos > 0, 0)
+        partes = pd.DataFrame({
+            por: estratos_df[por],
+            'peso': peso,
+            'soma': peso * estratos_df[f'{nome}_media'].fillna(0),
+            'variancia': (peso ** 2 * estratos_df[f'{nome}_var'].fillna(0)
+                          / n_validos.where(n_validos > 0, 1) * estratos_df['fpc']),
+        }).groupby(por, sort=False).sum()
+        return partes['soma'] / partes['peso'], _margem(partes['variancia']) / partes['peso']
+
+    def por_pais(self, paises=None):
+        """Restaurantes e cidades (exatos), custo médio e votos estimados por país."""
+        selecao = self.estratos[self._selecionar(paises)]
+        grupos = selecao.groupby('Country', sort=False)
+        custo, custo_erro = self._media(selecao, 'custo', 'Country')
+        votos = pd.DataFrame({
+            'Country': selecao['Country'],
+            'soma': selecao['restaurantes'] * selecao['votos_soma_media'],
+            'variancia': (selecao['restaurantes'] ** 2 * selecao['votos_soma_var'].fillna(0)
+                          / selecao['n'] * selecao['fpc']),
+        }).groupby('Country', sort=False).sum()
+        return pd.DataFrame({
+            'restaurantes': grupos['restaurantes'].sum(),
+            'custo_medio': custo,
+            'cidades': grupos['City'].nunique(),
+            'votos': votos['soma'].round().astype(np.int64),
+            'custo_medio_erro': custo_erro,
+            'votos_erro': _margem(votos['variancia']),
+        }).sort_index()
+
+    def por_cidade(self, paises=None):
+        """Restaurantes (exatos), culinárias distintas e nota média estimadas por cidade."""
+        mascara = self._selecionar(paises)
+        selecao = self.estratos[mascara]
+        nota, nota_erro = self._media(selecao, 'nota', 'City')
+
+        # Cidades de mesmo nome em países diferentes: os esboços se unem pelo máximo
+        codigos, cidades = pd.factorize(selecao['City'])
+        unidos = np.zeros((len(cidades), self._registros.shape[1]), dtype=np.uint8)
+        np.maximum.at(unidos, codigos, self._registros[mascara])
+        # Exato só quando a cidade é um estrato único, inteiro na amostra
+        por_codigo = pd.Series(self._culinarias_exatas[mascara]).groupby(codigos)
+        exatas = por_codigo.first().where(por_codigo.size() == 1)
+        culinarias = np.where(exatas.notna(), exatas, np.round(estimar_distintos(unidos)))
+        culinarias = pd.Series(culinarias.astype(np.int64), index=cidades)
+
+        return pd.DataFrame({
+            'restaurantes': selecao.groupby('City', sort=False)['restaurantes'].sum(),
+            'culinarias': culinarias,
+            'nota_media': nota,
+            'culinarias_erro': np.where(exatas.notna(), 0.0, culinarias * z_confianca * self.erro_distintos),
+            'nota_media_erro': nota_erro,
+        }).sort_index()
+
+    def por_culinaria(self, paises=None):
+        """Restaurantes estimados por culinária principal (decrescente)."""
+        return self._por_culinaria(paises)['estimativa']
+
+    def _por_culinaria(self, paises):
+        contagens = self._contagens
+        if paises:
+            contagens = contagens[contagens['Country'].isin(list(paises))]
+        somas = contagens.groupby('Cuisine_Principal', sort=False)[['estimativa', 'variancia']].sum()
+        somas['estimativa'] = somas['estimativa'].round().astype(np.int64)
+        return somas.sort_values('estimativa', ascending=False, kind='stable')
+
+    def margens(self, paises=None):
+        """Maior erro relativo (95%) de cada medida estimada na seleção."""
+        por_pais = self.por_pais(paises)
+        por_cidade = self.por_cidade(paises)
+        culinarias = self._por_culinaria(paises)
+
+        def relativo(erro, valor):
+            razao = (erro / valor.where(valor > 0)).replace([np.inf, -np.inf], np.nan)
+            return float(razao.max()) if razao.notna().any() else 0.0
+
+        return {
+            'custo_medio': relativo(por_pais['custo_medio_erro'], por_pais['custo_medio']),
+            'votos': relativo(por_pais['votos_erro'], por_pais['votos']),
+            'nota_media': float(por_cidade['nota_media_erro'].max()) if len(por_cidade) else 0.0,
+            'culinarias': relativo(por_cidade['culinarias_erro'], por_cidade['culinarias']),
+            'restaurantes_culinaria': relativo(_margem(culinarias['variancia']).head(10),
+                                               culinarias['estimativa'].head(10)),
+        }
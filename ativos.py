@@ -0,0 +1,163 @@
+"""
+Imagens da interface já no tamanho em que aparecem.
+
+Cada imagem de `imagens` é reduzida para a largura de exibição (e o
+dobro, para telas de alta densidade), gravada em WebP e em PNG otimizado
+com o hash do conteúdo no nome e servida pelo static file serving do
+Streamlit (pasta static/, no endereço app/static/...). O nome muda
+quando o conteúdo muda, então o navegador pode guardar os arquivos sem
+revalidar. O manifesto guarda o hash da imagem de origem: enquanto ela e
+a largura não mudam, nada é regerado.
+
+Uso (gera os arquivos e mostra os tamanhos):
+    python ativos.py
+"""
+import argparse
+import hashlib
+import html
+import io
+import json
+import os
+
+from PIL import Image
+
+from dados import _escrever_json, _gravar_atomico, _hash_arquivo
+
+# Pasta servida pelo Streamlit (server.enableStaticServing) e seu endereço
+pasta_estatica = 'static'
+rota_estatica = 'app/static'
+arquivo_manifesto = 'ativos.json'
+
+# Imagens da interface: origem e largura de exibição em pixels
+imagens = {
+    'logo': {'origem': 'img/img1.png', 'largura': 200},
+}
+
+# Densidades de tela geradas (1x e 2x) e formatos, do preferido ao fallback
+densidades = (1, 2)
+formatos = {
+    'webp': {'format': 'WEBP', 'quality': 85, 'method': 6},
+    'png': {'format': 'PNG', 'optimize': True},
+}
+
+
+def _escrever_bytes(caminho, conteudo):
+    with open(caminho, 'wb') as arquivo:
+        arquivo.write(conteudo)
+
+
+def _variante(imagem, largura, formato):
+    """Bytes da imagem reduzida para `largura` pixels no `formato`."""
+    altura = round(imagem.height * largura / imagem.width)
+    reduzida = imagem.resize((largura, altura), Image.LANCZOS) if largura < imagem.width else imagem
+    saida = io.BytesIO()
+    reduzida.save(saida, **formatos[formato])
+    return saida.getvalue()
+
+
+def _gerar(nome, origem, largura, pasta):
+    """Gera as variantes de uma imagem e devolve a entrada do manifesto."""
+    with Image.open(origem) as aberta:
+        imagem = aberta.convert('RGBA') if aberta.mode in ('P', 'LA') else aberta.copy()
+    entrada = {
+        'origem': _hash_arquivo(origem),
+        'largura': largura,
+        'altura': round(imagem.height * largura / imagem.width),
+        'variantes': {},
+    }
+    for formato in formatos:
+        arquivos = {}
+        for densidade in densidades:
+            pixels = min(largura * densidade, imagem.width)
+            conteudo = _variante(imagem, pixels, formato)
+            arquivo = f"{nome}-{pixels}w.{hashlib.sha256(conteudo).hexdigest()[:12]}.{formato}"
+            caminho = os.path.join(pasta, arquivo)
+            if not os.path.exists(caminho):
+                _gravar_atomico(caminho, lambda tmp: _escrever_bytes(tmp, conteudo))
+            arquivos[f'{densidade}x'] = arquivo
+        entrada['variantes'][formato] = arquivos
+    return entrada
+
+
+def gerar_ativos(pasta=pasta_estatica, imagens=imagens):
+    """
+    Gera (ou reaproveita) as variantes das imagens em `pasta`, remove as de
+    versões antigas e grava o manifesto. Retorna o manifesto.
+    """
+    caminho_manifesto = os.path.join(pasta, arquivo_manifesto)
+    manifesto = ler_manifesto(pasta)
+    os.makedirs(pasta, exist_ok=True)
+
+    novo = {}
+    for nome, imagem in imagens.items():
+        atual = manifesto.get(nome)
+        if (atual and atual.get('largura') == imagem['largura'] and atual.get('origem') == _hash_arquivo(imagem['origem'])
+                and all(os.path.exists(os.path.join(pasta, arquivo)) for arquivo in _arquivos({nome: atual}))):
+            novo[nome] = atual
+        else:
+            novo[nome] = _gerar(nome, imagem['origem'], imagem['largura'], pasta)
+
+    # Variantes do manifesto anterior que o novo não usa (imagem trocada ou
+    # redimensionada); outros arquivos da pasta não são tocados
+    for arquivo in _arquivos(manifesto) - _arquivos(novo):
+        try:
+            os.remove(os.path.join(pasta, arquivo))
+        except FileNotFoundError:
+            pass
+
+    if novo != manifesto:
+        _gravar_atomico(caminho_manifesto, lambda tmp: _escrever_json(tmp, novo))
+    return novo
+
+
+def _arquivos(manifesto):
+    """Nomes dos arquivos de todas as variantes do manifesto."""
+    return {arquivo for entrada in manifesto.values() for variantes in entrada.get('variantes', {}).values()
+            for arquivo in variantes.values()}
+
+
+def ler_manifesto(pasta=pasta_estatica):
+    try:
+        with open(os.path.join(pasta, arquivo_manifesto), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return {}
+
+
+def carregar_ativos(pasta=pasta_estatica):
+    """Manifesto atualizado; sem permissão de escrita, o que já estiver gerado."""
+    try:
+        return gerar_ativos(pasta)
+    except OSError:
+        return ler_manifesto(pasta)
+
+
+def html_imagem(manifesto, nome, alt=''):
+    """<picture> com as variantes da imagem: WebP e PNG, 1x e 2x."""
+    entrada = manifesto[nome]
+    fontes = {
+        formato: ', '.join(f"{rota_estatica}/{arquivo} {densidade}" for densidade, arquivo in variantes.items())
+        for formato, variantes in entrada['variantes'].items()
+    }
+    return (
+        f'<picture><source type="image/webp" srcset="{fontes["webp"]}">'
+        f'<img src="{rota_estatica}/{entrada["variantes"]["png"]["1x"]}" srcset="{fontes["png"]}" '
+        f'width="{entrada["largura"]}" height="{entrada["altura"]}" alt="{html.escape(alt)}"></picture>'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pasta', default=pasta_estatica)
+    args = parser.parse_args()
+
+    manifesto = gerar_ativos(args.pasta)
+    for nome, entrada in manifesto.items():
+        print(f"{nome}: {imagens[nome]['origem']} ({os.path.getsize(imagens[nome]['origem']) / 1024:.1f} KB)")
+        for variantes in entrada['variantes'].values():
+            for densidade, arquivo in variantes.items():
+                print(f"  {densidade:<3} {arquivo:<40} {os.path.getsize(os.path.join(args.pasta, arquivo)) / 1024:>7.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
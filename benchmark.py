@@ -0,0 +1,364 @@
+"""
+Benchmarks do pipeline de dados.
+
+culinarias: compara a versão antiga (loop com iterrows) com a versão
+    vetorizada de `padronizar_culinarias`, em linhas/segundo, replicando a
+    coluna Cuisines do dataset real até o tamanho desejado.
+memoria: bytes por linha do dataset limpo antes e depois de
+    `compactar_dados`, por coluna.
+reruns: memória alocada por rerun para obter o dataset, com a cópia do
+    st.cache_data (pickle) e com o DatasetCompartilhado; falha se o
+    compartilhado alocar proporcionalmente ao tamanho do dataset. O rerun
+    das páginas inteiras é medido em tests/test_reruns.py.
+escala: mede cada etapa do pipeline (leitura, limpeza, índices, filtros,
+    agregações, tabela) em datasets sintéticos de vários tamanhos e falha
+    se alguma etapa ficar mais lenta que a baseline gravada.
+delta: tempo para aplicar um delta (atualizações, inserções e remoções)
+    a uma base sintética com ingestao.py, comparado ao recarregamento
+    completo do CSV com a reconstrução dos índices.
+paralelo: leitura e limpeza do CSV com 1, 2, 4, ... processos, com o
+    ganho sobre um processo só e a conferência de que o resultado é o
+    mesmo.
+
+Uso:
+    python benchmark.py culinarias
+    python benchmark.py culinarias --linhas 10000 1000000 --max-linhas-legado 10000000
+    python benchmark.py memoria
+    python benchmark.py reruns
+    python benchmark.py escala --linhas 10000 100000 1000000
+    python benchmark.py escala --gravar-baseline
+    python benchmark.py delta --linhas 1000000 --fracao 0.001
+    python benchmark.py paralelo --linhas 1000000 5000000 --processos 1 2 4 8 16 32
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from agregacoes import CuboAgregado
+from dados import (DatasetCompartilhado, carregar_dados, compactar_dados, ler_e_limpar, limpar_dados, padronizacao,
+                   padronizar_culinarias, valores_nulos_cuisines)
+from indices import IndiceFiltros
+from ingestao import BaseDados
+from sintetico import gerar_dataset, salvar_csv
+from tabela import TabelaPaginada
+
+
+def padronizar_culinarias_iterrows(df):
+    """Implementação original (linha a linha), mantida apenas como referência."""
+    df_padronizado = df.copy()
+    todas_culinarias = []
+    for idx, row in df_padronizado.iterrows():
+        cuisines_str = str(row['Cuisines'])
+        if pd.isna(cuisines_str) or cuisines_str in valores_nulos_cuisines:
+            todas_culinarias.append(['Não especificado'])
+            continue
+        cuisines_padronizadas = []
+        for cuisine in cuisines_str.split(','):
+            cuisine = cuisine.strip()
+            if cuisine:
+                cuisines_padronizadas.append(padronizacao.get(cuisine, cuisine))
+        todas_culinarias.append(cuisines_padronizadas)
+    df_padronizado['Cuisines_Padronizadas'] = todas_culinarias
+    df_padronizado['Cuisine_Principal'] = [cuisines[0] if cuisines else 'Não especificado' for cuisines in todas_culinarias]
+    df_padronizado['Total_Cuisines'] = [len(cuisines) for cuisines in todas_culinarias]
+    return df_padronizado
+
+
+def gerar_cuisines(linhas, caminho='dataset_atualizado.csv', seed=42):
+    """Replica (com amostragem) a coluna Cuisines do dataset real."""
+    base = pd.read_csv(caminho, usecols=['Cuisines'])['Cuisines']
+    base = base.fillna('Não especificado').astype(str).str.strip().to_numpy(dtype=object)
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'Cuisines': base[rng.integers(0, len(base), linhas)]})
+
+
+def medir(funcao, df):
+    inicio = time.perf_counter()
+    funcao(df)
+    return time.perf_counter() - inicio
+
+
+def benchmark_culinarias(args):
+    print(f"{'linhas':>12} {'iterrows (linhas/s)':>22} {'vetorizada (linhas/s)':>24} {'ganho':>8}")
+    for linhas in args.linhas:
+        df = gerar_cuisines(linhas)
+
+        segundos_novo = medir(padronizar_culinarias, df)
+        taxa_novo = linhas / segundos_novo
+
+        if linhas <= args.max_linhas_legado:
+            segundos_antigo = medir(padronizar_culinarias_iterrows, df)
+            taxa_antigo = linhas / segundos_antigo
+            print(f"{linhas:>12,} {taxa_antigo:>22,.0f} {taxa_novo:>24,.0f} {segundos_antigo / segundos_novo:>7.1f}x")
+        else:
+            print(f"{linhas:>12,} {'(pulado)':>22} {taxa_novo:>24,.0f} {'-':>8}")
+
+
+def bytes_por_coluna(df):
+    """
+    Memória de cada coluna. Listas Python contam o objeto lista e seus
+    elementos, uma lista por linha como na versão original.
+    """
+    memoria = df.memory_usage(deep=True, index=False)
+    for coluna in df.columns:
+        if df[coluna].dtype == object and len(df) and isinstance(df[coluna].iloc[0], list):
+            memoria[coluna] = sum(
+                sys.getsizeof(lista) + sum(sys.getsizeof(item) for item in lista)
+                for lista in df[coluna]
+            )
+    return memoria
+
+
+def benchmark_memoria(args):
+    antes = limpar_dados(pd.read_csv(args.caminho))
+    depois = compactar_dados(antes)
+    linhas = len(antes)
+
+    memoria_antes = bytes_por_coluna(antes) / linhas
+    memoria_depois = bytes_por_coluna(depois) / linhas
+    print(f"{'coluna':<24} {'tipo':<12} {'antes (B/linha)':>16} {'depois (B/linha)':>17}")
+    for coluna in antes.columns:
+        tipo = str(depois[coluna].dtype).split('<')[0][:12]
+        print(f"{coluna:<24} {tipo:<12} {memoria_antes[coluna]:>16,.1f} {memoria_depois[coluna]:>17,.1f}")
+    print(f"{'TOTAL':<24} {'':<12} {memoria_antes.sum():>16,.1f} {memoria_depois.sum():>17,.1f}")
+    print(f"Redução: {memoria_antes.sum() / memoria_depois.sum():.1f}x em {linhas:,} linhas")
+
+
+def alocado(funcao):
+    """Pico de memória alocada (bytes) durante `funcao()`."""
+    tracemalloc.start()
+    try:
+        funcao()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_reruns(args):
+    base = carregar_dados(args.caminho, usar_cache=False)
+    resultados = {}
+    print(f"{'linhas':>12} {'cache_data (bytes)':>20} {'compartilhado (bytes)':>22}")
+    for fator in args.fatores:
+        df = pd.concat([base] * fator, ignore_index=True)
+        serializado = pickle.dumps(df)
+        dataset = DatasetCompartilhado(df)
+
+        def rerun_copia():
+            # O que o st.cache_data faz a cada rerun: desserializar uma cópia
+            copia = pickle.loads(serializado)
+            copia['Aggregate rating']
+
+        def rerun_compartilhado():
+            visao = dataset.df
+            visao['Aggregate rating']
+
+        resultados[len(df)] = (alocado(rerun_copia), alocado(rerun_compartilhado))
+        print(f"{len(df):>12,} {resultados[len(df)][0]:>20,} {resultados[len(df)][1]:>22,}")
+
+    menor, maior = min(resultados), max(resultados)
+    crescimento = resultados[maior][1] / max(resultados[menor][1], 1)
+    print(f"Crescimento do compartilhado de {menor:,} para {maior:,} linhas: {crescimento:.2f}x")
+    if crescimento > args.tolerancia:
+        print("FALHOU: o rerun aloca memória proporcional ao tamanho do dataset")
+        sys.exit(1)
+
+
+def cronometrar(tempos, etapa, funcao):
+    """Executa `funcao()`, guarda o tempo em `tempos[etapa]` e devolve o resultado."""
+    inicio = time.perf_counter()
+    resultado = funcao()
+    tempos[etapa] = time.perf_counter() - inicio
+    return resultado
+
+
+def medir_pipeline(caminho_csv):
+    """Tempo (segundos) de cada etapa do pipeline do dashboard sobre um CSV."""
+    tempos = {}
+    bruto = cronometrar(tempos, 'leitura', lambda: pd.read_csv(caminho_csv))
+    limpo = cronometrar(tempos, 'limpeza', lambda: limpar_dados(bruto))
+    df = cronometrar(tempos, 'compactacao', lambda: compactar_dados(limpo))
+
+    colunas = ['Country', 'City', 'Cuisine_Principal', 'Price Type']
+    indice = cronometrar(tempos, 'indice_filtros', lambda: IndiceFiltros(df, colunas))
+    paises = df['Country'].value_counts().index.tolist()
+    cidade = df['City'].value_counts().index[0]
+    consultas = [
+        ({}, 0.0),
+        ({}, 3.5),
+        ({'Country': paises[0]}, 0.0),
+        ({'Country': paises[-1]}, 4.0),
+        ({'Country': paises[0], 'City': cidade, 'Price Type': 'cheap'}, 3.0),
+        ({'Cuisine_Principal': 'Indian', 'Price Type': 'expensive'}, 4.5),
+    ]
+    cronometrar(tempos, 'filtros', lambda: [indice.filtrar(filtros, nota) for filtros, nota in consultas])
+
+    cubo = cronometrar(tempos, 'cubo', lambda: CuboAgregado(df))
+    selecoes = [sorted(paises)[:3], paises[:1], []]
+    cronometrar(tempos, 'agregacao_paises', lambda: [(cubo.por_pais(sel), cubo.totais(sel)) for sel in selecoes])
+    cronometrar(tempos, 'agregacao_cidades', lambda: [(cubo.por_cidade(sel), cubo.por_culinaria(sel)) for sel in selecoes])
+
+    tabela = TabelaPaginada(df)
+    todas = np.arange(len(df))
+    cronometrar(tempos, 'tabela', lambda: tabela.pagina(todas, ['Restaurant Name', 'City'], 1, 50, 'Aggregate rating', False))
+    return tempos
+
+
+def benchmark_escala(args):
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as arquivo:
+            baseline = json.load(arquivo)
+
+    resultados = {}
+    regressoes = []
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in args.linhas:
+            caminho_csv = os.path.join(pasta, f'sintetico_{linhas}.csv')
+            salvar_csv(gerar_dataset(linhas, seed=args.seed), caminho_csv)
+            tempos = medir_pipeline(caminho_csv)
+            resultados[str(linhas)] = tempos
+
+            referencia = baseline.get(str(linhas), {})
+            print(f"\n{linhas:,} linhas")
+            print(f"{'etapa':<20} {'segundos':>10} {'baseline':>10} {'variação':>10}")
+            for etapa, segundos in tempos.items():
+                base = referencia.get(etapa)
+                if base is None:
+                    print(f"{etapa:<20} {segundos:>10.4f} {'-':>10} {'-':>10}")
+                    continue
+                variacao = segundos / base - 1 if base else 0.0
+                marca = ''
+                if segundos > base * (1 + args.tolerancia) and segundos - base > args.minimo:
+                    marca = '  <- REGRESSÃO'
+                    regressoes.append((linhas, etapa, base, segundos))
+                print(f"{etapa:<20} {segundos:>10.4f} {base:>10.4f} {variacao:>+10.0%}{marca}")
+
+    if args.gravar_baseline:
+        baseline.update(resultados)
+        with open(args.baseline, 'w', encoding='utf-8') as arquivo:
+            json.dump(baseline, arquivo, indent=2, sort_keys=True)
+        print(f"\nBaseline gravada em {args.baseline}")
+    elif regressoes:
+        print(f"\nFALHOU: {len(regressoes)} etapa(s) acima da baseline (tolerância {args.tolerancia:.0%})")
+        sys.exit(1)
+
+
+def gerar_delta(bruto, fracao, seed=42):
+    """Delta sintético: metade atualizações, um quarto inserções, um quarto remoções."""
+    rng = np.random.default_rng(seed)
+    quantidade = max(int(len(bruto) * fracao), 4)
+    escolhidas = rng.choice(len(bruto), quantidade, replace=False)
+    atualizar, inserir, remover = np.split(escolhidas, [quantidade // 2, quantidade * 3 // 4])
+
+    atualizadas = bruto.iloc[atualizar].copy()
+    atualizadas['Aggregate rating'] = rng.uniform(1, 5, len(atualizadas)).round(1)
+    inseridas = bruto.iloc[inserir].copy()
+    inseridas['Restaurant ID'] = bruto['Restaurant ID'].max() + 1 + np.arange(len(inseridas))
+    removidas = bruto.iloc[remover][['Restaurant ID']].copy()
+
+    delta = pd.concat([atualizadas, inseridas, removidas], ignore_index=True)
+    delta['Operacao'] = ['atualizar'] * (len(atualizadas) + len(inseridas)) + ['remover'] * len(removidas)
+    return delta
+
+
+def benchmark_delta(args):
+    print(f"{'linhas':>12} {'delta':>8} {'recarga (s)':>12} {'incremental (s)':>16} {'ganho':>8}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in args.linhas:
+            bruto = gerar_dataset(linhas, seed=args.seed)
+            caminho_csv = os.path.join(pasta, f'sintetico_{linhas}.csv')
+            salvar_csv(bruto, caminho_csv)
+            delta = gerar_delta(bruto, args.fracao, seed=args.seed)
+
+            tempos = {}
+            base = cronometrar(tempos, 'recarga', lambda: BaseDados.construir(
+                compactar_dados(limpar_dados(pd.read_csv(caminho_csv)))))
+            cronometrar(tempos, 'incremental', lambda: base.aplicar_delta(delta))
+            print(f"{linhas:>12,} {len(delta):>8,} {tempos['recarga']:>12.3f} {tempos['incremental']:>16.3f} "
+                  f"{tempos['recarga'] / tempos['incremental']:>7.1f}x")
+
+
+def benchmark_paralelo(args):
+    print(f"{os.cpu_count()} núcleos disponíveis")
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in args.linhas:
+            caminho_csv = os.path.join(pasta, f'sintetico_{linhas}.csv')
+            salvar_csv(gerar_dataset(linhas, seed=args.seed), caminho_csv)
+            print(f"\n{linhas:,} linhas ({os.path.getsize(caminho_csv) / 2 ** 20:,.0f} MB)")
+            print(f"{'processos':>10} {'segundos':>10} {'ganho':>8} {'eficiência':>11}")
+
+            referencia, serial = None, None
+            for processos in args.processos:
+                tempos = {}
+                limpo = cronometrar(tempos, 'leitura', lambda: ler_e_limpar(caminho_csv, processos))
+                if referencia is None:
+                    referencia, serial = limpo, tempos['leitura']
+                else:
+                    # As partes juntadas precisam dar exatamente a leitura de um processo só
+                    pd.testing.assert_frame_equal(limpo, referencia)
+                ganho = serial / tempos['leitura']
+                print(f"{processos:>10} {tempos['leitura']:>10.3f} {ganho:>7.2f}x {ganho / processos:>11.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    culinarias = subparsers.add_parser('culinarias', help="Padronização de culinárias: iterrows x vetorizada")
+    culinarias.add_argument('--linhas', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    culinarias.add_argument('--max-linhas-legado', type=int, default=1_000_000,
+                            help="Maior tamanho em que a versão iterrows é executada (é muito lenta)")
+    culinarias.set_defaults(executar=benchmark_culinarias)
+
+    memoria = subparsers.add_parser('memoria', help="Bytes por linha antes e depois da compactação")
+    memoria.add_argument('--caminho', default='dataset_atualizado.csv')
+    memoria.set_defaults(executar=benchmark_memoria)
+
+    reruns = subparsers.add_parser('reruns', help="Memória alocada por rerun: cache_data x compartilhado")
+    reruns.add_argument('--caminho', default='dataset_atualizado.csv')
+    reruns.add_argument('--fatores', type=int, nargs='+', default=[1, 10],
+                        help="Quantas vezes o dataset real é replicado em cada medição")
+    reruns.add_argument('--tolerancia', type=float, default=2.0,
+                        help="Crescimento máximo aceito na memória do compartilhado")
+    reruns.set_defaults(executar=benchmark_reruns)
+
+    escala = subparsers.add_parser('escala', help="Tempo de cada etapa em datasets sintéticos, comparado à baseline")
+    escala.add_argument('--linhas', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    escala.add_argument('--seed', type=int, default=42)
+    escala.add_argument('--baseline', default='benchmark_baseline.json')
+    escala.add_argument('--gravar-baseline', action='store_true',
+                        help="Grava os tempos medidos como nova baseline em vez de comparar")
+    escala.add_argument('--tolerancia', type=float, default=0.5,
+                        help="Aumento relativo aceito antes de acusar regressão (0.5 = +50%%)")
+    escala.add_argument('--minimo', type=float, default=0.01,
+                        help="Diferença mínima em segundos para acusar regressão (ignora ruído)")
+    escala.set_defaults(executar=benchmark_escala)
+
+    delta = subparsers.add_parser('delta', help="Aplicação incremental de um delta x recarga completa")
+    delta.add_argument('--linhas', type=int, nargs='+', default=[100_000, 1_000_000])
+    delta.add_argument('--fracao', type=float, default=0.001,
+                       help="Fração das linhas tocadas pelo delta")
+    delta.add_argument('--seed', type=int, default=42)
+    delta.set_defaults(executar=benchmark_delta)
+
+    paralelo = subparsers.add_parser('paralelo', help="Leitura e limpeza do CSV com vários processos")
+    paralelo.add_argument('--linhas', type=int, nargs='+', default=[1_000_000])
+    paralelo.add_argument('--processos', type=int, nargs='+', default=[1, 2, 4, 8],
+                          help="Números de processos medidos (o primeiro é a referência)")
+    paralelo.add_argument('--seed', type=int, default=42)
+    paralelo.set_defaults(executar=benchmark_paralelo)
+
+    args = parser.parse_args()
+    args.executar(args)
+
+
+if __name__ == '__main__':
+    main()
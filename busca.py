@@ -0,0 +1,190 @@
+import copy
+import functools
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Colunas pesquisadas e peso de cada uma no ranking
+pesos_colunas = {
+    'Restaurant Name': 3,
+    'City': 2,
+    'Locality Verbose': 2,
+    'Address': 1,
+}
+
+# Desconto quando o termo só casa com o começo da palavra (ex.: "pizz")
+desconto_prefixo = 0.5
+
+
+def normalizar(textos):
+    """
+    Normaliza textos para a busca: sem acentos, minúsculos, quebrados em
+    palavras (letras e números). Recebe um array Arrow e devolve a lista
+    de palavras de cada texto; o mesmo caminho é usado no índice e na
+    consulta, então "Sao Paulo" encontra "São Paulo".
+    """
+    textos = pc.fill_null(textos.cast(pa.string()), '')
+    sem_acentos = pc.replace_substring_regex(pc.utf8_normalize(textos, form='NFKD'), pattern=r'\p{Mn}', replacement='')
+    palavras = pc.split_pattern_regex(pc.utf8_lower(sem_acentos), pattern=r'[^\p{L}\p{N}]+')
+    return palavras
+
+
+@functools.lru_cache(maxsize=4096)
+def termos_busca(texto):
+    """
+    Palavras normalizadas de um texto digitado pelo usuário. Guardadas por
+    texto: as mesmas buscas se repetem a cada rerun e a cada chamada da API.
+    """
+    if not texto:
+        return ()
+    return tuple(termo for termo in normalizar(pa.array([texto])).to_pylist()[0] if termo)
+
+
+class IndiceBusca:
+    """
+    Índice invertido de palavras para a busca textual.
+
+    O vocabulário fica ordenado e as ocorrências (linha e peso da coluna)
+    agrupadas por palavra, então todas as palavras com um prefixo ocupam
+    uma fatia contígua: buscar "pizz" é achar essa fatia com duas buscas
+    binárias. Cada linha recebe, por termo, o maior peso entre as colunas
+    em que ele aparece; um resultado precisa conter todos os termos e a
+    pontuação é a soma dos pesos.
+    """
+
+    def __init__(self, df, colunas=None):
+        colunas = colunas or pesos_colunas
+        self.colunas = dict(colunas)
+        self.n = len(df)
+        self._maior_peso = maior_peso = max(colunas.values())
+
+        # Normaliza só os valores distintos de cada coluna e espalha as
+        # palavras para as linhas pelos códigos (nomes, cidades e bairros
+        # se repetem muito)
+        palavras, ocorrencias, total_palavras = [], [], 0
+        for coluna, peso in colunas.items():
+            valores = pa.array(df[coluna])
+            if isinstance(valores, pa.ChunkedArray):
+                valores = valores.combine_chunks()
+            if not pa.types.is_dictionary(valores.type):
+                valores = pc.dictionary_encode(valores)
+            listas = normalizar(valores.dictionary)
+            inicio_valor = listas.offsets.to_numpy()[:-1].astype(np.int64)
+            tamanho_valor = pc.list_value_length(listas).to_numpy(zero_copy_only=False).astype(np.int64)
+
+            codigos_linha = valores.indices.to_numpy(zero_copy_only=False)
+            linhas = np.flatnonzero(valores.indices.is_valid().to_numpy(zero_copy_only=False))
+            codigos_linha = codigos_linha[linhas].astype(np.int64)
+            tamanhos = tamanho_valor[codigos_linha]
+            deslocamento = np.cumsum(tamanhos) - tamanhos
+            posicoes = np.repeat(inicio_valor[codigos_linha] - deslocamento, tamanhos) + np.arange(tamanhos.sum())
+
+            ocorrencias.append((total_palavras + posicoes, np.repeat(linhas, tamanhos), peso))
+            palavras.append(pc.list_flatten(listas))
+            total_palavras += len(palavras[-1])
+
+        # Vocabulário ordenado (sem a palavra vazia das bordas do split)
+        palavras = pa.chunked_array(palavras, type=pa.string()).to_numpy()
+        codigos_palavra, vocabulario = pd.factorize(palavras, sort=True)
+        vazia = len(vocabulario) > 0 and vocabulario[0] == ''
+        if vazia:
+            vocabulario = vocabulario[1:]
+
+        # Uma chave inteira por ocorrência: (palavra, linha, peso invertido).
+        # Ordenar as chaves agrupa por palavra, depois por linha, com o maior
+        # peso primeiro, sem precisar de argsort e de reordenar vários arrays
+        base = maior_peso + 1
+        chaves = []
+        for posicoes, linhas, peso in ocorrencias:
+            codigos = codigos_palavra[posicoes].astype(np.int64) - vazia
+            validas = codigos >= 0
+            chaves.append((codigos[validas] * max(self.n, 1) + linhas[validas]) * base + (maior_peso - peso))
+        chaves = np.sort(np.concatenate(chaves)) if chaves else np.empty(0, dtype=np.int64)
+        self._montar(chaves, vocabulario)
+
+    def _montar(self, chaves, vocabulario):
+        """Monta as listas por palavra a partir das chaves já ordenadas."""
+        base = self._maior_peso + 1
+        palavra_linha, resto = np.divmod(chaves, base)
+        primeira_da_linha = np.concatenate(([True], palavra_linha[1:] != palavra_linha[:-1])) if len(chaves) else np.empty(0, dtype=bool)
+        palavra_linha, resto = palavra_linha[primeira_da_linha], resto[primeira_da_linha]
+        codigos, linhas = np.divmod(palavra_linha, max(self.n, 1))
+        self._linhas = linhas.astype(np.int32)
+        self._pesos = (self._maior_peso - resto).astype(np.int8)
+        contagens = np.bincount(codigos, minlength=len(vocabulario))
+        self._inicio = np.concatenate(([0], np.cumsum(contagens)))
+        self.vocabulario = np.asarray(vocabulario, dtype=object)
+
+    def _chaves(self, mapa_codigos, mapa_linhas, n):
+        """Chaves (palavra, linha, peso) das ocorrências com códigos e linhas trocados."""
+        codigos = np.repeat(mapa_codigos, np.diff(self._inicio))
+        linhas = mapa_linhas[self._linhas]
+        validas = linhas >= 0
+        base = self._maior_peso + 1
+        return (codigos[validas] * max(n, 1) + linhas[validas]) * base + (self._maior_peso - self._pesos[validas])
+
+    def atualizar(self, df, alteracao):
+        """
+        Índice do `df` resultante de um delta: só as linhas adicionadas são
+        normalizadas e quebradas em palavras; as ocorrências existentes são
+        renumeradas e as novas intercaladas por busca binária.
+        """
+        delta = IndiceBusca(df.iloc[alteracao.adicionadas], self.colunas)
+        vocabulario = np.union1d(self.vocabulario, delta.vocabulario)
+        indice_vocabulario = pd.Index(vocabulario)
+
+        # Linhas removidas ficam com -1 e saem das chaves
+        mapa_linhas = np.where(alteracao.removidas, -1, alteracao.posicao_nova)
+        chaves = self._chaves(indice_vocabulario.get_indexer(self.vocabulario), mapa_linhas, len(df))
+        chaves_novas = delta._chaves(indice_vocabulario.get_indexer(delta.vocabulario), alteracao.adicionadas, len(df))
+
+        novo = copy.copy(self)
+        novo.n = len(df)
+        novo._montar(np.insert(chaves, np.searchsorted(chaves, chaves_novas), chaves_novas), vocabulario)
+        return novo
+
+    def _termo(self, termo):
+        """Linhas (ordenadas) que contêm o termo e a pontuação de cada uma."""
+        primeira = int(np.searchsorted(self.vocabulario, termo, side='left'))
+        ultima = int(np.searchsorted(self.vocabulario, termo + '\U0010ffff', side='left'))
+        inicio, fim = self._inicio[primeira], self._inicio[ultima]
+        linhas = self._linhas[inicio:fim]
+        pontos = self._pesos[inicio:fim].astype(np.float64)
+        # Palavra exata vale o peso cheio; as demais só casam pelo prefixo
+        if primeira < ultima and self.vocabulario[primeira] == termo:
+            pontos[self._inicio[primeira + 1] - inicio:] -= desconto_prefixo
+        else:
+            pontos -= desconto_prefixo
+        if primeira + 1 < ultima:
+            # Várias palavras com o prefixo: uma ocorrência por linha, a de maior pontuação
+            ordem = np.lexsort((-pontos, linhas))
+            linhas, pontos = linhas[ordem], pontos[ordem]
+            primeira_da_linha = np.concatenate(([True], linhas[1:] != linhas[:-1]))
+            linhas, pontos = linhas[primeira_da_linha], pontos[primeira_da_linha]
+        return linhas.astype(np.int64), pontos
+
+    def buscar(self, texto):
+        """
+        Linhas que contêm todos os termos do texto (o último pode estar
+        incompleto), da mais para a menos relevante, e as pontuações.
+        """
+        termos = termos_busca(texto)
+        if not termos:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        resultados = sorted((self._termo(termo) for termo in dict.fromkeys(termos)), key=lambda r: len(r[0]))
+        linhas, pontos = resultados[0]
+        for outras_linhas, outros_pontos in resultados[1:]:
+            if not len(linhas):
+                break
+            posicoes = np.searchsorted(outras_linhas, linhas)
+            posicoes[posicoes == len(outras_linhas)] = 0
+            encontradas = outras_linhas[posicoes] == linhas if len(outras_linhas) else np.zeros(len(linhas), dtype=bool)
+            linhas = linhas[encontradas]
+            pontos = pontos[encontradas] + outros_pontos[posicoes[encontradas]]
+
+        # Maior pontuação primeiro; empates na ordem original do dataset
+        ordem = np.lexsort((linhas, -pontos))
+        return linhas[ordem], pontos[ordem]
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def chave_filtros(pagina, paises=None, cidade=None, culinaria=None, nota_minima=None, preco=None,
+                  culinarias=None, todas_culinarias=False, busca=None, versao=None):
+    """
+    Chave normalizada do estado dos filtros: a ordem dos países e das
+    culinárias não importa. A nota entra exata, pois quem calcula o
+    resultado pode usar o valor da chave (ex: a API, com notas fora do
+    passo do slider). Com uma culinária só, "qualquer uma" e "todas" são a
+    mesma busca.
+    `busca` são os termos já normalizados do texto buscado e `versao` a
+    versão da base, para um resultado nunca misturar versões.
+    """
+    culinarias = tuple(sorted(set(culinarias))) if culinarias else ()
+    return (
+        versao,
+        pagina,
+        tuple(sorted(paises)) if paises else (),
+        cidade,
+        culinaria,
+        None if nota_minima is None else float(nota_minima),
+        preco,
+        culinarias,
+        bool(todas_culinarias) and len(culinarias) > 1,
+        tuple(busca) if busca else (),
+    )
+
+
+class CacheLRU:
+    """
+    Cache de resultados compartilhado entre sessões (thread-safe).
+
+    Guarda até `max_itens` resultados; ao passar do limite descarta o usado
+    há mais tempo. Entradas com mais de `ttl` segundos são recalculadas.
+    Os resultados são compartilhados: quem lê não deve alterá-los.
+    """
+
+    def __init__(self, max_itens=256, ttl=600):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+        self.expirados = 0
+
+    def obter(self, chave, calcular):
+        """Retorna o resultado da chave, calculando com `calcular()` se preciso."""
+        agora = time.monotonic()
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is not None:
+                criado, valor = item
+                if agora - criado <= self.ttl:
+                    self._itens.move_to_end(chave)
+                    self.acertos += 1
+                    return valor
+                del self._itens[chave]
+                self.expirados += 1
+            self.falhas += 1
+
+        # Calcula fora da trava para não bloquear as outras sessões
+        valor = calcular()
+
+        with self._trava:
+            self._itens[chave] = (time.monotonic(), valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self.descartes += 1
+        return valor
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+
+    def estatisticas(self):
+        """Contadores para a página de administração."""
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {
+                'itens': len(self._itens),
+                'max_itens': self.max_itens,
+                'ttl': self.ttl,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+                'descartes': self.descartes,
+                'expirados': self.expirados,
+            }
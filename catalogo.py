@@ -0,0 +1,111 @@
+import heapq
+from itertools import islice
+
+import pandas as pd
+
+# Colunas com valores no catálogo (as dimensões do cubo e o tipo de preço)
+colunas_catalogo = ['Country', 'City', 'Cuisine_Principal', 'Price Type']
+
+
+def _somar(celulas, colunas):
+    """Restaurantes por valor das `colunas` nas células do cubo (sem nulos)."""
+    return celulas.groupby(colunas, observed=True, sort=False)['restaurantes'].sum()
+
+
+class CatalogoDimensoes:
+    """
+    Catálogo das dimensões de uma versão da base.
+
+    Montado uma vez a partir das células do cubo (país × cidade ×
+    culinária principal) e da contagem por tipo de preço: as listas
+    ordenadas dos filtros, as cidades de cada país, os restaurantes por
+    valor e as métricas gerais da Página Principal. Preencher os widgets
+    num rerun é ler listas prontas, sem percorrer o dataset.
+    """
+
+    def __init__(self, celulas, precos):
+        contagens = {coluna: _somar(celulas, coluna) for coluna in ('Country', 'City', 'Cuisine_Principal')}
+        contagens['Price Type'] = precos[precos > 0].astype('int64')
+        self._contagens = {coluna: {valor: int(n) for valor, n in serie.items()} for coluna, serie in contagens.items()}
+        self._valores = {coluna: sorted(contagem) for coluna, contagem in self._contagens.items()}
+
+        # Hierarquia país -> cidades, com os restaurantes de cada cidade no país
+        self._cidades = {}
+        self._contagens_cidades = {}
+        for (pais, cidade), n in _somar(celulas, ['Country', 'City']).items():
+            self._cidades.setdefault(pais, []).append(cidade)
+            self._contagens_cidades[(pais, cidade)] = int(n)
+        for cidades in self._cidades.values():
+            cidades.sort()
+
+        # Cidades de cada país já ordenadas por restaurantes (empate pelo
+        # nome), para os rankings sem consolidar o cubo
+        self._ranking_cidades = {
+            pais: sorted((-self._contagens_cidades[(pais, cidade)], cidade) for cidade in cidades)
+            for pais, cidades in self._cidades.items()
+        }
+        paises_da_cidade = {}
+        for pais, cidade in self._contagens_cidades:
+            paises_da_cidade.setdefault(cidade, set()).add(pais)
+        self._cidades_repetidas = {cidade: paises for cidade, paises in paises_da_cidade.items() if len(paises) > 1}
+
+        notas = celulas['nota_n'].sum()
+        self._resumo = {
+            'paises': len(self._valores['Country']),
+            'cidades': len(self._valores['City']),
+            'restaurantes': int(celulas['restaurantes'].sum()),
+            'culinarias': len(self._valores['Cuisine_Principal']),
+            'nota_media': celulas['nota_soma'].sum() / notas if notas else float('nan'),
+        }
+
+    @classmethod
+    def construir(cls, df, cubo):
+        return cls(cubo.celulas, df['Price Type'].value_counts())
+
+    def atualizar(self, cubo, removidas, adicionadas):
+        """
+        Catálogo após um delta: as dimensões saem do cubo já atualizado e
+        a contagem de preços só desconta as linhas removidas (com os
+        valores antigos) e soma as adicionadas.
+        """
+        precos = pd.Series(self._contagens['Price Type'], dtype='int64')
+        precos = precos.sub(removidas['Price Type'].value_counts(), fill_value=0)
+        precos = precos.add(adicionadas['Price Type'].value_counts(), fill_value=0)
+        return CatalogoDimensoes(cubo.celulas, precos)
+
+    def responde(self, coluna, filtros=None):
+        """Se o catálogo tem os valores da coluna com esses filtros."""
+        if coluna not in self._valores:
+            return False
+        return not filtros or (coluna == 'City' and set(filtros) == {'Country'})
+
+    def valores(self, coluna, filtros=None):
+        """Valores ordenados da coluna (as cidades de um país com `{'Country': pais}`)."""
+        if filtros:
+            return list(self._cidades.get(filtros['Country'], []))
+        return list(self._valores[coluna])
+
+    def contagem(self, coluna, valor, filtros=None):
+        """Restaurantes com o valor na coluna (numa cidade do país com `{'Country': pais}`)."""
+        if filtros:
+            return self._contagens_cidades.get((filtros['Country'], valor), 0)
+        return self._contagens[coluna].get(valor, 0)
+
+    def ranking_cidades(self, paises, k):
+        """
+        As `k` cidades com mais restaurantes nos países (todos se vazio),
+        juntando as listas já ordenadas de cada país: heapq.merge lê só o
+        começo de cada lista. None se uma cidade de mesmo nome está em mais
+        de um dos países (o cubo soma as duas; use ranking.topo nele).
+        """
+        paises = set(paises or self._ranking_cidades)
+        if any(len(donos & paises) > 1 for donos in self._cidades_repetidas.values()):
+            return None
+        listas = [self._ranking_cidades[pais] for pais in paises if pais in self._ranking_cidades]
+        primeiras = list(islice(heapq.merge(*listas), k))
+        return pd.Series([-negativo for negativo, _ in primeiras], index=pd.Index([cidade for _, cidade in primeiras], name='City'),
+                         dtype='int64', name='restaurantes')
+
+    def resumo(self):
+        """Países, cidades, restaurantes, culinárias principais e nota média."""
+        return dict(self._resumo)
@@ -0,0 +1,286 @@
+"""
+Consultas do dashboard sem Streamlit.
+
+As mesmas funções atendem as páginas do app e a API HTTP (api.py): cada
+uma recebe a BaseDados de uma versão e devolve o resultado calculado
+pelos índices e pelo cubo de agregados.
+"""
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+from busca import termos_busca
+from cache_resultados import CacheLRU, chave_filtros
+from ranking import topo
+
+# Nota que separa os dois gráficos de qualidade da página Cidades
+nota_corte = 4.0
+
+# Colunas da tabela da Página Principal quando nenhuma é pedida
+colunas_padrao = ['Restaurant Name', 'City', 'Cuisine_Principal', 'Cuisines', 'Aggregate rating', 'Price Type']
+
+# Colunas escalares pelas quais a tabela pode ser ordenada (listas, como
+# Cuisines_Padronizadas, não têm ordem)
+colunas_ordenaveis = (
+    'Restaurant ID', 'Restaurant Name', 'Country Code', 'City', 'Address', 'Locality', 'Locality Verbose',
+    'Longitude', 'Latitude', 'Cuisines', 'Average Cost for two', 'Currency', 'Has Table booking',
+    'Has Online delivery', 'Is delivering now', 'Switch to order menu', 'Price range', 'Aggregate rating',
+    'Rating color', 'Rating text', 'Votes', 'Country', 'Price Type', 'Cuisine_Principal', 'Total_Cuisines',
+)
+
+# Maior página aceita pela API
+tamanho_maximo = 1000
+
+
+def consultar_principal(base, filtros, nota_minima=0.0, culinarias=(), todas_culinarias=False, termos=()):
+    """
+    Restaurantes da Página Principal: `filtros` de igualdade `{coluna:
+    valor}`, nota mínima, culinárias servidas (qualquer uma ou todas) e
+    termos de busca. Com busca, as linhas vêm por relevância; sem busca,
+    na ordem do dataset.
+    """
+    if base.fora_da_memoria:
+        return base.consultar_principal(filtros, nota_minima, culinarias, todas_culinarias, termos)
+    df = base.df
+    restringir_a = None
+    if culinarias:
+        restringir_a = base.indice_culinarias.filtrar(culinarias, todas=todas_culinarias)
+    if termos:
+        linhas_busca, _ = base.indice_busca.buscar(" ".join(termos))
+        encontradas = np.sort(linhas_busca)
+        if restringir_a is not None:
+            encontradas = np.intersect1d(encontradas, restringir_a, assume_unique=True)
+        restringir_a = encontradas
+    linhas = base.indice_filtros.filtrar(filtros, nota_minima=nota_minima, restringir_a=restringir_a)
+    if termos:
+        # Resultado da busca na ordem de relevância
+        linhas = linhas_busca[np.isin(linhas_busca, linhas, assume_unique=True)]
+    linhas.setflags(write=False)
+    return {
+        'linhas': linhas,
+        'cidades': df['City'].iloc[linhas].nunique(),
+        'culinarias': df['Cuisine_Principal'].iloc[linhas].nunique(),
+        'nota_media': df['Aggregate rating'].iloc[linhas].mean(),
+    }
+
+
+def _cubo(base, exato):
+    """Cubo exato ou, se pedido e disponível, o aproximado (ver aproximado.py)."""
+    return base.cubo if exato or base.cubo_aproximado is None else base.cubo_aproximado
+
+
+def consultar_paises(base, paises, exato=True):
+    """Agregados por país e totais (cidades, restaurantes) dos países escolhidos."""
+    cubo = _cubo(base, exato)
+    return cubo.por_pais(paises), cubo.totais(paises)
+
+
+def consultar_cidades(base, paises, exato=True):
+    """Agregados por cidade, restaurantes por culinária principal e totais."""
+    cubo = _cubo(base, exato)
+    return cubo.por_cidade(paises), cubo.por_culinaria(paises), cubo.totais(paises)
+
+
+def margens_aproximadas(base, paises, exato=True):
+    """Margens de erro (95%) do modo aproximado nos países escolhidos; None com valores exatos."""
+    return None if exato or base.cubo_aproximado is None else base.cubo_aproximado.margens(paises)
+
+
+def dividir_por_nota(notas, corte=nota_corte, k=None):
+    """
+    Notas médias acima do corte (maiores primeiro) e abaixo (menores
+    primeiro); com `k`, só as k primeiras de cada lado (ver ranking.topo).
+    """
+    acima, abaixo = notas[notas > corte], notas[notas < corte]
+    return topo(acima, k or len(acima)), topo(abaixo, k or len(abaixo), crescente=True)
+
+
+def _texto(parametros, nome, padrao=None):
+    valores = parametros.get(nome)
+    return valores[-1] if valores else padrao
+
+
+def _lista(parametros, nome):
+    return [valor for valor in parametros.get(nome, []) if valor != '']
+
+
+def _numero(parametros, nome, padrao, tipo=float):
+    valor = _texto(parametros, nome)
+    if valor is None or valor == '':
+        return padrao
+    try:
+        return tipo(valor)
+    except ValueError:
+        raise ValueError(f"parâmetro '{nome}' inválido: {valor!r}") from None
+
+
+def _booleano(parametros, nome, padrao=False):
+    valor = _texto(parametros, nome)
+    if valor is None:
+        return padrao
+    return valor.strip().lower() in ('1', 'true', 'sim')
+
+
+def _registros(tabela):
+    """Linhas de um DataFrame/Series (com o índice) como lista de dicionários."""
+    if isinstance(tabela, pd.Series):
+        tabela = tabela.to_frame()
+    return json.loads(tabela.reset_index().to_json(orient='records', force_ascii=False))
+
+
+def _nota(valor):
+    return None if pd.isna(valor) else round(float(valor), 4)
+
+
+def _erro_lote(rota, status, mensagem):
+    return json.dumps({'rota': rota, 'status': status, 'erro': mensagem}, ensure_ascii=False).encode('utf-8')
+
+
+class MotorConsultas:
+    """
+    Consultas em JSON sobre a versão atual de uma BaseCompartilhada.
+
+    Os parâmetros chegam como no query string (nome -> lista de textos).
+    A resposta serializada fica no cache pela chave normalizada dos
+    parâmetros e pela versão da base, e a ETag é o hash dessa chave: quem
+    já tem a resposta da versão atual recebe 304 sem nada ser calculado.
+    """
+
+    rotas = ('restaurantes', 'paises', 'cidades')
+
+    def __init__(self, compartilhada, cache=None):
+        self.compartilhada = compartilhada
+        self.cache = cache or CacheLRU(max_itens=1024, ttl=600)
+
+    def _chave(self, rota, parametros, base):
+        if rota == 'restaurantes':
+            existentes = base.df.columns
+            colunas = _lista(parametros, 'coluna') or colunas_padrao
+            invalidas = [coluna for coluna in colunas if coluna not in existentes]
+            if invalidas:
+                raise ValueError(f"colunas desconhecidas: {invalidas}")
+            ordenar_por = _texto(parametros, 'ordenar_por')
+            if ordenar_por is not None and (ordenar_por not in existentes or ordenar_por not in colunas_ordenaveis):
+                raise ValueError(f"coluna de ordenação inválida: {ordenar_por!r}")
+            pagina = _numero(parametros, 'pagina', 1, int)
+            tamanho = _numero(parametros, 'tamanho', 50, int)
+            if pagina < 1 or not 1 <= tamanho <= tamanho_maximo:
+                raise ValueError(f"use pagina >= 1 e tamanho entre 1 e {tamanho_maximo}")
+            pais = _texto(parametros, 'pais')
+            filtros = chave_filtros(
+                'principal',
+                versao=base.versao,
+                paises=[pais] if pais else None,
+                cidade=_texto(parametros, 'cidade'),
+                culinaria=_texto(parametros, 'culinaria'),
+                nota_minima=_numero(parametros, 'nota_minima', 0.0),
+                preco=_texto(parametros, 'preco'),
+                culinarias=_lista(parametros, 'culinarias'),
+                todas_culinarias=_booleano(parametros, 'todas'),
+                busca=termos_busca(_texto(parametros, 'busca', '')),
+            )
+            return (rota, filtros, tuple(colunas), pagina, tamanho, ordenar_por, _booleano(parametros, 'crescente'))
+        if rota in ('paises', 'cidades'):
+            return (rota, chave_filtros(rota, paises=_lista(parametros, 'pais'), versao=base.versao))
+        raise KeyError(rota)
+
+    def _calcular(self, chave, base):
+        rota = chave[0]
+        if rota == 'restaurantes':
+            _, filtros, colunas, pagina, tamanho, ordenar_por, crescente = chave
+            versao, _, paises, cidade, culinaria, nota_minima, preco, culinarias, todas, termos = filtros
+            igualdade = {
+                coluna: valor for coluna, valor in (
+                    ('Country', paises[0] if paises else None),
+                    ('City', cidade),
+                    ('Cuisine_Principal', culinaria),
+                    ('Price Type', preco),
+                ) if valor is not None
+            }
+            # O filtro é compartilhado entre as páginas da mesma consulta
+            resultado = self.cache.obter(filtros, lambda: consultar_principal(
+                base, igualdade, nota_minima, culinarias, todas, termos))
+            tabela = base.tabela.pagina(resultado['linhas'], list(colunas), pagina, tamanho, ordenar_por, crescente)
+            return {
+                'versao': versao,
+                'total': len(resultado['linhas']),
+                'cidades': int(resultado['cidades']),
+                'culinarias': int(resultado['culinarias']),
+                'nota_media': _nota(resultado['nota_media']),
+                'pagina': pagina,
+                'tamanho': tamanho,
+                'restaurantes': json.loads(tabela.to_json(orient='records', force_ascii=False)),
+            }
+
+        paises = list(chave[1][2])
+        if rota == 'paises':
+            por_pais, (total_cidades, total_restaurantes) = consultar_paises(base, paises)
+            return {
+                'versao': base.versao,
+                'paises': paises,
+                'total_cidades': total_cidades,
+                'total_restaurantes': total_restaurantes,
+                'por_pais': _registros(por_pais.sort_values('restaurantes', ascending=False)),
+            }
+        por_cidade, por_culinaria, (total_cidades, total_restaurantes) = consultar_cidades(base, paises)
+        acima, abaixo = dividir_por_nota(por_cidade['nota_media'])
+        return {
+            'versao': base.versao,
+            'paises': paises,
+            'total_cidades': total_cidades,
+            'total_restaurantes': total_restaurantes,
+            'por_cidade': _registros(por_cidade.sort_values('restaurantes', ascending=False)),
+            'culinarias': _registros(por_culinaria),
+            'nota_corte': nota_corte,
+            'acima_corte': _registros(acima),
+            'abaixo_corte': _registros(abaixo),
+        }
+
+    def consultar(self, rota, parametros, etag=None, base=None):
+        """
+        Executa uma consulta. Retorna (status, etag, corpo em bytes); com
+        a `etag` da versão atual o status é 304 e o corpo vem vazio.
+        Rota desconhecida levanta KeyError e parâmetro inválido, ValueError.
+        """
+        base = base or self.compartilhada.atual
+        chave = self._chave(rota, parametros, base)
+        atual = '"' + hashlib.sha1(repr(chave).encode('utf-8')).hexdigest()[:20] + '"'
+        if etag == atual:
+            return 304, atual, b''
+        corpo = self.cache.obter(chave, lambda: json.dumps(
+            self._calcular(chave, base), ensure_ascii=False).encode('utf-8'))
+        return 200, atual, corpo
+
+    def lote(self, consultas):
+        """
+        Várias consultas `{"rota", "parametros", "etag"}` sobre a mesma
+        versão da base. Retorna o JSON da resposta em bytes.
+        """
+        base = self.compartilhada.atual
+        partes = []
+        for consulta in consultas:
+            if not isinstance(consulta, dict):
+                partes.append(_erro_lote(None, 400, 'cada consulta deve ser {"rota", "parametros", "etag"}'))
+                continue
+            rota = consulta.get('rota')
+            if not isinstance(consulta.get('parametros') or {}, dict):
+                partes.append(_erro_lote(rota, 400, '"parametros" deve ser um objeto'))
+                continue
+            parametros = {
+                nome: [str(item) for item in (valor if isinstance(valor, list) else [valor])]
+                for nome, valor in (consulta.get('parametros') or {}).items()
+            }
+            try:
+                status, etag, corpo = self.consultar(rota, parametros, consulta.get('etag'), base)
+            except KeyError:
+                partes.append(_erro_lote(rota, 404, f"rota desconhecida: {rota!r}"))
+                continue
+            except ValueError as erro:
+                partes.append(_erro_lote(rota, 400, str(erro)))
+                continue
+            cabecalho = json.dumps({'rota': rota, 'status': status, 'etag': etag}, ensure_ascii=False).encode('utf-8')
+            # Corpo já serializado vai direto para a resposta, sem reprocessar
+            partes.append(cabecalho[:-1] + b', "corpo": ' + corpo + b'}' if status == 200 else cabecalho)
+        return b'{"versao": %d, "resultados": [' % base.versao + b', '.join(partes) + b']}'
@@ -0,0 +1,544 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Versão das regras de limpeza: incrementar ao mudar a lógica de limpar_dados
+# ou padronizar_culinarias, para invalidar os caches em disco
+versao_limpeza = 2
+
+# Pasta do cache colunar (Parquet) do dataset já limpo
+pasta_cache = '.cache_dados'
+
+# Processos da leitura e limpeza em paralelo: RANGO_PROCESSOS fixa o número;
+# sem ela, CSVs acima de `limite_paralelo_mb` usam todos os núcleos
+variavel_processos = 'RANGO_PROCESSOS'
+limite_paralelo_mb = 64
+
+# Partes do CSV por processo (partes menores equilibram melhor a carga)
+partes_por_processo = 4
+
+# Linhas por bloco na carga em blocos (a primeira tela espera só um bloco)
+linhas_por_bloco = 20_000
+
+# Dicionário de padronização de nomes
+padronizacao = {
+    # Culinárias italianas
+    'Italian': 'Italian',
+    'Pizza': 'Italian',
+    'Pasta': 'Italian',
+    'Mediterranean': 'Italian',
+
+    # Culinárias asiáticas
+    'Chinese': 'Chinese',
+    'Japanese': 'Japanese',
+    'Thai': 'Thai',
+    'Korean': 'Korean',
+    'Vietnamese': 'Vietnamese',
+    'Asian': 'Asian',
+
+    # Culinárias indianas
+    'Indian': 'Indian',
+    'North Indian': 'Indian',
+    'South Indian': 'Indian',
+    'Mughlai': 'Indian',
+    'Hyderabadi': 'Indian',
+
+    # Culinárias americanas
+    'American': 'American',
+    'Mexican': 'Mexican',
+    'BBQ': 'American',
+    'Burgers': 'American',
+    'Steakhouse': 'American',
+
+    # Culinárias europeias
+    'French': 'French',
+    'German': 'German',
+    'Spanish': 'Spanish',
+    'Greek': 'Greek',
+    'Turkish': 'Turkish',
+
+    # Fast Food e outras
+    'Fast Food': 'Fast Food',
+    'Street Food': 'Street Food',
+    'Cafe': 'Cafe',
+    'Bakery': 'Bakery',
+    'Desserts': 'Desserts',
+    'Ice Cream': 'Desserts',
+
+    # Culinárias específicas
+    'Seafood': 'Seafood',
+    'Vegetarian': 'Vegetarian',
+    'Vegan': 'Vegetarian',
+    'Halal': 'Halal',
+    'Kosher': 'Kosher'
+}
+
+# Valores de Cuisines tratados como "sem culinária"
+valores_nulos_cuisines = ['nan', 'NaN', 'None', '', 'Não especificado']
+
+# Correção dos nomes de cidades corrompidas
+city_corrections = {
+    'Brasí_lia': 'Brasília',
+    'Sí£o Paulo': 'São Paulo',
+    'Sí£o paulo': 'São Paulo',
+}
+
+# Colunas numéricas convertidas na carga
+colunas_numericas = ['Aggregate rating', 'Price range', 'Average Cost for two', 'Votes']
+
+# Textos de baixa cardinalidade guardados como categóricos
+colunas_categoricas = [
+    'Country', 'City', 'Currency', 'Price Type', 'Rating color', 'Rating text',
+    'Cuisines', 'Cuisine_Principal',
+]
+
+# Colunas Yes/No guardadas como booleanos
+colunas_sim_nao = ['Has Table booking', 'Has Online delivery', 'Is delivering now', 'Switch to order menu']
+
+
+def _padronizar_combinacoes(combinacoes):
+    """
+    Padroniza um array de strings de Cuisines distintas.
+
+    Separa todas as culinárias de uma vez (explode), traduz cada nome
+    distinto pelo dicionário uma única vez e reagrupa por string.
+    Retorna (listas, principal, total), alinhados com `combinacoes`.
+    """
+    n = len(combinacoes)
+
+    # Separar culinárias múltiplas (separadas por vírgula) de uma só vez
+    partes = pd.Series(combinacoes, dtype=object).str.split(',')
+    origem = np.repeat(np.arange(n), partes.str.len().to_numpy(dtype=np.int64))
+    tokens = partes.explode().str.strip().to_numpy(dtype=object)
+
+    # Descartar pedaços vazios (ex: "Italian, , Pizza")
+    validos = tokens != ''
+    origem = origem[validos]
+    tokens = tokens[validos]
+
+    # Padronizar cada nome distinto uma única vez e espalhar pelos códigos
+    codigos, distintos = pd.factorize(tokens)
+    distintos_padronizados = np.array(
+        [padronizacao.get(cuisine, cuisine) for cuisine in distintos], dtype=object
+    )
+    padronizadas = distintos_padronizados[codigos]
+
+    # Reagrupar (os pedaços já estão na ordem das strings de origem)
+    total = np.bincount(origem, minlength=n)
+    inicio = np.cumsum(total) - total
+    listas = np.empty(n, dtype=object)
+    for i, grupo in enumerate(np.split(padronizadas, inicio[1:]) if n else []):
+        listas[i] = grupo.tolist()
+
+    principal = np.full(n, 'Não especificado', dtype=object)
+    tem_culinaria = total > 0
+    principal[tem_culinaria] = padronizadas[inicio[tem_culinaria]]
+
+    return listas, principal, total
+
+
+# Função para padronizar culinárias
+def padronizar_culinarias(df):
+    """
+    Padroniza os nomes das culinárias para melhor análise:
+    1. Padroniza nomes (ex: sempre usar "Italian" como base)
+    2. Separa estilos múltiplos e conta individualmente
+    3. Agrupa por culinária principal
+
+    Versão vetorizada: como há poucas combinações distintas de Cuisines,
+    cada combinação é processada uma única vez e o resultado é espalhado
+    para as linhas pelos códigos (restaurantes com a mesma combinação
+    compartilham a mesma lista, que deve ser tratada como somente leitura).
+    """
+
+    # Criar cópia do dataframe
+    df_padronizado = df.copy()
+
+    # Valores nulos ou vazios viram 'Não especificado'
+    cuisines = df_padronizado['Cuisines']
+    nulos = cuisines.isna() | cuisines.astype(str).isin(valores_nulos_cuisines)
+    cuisines = cuisines.astype(str).where(~nulos, 'Não especificado')
+
+    # Processar cada combinação distinta uma vez
+    codigos, combinacoes = pd.factorize(cuisines)
+    listas, principal, total = _padronizar_combinacoes(np.asarray(combinacoes, dtype=object))
+
+    # Adicionar colunas com culinárias padronizadas
+    df_padronizado['Cuisines_Padronizadas'] = listas[codigos]
+    df_padronizado['Cuisine_Principal'] = principal[codigos]
+    df_padronizado['Total_Cuisines'] = total[codigos].astype(np.int64)
+
+    return df_padronizado
+
+
+def limpar_dados(df):
+    """
+    Limpa o dataset bruto (como lido do CSV):
+    1. Converte as colunas numéricas
+    2. Limpa a coluna Cuisines e corrige nomes de cidades
+    3. Aplica a padronização de culinárias
+    """
+    # Converter colunas numéricas
+    for coluna in colunas_numericas:
+        df[coluna] = pd.to_numeric(df[coluna], errors='coerce')
+
+    # CORREÇÃO CRÍTICA: Limpar dados da coluna Cuisines
+    # Remover valores NaN e converter tudo para string
+    df['Cuisines'] = df['Cuisines'].fillna('Não especificado').astype(str)
+    # Remover valores vazios ou apenas espaços
+    df['Cuisines'] = df['Cuisines'].replace(['', 'nan', 'NaN', 'None'], 'Não especificado')
+    # Remover espaços em branco no início e fim
+    df['Cuisines'] = df['Cuisines'].str.strip()
+
+    # CORREÇÃO AUTOMÁTICA DOS NOMES DAS CIDADES
+    df['City'] = df['City'].fillna('').astype(str)
+    df['City'] = df['City'].replace(city_corrections)
+
+    # Limpar dados da coluna City (remover valores nulos)
+    df = df.dropna(subset=['City'])
+
+    # APLICAR PADRONIZAÇÃO DE CULINÁRIAS
+    return padronizar_culinarias(df)
+
+
+def numero_processos(caminho, processos=None):
+    """Processos para ler e limpar o CSV (1 = sem paralelismo)."""
+    if processos is None:
+        processos = os.environ.get(variavel_processos)
+    if processos is not None:
+        return max(1, int(processos))
+    if os.path.getsize(caminho) / 2 ** 20 <= limite_paralelo_mb:
+        return 1
+    # Núcleos que este processo pode usar (em contêiner pode ser menos que a máquina)
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _limites_csv(caminho, partes):
+    """
+    Cabeçalho do CSV e posições (em bytes) que o dividem em até `partes`
+    pedaços sem cortar registros. Um fim de linha só separa registros se
+    o número de aspas antes dele for par (fora de um campo entre aspas,
+    que pode ter quebras de linha); a contagem percorre o arquivo em
+    blocos, sem interpretar o CSV.
+    """
+    tamanho = os.path.getsize(caminho)
+    with open(caminho, 'rb') as arquivo:
+        cabecalho = arquivo.readline()
+        inicio = arquivo.tell()
+        limites = [inicio]
+        aspas, posicao = cabecalho.count(b'"'), inicio
+        for parte in range(1, partes):
+            alvo = inicio + (tamanho - inicio) * parte // partes
+            while posicao < alvo:
+                bloco = arquivo.read(min(1 << 24, alvo - posicao))
+                aspas += bloco.count(b'"')
+                posicao += len(bloco)
+            # Próximo fim de linha fora de aspas a partir do alvo
+            limite = None
+            while limite is None:
+                bloco = arquivo.read(1 << 16)
+                if not bloco:
+                    break
+                anterior = 0
+                while True:
+                    quebra = bloco.find(b'\n', anterior)
+                    if quebra < 0:
+                        aspas += bloco.count(b'"', anterior)
+                        posicao += len(bloco)
+                        break
+                    aspas += bloco.count(b'"', anterior, quebra)
+                    if aspas % 2 == 0:
+                        limite = posicao + quebra + 1
+                        break
+                    anterior = quebra + 1
+            if limite is None:
+                break
+            arquivo.seek(limite)
+            posicao = limite
+            if limite > limites[-1] and limite < tamanho:
+                limites.append(limite)
+    return cabecalho, limites + [tamanho]
+
+
+def _ler_e_limpar_parte(caminho, cabecalho, inicio, fim):
+    """Lê os bytes [inicio, fim) do CSV (com o cabeçalho) e limpa as linhas."""
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        dados = arquivo.read(fim - inicio)
+    return limpar_dados(pd.read_csv(io.BytesIO(cabecalho + dados)))
+
+
+def _juntar_partes(partes):
+    """
+    Junta as partes limpas na ordem do arquivo. Uma parte em que a coluna
+    veio toda vazia é lida como float; ela passa a ter o tipo das demais,
+    como na leitura do arquivo inteiro.
+    """
+    partes = [parte for parte in partes if len(parte)] or partes[:1]
+    for coluna in partes[0].columns:
+        tipos = {parte[coluna].dtype for parte in partes if parte[coluna].notna().any()}
+        if len(tipos) == 1:
+            tipo = tipos.pop()
+            for parte in partes:
+                if parte[coluna].dtype != tipo and parte[coluna].isna().all():
+                    parte[coluna] = parte[coluna].astype(tipo)
+    return pd.concat(partes, ignore_index=True)
+
+
+def ler_e_limpar(caminho, processos=1):
+    """
+    Lê e limpa o CSV (ver limpar_dados). Com mais de um processo, o
+    arquivo é dividido em partes de bytes que os processos leem e limpam
+    ao mesmo tempo; as partes são juntadas na ordem do arquivo, então o
+    resultado é o mesmo da leitura em um processo só.
+    """
+    if processos <= 1:
+        return limpar_dados(pd.read_csv(caminho))
+    return _juntar_partes([parte for parte, _ in ler_em_partes(caminho, processos)])
+
+
+def ler_em_partes(caminho, processos):
+    """
+    Gera as partes limpas do CSV lidas por `processos` processos (ver
+    ler_e_limpar), na ordem do arquivo e cada uma assim que ela e as
+    anteriores terminam, com a posição (em bytes) em que a parte acaba.
+    """
+    cabecalho, limites = _limites_csv(caminho, processos * partes_por_processo)
+    # spawn: seguro mesmo quando chamado de um processo com threads (Streamlit)
+    with ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futuros = [executor.submit(_ler_e_limpar_parte, caminho, cabecalho, inicio, fim)
+                   for inicio, fim in zip(limites[:-1], limites[1:])]
+        for futuro, fim in zip(futuros, limites[1:]):
+            yield futuro.result(), fim
+
+
+def ler_em_blocos(arquivo, linhas_bloco=linhas_por_bloco):
+    """
+    Lê e limpa o CSV (caminho ou arquivo aberto) bloco a bloco, na ordem
+    do arquivo. Juntados com _juntar_partes, os blocos dão o mesmo
+    resultado de ler_e_limpar.
+    """
+    for bloco in pd.read_csv(arquivo, chunksize=linhas_bloco):
+        yield limpar_dados(bloco)
+
+
+def _culinarias_para_csr(cuisines, listas):
+    """
+    Converte a coluna de listas de culinárias padronizadas em uma lista
+    Arrow: offsets (onde começa cada restaurante) + códigos de um
+    dicionário de culinárias. Como as listas dependem só de Cuisines,
+    cada combinação é codificada uma vez e espalhada para as linhas.
+    """
+    codigos_linha, _ = pd.factorize(cuisines, use_na_sentinel=False)
+    _, primeira = np.unique(codigos_linha, return_index=True)
+    listas_combinacao = listas.to_numpy(dtype=object)[primeira]
+
+    # Códigos das culinárias de cada combinação, concatenados
+    tamanhos_combinacao = np.array([len(lista) for lista in listas_combinacao], dtype=np.int64)
+    nomes = np.array([nome for lista in listas_combinacao for nome in lista], dtype=object)
+    codigos_nomes, categorias = pd.factorize(nomes, sort=True)
+    inicio_combinacao = np.cumsum(tamanhos_combinacao) - tamanhos_combinacao
+
+    # Espalhar para as linhas: offsets por restaurante e códigos em sequência
+    tamanhos = tamanhos_combinacao[codigos_linha]
+    offsets = np.zeros(len(tamanhos) + 1, dtype=np.int32)
+    np.cumsum(tamanhos, out=offsets[1:])
+    posicoes = np.repeat(inicio_combinacao[codigos_linha] - offsets[:-1], tamanhos) + np.arange(offsets[-1])
+    tipo_codigo = np.int16 if len(categorias) <= np.iinfo(np.int16).max else np.int32
+    valores = pa.DictionaryArray.from_arrays(
+        pa.array(codigos_nomes[posicoes].astype(tipo_codigo)),
+        pa.array(np.asarray(categorias, dtype=object), type=pa.string())
+    )
+    return pd.arrays.ArrowExtensionArray(pa.ListArray.from_arrays(pa.array(offsets), valores))
+
+
+def compactar_dados(df):
+    """
+    Reduz a memória do dataset limpo:
+    - textos de baixa cardinalidade viram categóricos
+    - colunas Yes/No viram booleanos
+    - inteiros são reduzidos ao menor tipo que comporta os valores
+    - Cuisines_Padronizadas vira uma lista Arrow (offsets + códigos)
+    """
+    df = df.copy()
+
+    if len(df):
+        df['Cuisines_Padronizadas'] = _culinarias_para_csr(df['Cuisines'], df['Cuisines_Padronizadas'])
+
+    for coluna in colunas_categoricas:
+        df[coluna] = df[coluna].astype('category')
+
+    for coluna in colunas_sim_nao:
+        if df[coluna].isin(['Yes', 'No']).all():
+            df[coluna] = (df[coluna] == 'Yes').to_numpy()
+
+    for coluna in df.select_dtypes(include='integer').columns:
+        df[coluna] = pd.to_numeric(df[coluna], downcast='integer')
+
+    return df
+
+
+def _hash_arquivo(caminho):
+    """SHA-256 do conteúdo do arquivo, lido em blocos."""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def hash_regras():
+    """Hash das regras de limpeza (dicionários e versão da lógica)."""
+    regras = {
+        'versao': versao_limpeza,
+        'padronizacao': padronizacao,
+        'city_corrections': city_corrections,
+        'valores_nulos_cuisines': valores_nulos_cuisines,
+        'colunas_numericas': colunas_numericas,
+    }
+    return hashlib.sha256(json.dumps(regras, sort_keys=True).encode()).hexdigest()
+
+
+def fingerprint(caminho, metadados=None):
+    """
+    Impressão digital do CSV de origem: tamanho, mtime e hash do conteúdo.
+
+    Se tamanho e mtime batem com os `metadados` de um cache anterior, o hash
+    já calculado é reaproveitado e o arquivo não é relido.
+    """
+    info = os.stat(caminho)
+    atual = {'tamanho': info.st_size, 'mtime_ns': info.st_mtime_ns}
+    if metadados and all(metadados.get(chave) == valor for chave, valor in atual.items()):
+        atual['sha256'] = metadados['sha256']
+    else:
+        atual['sha256'] = _hash_arquivo(caminho)
+    return atual
+
+
+def _caminhos_cache(caminho, pasta):
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    base = os.path.join(pasta, nome)
+    return base + '.parquet', base + '.json'
+
+
+def _ler_metadados(caminho_meta):
+    try:
+        with open(caminho_meta, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar_atomico(caminho, escrever):
+    """Grava em arquivo temporário e troca de uma vez (seguro entre processos)."""
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        escrever(temporario)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def _escrever_json(caminho, dados):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo)
+
+
+def _ler_parquet(caminho):
+    """Lê o snapshot mantendo Cuisines_Padronizadas como lista Arrow (CSR)."""
+    tabela = pq.read_table(caminho)
+    return tabela.to_pandas(types_mapper=lambda tipo: pd.ArrowDtype(tipo) if pa.types.is_list(tipo) else None)
+
+
+def carregar_dados(caminho='dataset_atualizado.csv', usar_cache=True, pasta=pasta_cache, processos=None):
+    """
+    Lê e limpa o dataset, usando um snapshot Parquet do resultado quando
+    possível.
+
+    O snapshot é válido enquanto o fingerprint do CSV (tamanho, mtime e
+    hash do conteúdo) e o hash das regras de limpeza não mudarem; caso
+    contrário o dataset é reconstruído e o snapshot regravado. Com
+    `usar_cache=False` sempre lê o CSV. `processos` é o número de
+    processos da leitura e limpeza (ver numero_processos).
+    """
+    if not usar_cache:
+        return compactar_dados(ler_e_limpar(caminho, numero_processos(caminho, processos)))
+
+    df, origem = ler_snapshot(caminho, pasta)
+    if df is None:
+        df = compactar_dados(ler_e_limpar(caminho, numero_processos(caminho, processos)))
+        gravar_snapshot(caminho, df, origem, pasta)
+    return df
+
+
+def ler_snapshot(caminho, pasta=pasta_cache):
+    """
+    Dataset do snapshot Parquet, se ele vale para o CSV e as regras atuais.
+    Retorna (df ou None, fingerprint do CSV tirado antes da leitura).
+    """
+    caminho_parquet, caminho_meta = _caminhos_cache(caminho, pasta)
+    metadados = _ler_metadados(caminho_meta)
+    origem = fingerprint(caminho, metadados)
+    regras = hash_regras()
+
+    if (metadados and metadados.get('sha256') == origem['sha256']
+            and metadados.get('regras') == regras and os.path.exists(caminho_parquet)):
+        try:
+            df = _ler_parquet(caminho_parquet)
+        except (OSError, ValueError):
+            df = None
+        if df is not None:
+            # Mesmo conteúdo com outro mtime (ex: cópia em outra réplica): o
+            # mtime novo evita recalcular o hash; sem permissão de escrita só
+            # o hash é recalculado na próxima leitura
+            if metadados.get('mtime_ns') != origem['mtime_ns']:
+                try:
+                    _gravar_atomico(caminho_meta, lambda tmp: _escrever_json(tmp, {**origem, 'regras': regras}))
+                except OSError:
+                    pass
+            return df, origem
+    return None, origem
+
+
+def gravar_snapshot(caminho, df, origem, pasta=pasta_cache):
+    """Grava o snapshot Parquet do dataset limpo com o fingerprint `origem` do CSV."""
+    caminho_parquet, caminho_meta = _caminhos_cache(caminho, pasta)
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        _gravar_atomico(caminho_parquet, lambda tmp: df.to_parquet(tmp, index=True))
+        _gravar_atomico(caminho_meta, lambda tmp: _escrever_json(tmp, {**origem, 'regras': hash_regras()}))
+    except OSError:
+        # Sem permissão de escrita: segue sem cache
+        pass
+
+
+class DatasetCompartilhado:
+    """
+    Dataset limpo compartilhado, somente leitura, entre todas as sessões.
+
+    Guardado com st.cache_resource (sem a cópia que o st.cache_data faz a
+    cada rerun). O acesso é por `df`, que devolve uma cópia rasa: com o
+    Copy-on-Write do pandas ela não copia dados, e qualquer alteração feita
+    pela página copia só o que foi alterado, sem tocar no original.
+    """
+
+    def __init__(self, df):
+        self._df = df
+
+    @property
+    def df(self):
+        return self._df.copy(deep=False)
+
+    def __len__(self):
+        return len(self._df)
@@ -0,0 +1,175 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+# Lado da célula da grade, em graus (~5,5 km de latitude)
+tamanho_celula = 0.05
+
+raio_terra_km = 6371.0
+
+
+def _coordenadas_validas(lon, lat):
+    """Coordenadas presentes, dentro dos limites e diferentes de (0, 0)."""
+    return (
+        np.isfinite(lon) & np.isfinite(lat)
+        & (np.abs(lon) <= 180) & (np.abs(lat) <= 90)
+        & ~((lon == 0) & (lat == 0))
+    )
+
+
+def distancia_km(lon, lat, lon_ref, lat_ref):
+    """Distância de haversine (vetorizada) até o ponto de referência, em km."""
+    lon, lat = np.radians(lon), np.radians(lat)
+    lon_ref, lat_ref = np.radians(lon_ref), np.radians(lat_ref)
+    a = np.sin((lat - lat_ref) / 2) ** 2 + np.cos(lat) * np.cos(lat_ref) * np.sin((lon - lon_ref) / 2) ** 2
+    return 2 * raio_terra_km * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class IndiceEspacial:
+    """
+    Grade regular de longitude × latitude sobre as coordenadas.
+
+    As linhas ficam ordenadas pela chave da célula (faixa de latitude ×
+    colunas + coluna de longitude), então cada faixa de latitude de um
+    retângulo é uma fatia contígua achada com busca binária: a consulta
+    só toca as linhas das células do retângulo. Coordenadas ausentes ou
+    (0, 0) (restaurante sem localização no dataset) ficam fora do índice.
+    """
+
+    def __init__(self, df, coluna_lon='Longitude', coluna_lat='Latitude'):
+        self.n = len(df)
+        self.colunas_coordenadas = (coluna_lon, coluna_lat)
+        self.lon = df[coluna_lon].to_numpy(dtype=float)
+        self.lat = df[coluna_lat].to_numpy(dtype=float)
+        self._colunas = int(np.ceil(360 / tamanho_celula))
+        self._faixas = int(np.ceil(180 / tamanho_celula))
+
+        validas = _coordenadas_validas(self.lon, self.lat)
+        linhas = np.flatnonzero(validas)
+        coluna, faixa = self._celula(self.lon[linhas], self.lat[linhas])
+        chaves = faixa * self._colunas + coluna
+        ordem = np.argsort(chaves, kind='stable')
+        self._linhas = linhas[ordem]
+        self._chaves = chaves[ordem]
+        self.validas = validas
+
+    def atualizar(self, df, alteracao):
+        """
+        Índice do `df` resultante de um delta: as linhas mantidas continuam
+        na mesma ordem de células (só renumeradas) e as adicionadas são
+        encaixadas por busca binária nas chaves.
+        """
+        novo = copy.copy(self)
+        coluna_lon, coluna_lat = self.colunas_coordenadas
+        novo.n = len(df)
+        novo.lon = df[coluna_lon].to_numpy(dtype=float)
+        novo.lat = df[coluna_lat].to_numpy(dtype=float)
+        novo.validas = _coordenadas_validas(novo.lon, novo.lat)
+
+        mantidas = ~alteracao.removidas[self._linhas]
+        linhas = alteracao.posicao_nova[self._linhas[mantidas]]
+        chaves = self._chaves[mantidas]
+        adicionadas = alteracao.adicionadas[novo.validas[alteracao.adicionadas]]
+        coluna, faixa = self._celula(novo.lon[adicionadas], novo.lat[adicionadas])
+        chaves_novas = faixa * self._colunas + coluna
+        ordem = np.argsort(chaves_novas, kind='stable')
+        posicoes = np.searchsorted(chaves, chaves_novas[ordem], side='right')
+        novo._chaves = np.insert(chaves, posicoes, chaves_novas[ordem])
+        novo._linhas = np.insert(linhas, posicoes, adicionadas[ordem])
+        return novo
+
+    def _celula(self, lon, lat):
+        coluna = np.floor((np.asarray(lon) + 180) / tamanho_celula).astype(np.int64)
+        faixa = np.floor((np.asarray(lat) + 90) / tamanho_celula).astype(np.int64)
+        return np.clip(coluna, 0, self._colunas - 1), np.clip(faixa, 0, self._faixas - 1)
+
+    def na_area(self, lon_min, lat_min, lon_max, lat_max):
+        """
+        Posições (ordenadas) das linhas dentro do retângulo. Se `lon_min` >
+        `lon_max` o retângulo cruza o antimeridiano (180°).
+        """
+        if lon_min > lon_max:
+            return np.union1d(
+                self.na_area(lon_min, lat_min, 180, lat_max),
+                self.na_area(-180, lat_min, lon_max, lat_max)
+            )
+        coluna_min, faixa_min = self._celula(lon_min, lat_min)
+        coluna_max, faixa_max = self._celula(lon_max, lat_max)
+        faixas = np.arange(faixa_min, faixa_max + 1)
+        inicio = np.searchsorted(self._chaves, faixas * self._colunas + coluna_min, side='left')
+        fim = np.searchsorted(self._chaves, faixas * self._colunas + coluna_max, side='right')
+
+        # Junta as fatias de cada faixa e descarta o que sobra nas bordas
+        tamanhos = fim - inicio
+        deslocamento = np.cumsum(tamanhos) - tamanhos
+        posicoes = np.repeat(inicio - deslocamento, tamanhos) + np.arange(tamanhos.sum())
+        linhas = self._linhas[posicoes]
+        lon, lat = self.lon[linhas], self.lat[linhas]
+        dentro = (lon >= lon_min) & (lon <= lon_max) & (lat >= lat_min) & (lat <= lat_max)
+        return np.sort(linhas[dentro])
+
+    def proximos(self, lon, lat, k=10, permitidas=None, raio_inicial_km=2.0):
+        """
+        Os `k` restaurantes mais próximos do ponto (opcionalmente só entre
+        as linhas marcadas na máscara `permitidas`). Retorna as posições e
+        as distâncias em km, da mais próxima para a mais distante.
+        """
+        raio = raio_inicial_km
+        while True:
+            # Retângulo que contém o círculo de raio `raio` em volta do ponto
+            delta_lat = np.degrees(raio / raio_terra_km)
+            cosseno = np.cos(np.radians(min(abs(lat) + delta_lat, 90.0)))
+            delta_lon = 180.0 if cosseno < 1e-6 else min(delta_lat / cosseno, 180.0)
+            mundo = delta_lat >= 180 and delta_lon >= 180
+            if delta_lon >= 180:
+                candidatas = self.na_area(-180, max(lat - delta_lat, -90), 180, min(lat + delta_lat, 90))
+            else:
+                lon_min = (lon - delta_lon + 180) % 360 - 180
+                lon_max = (lon + delta_lon + 180) % 360 - 180
+                candidatas = self.na_area(lon_min, max(lat - delta_lat, -90), lon_max, min(lat + delta_lat, 90))
+            if permitidas is not None:
+                candidatas = candidatas[permitidas[candidatas]]
+
+            distancias = distancia_km(self.lon[candidatas], self.lat[candidatas], lon, lat)
+            # Só as que estão dentro do círculo são garantidamente as mais próximas
+            no_circulo = distancias <= raio
+            if no_circulo.sum() >= k or mundo:
+                if not mundo:
+                    candidatas, distancias = candidatas[no_circulo], distancias[no_circulo]
+                ordem = np.argsort(distancias, kind='stable')[:k]
+                return candidatas[ordem], distancias[ordem]
+            raio *= 4
+
+    def agrupar(self, linhas, divisoes=60, notas=None):
+        """
+        Agrupa as `linhas` em uma grade de `divisoes` × `divisoes` sobre a
+        extensão delas: um ponto por célula ocupada, no centroide, com a
+        quantidade de restaurantes e (se `notas` for dado) a nota média.
+        """
+        linhas = linhas[self.validas[linhas]]
+        colunas = ['Longitude', 'Latitude', 'restaurantes'] + (['nota_media'] if notas is not None else [])
+        if not len(linhas):
+            return pd.DataFrame(columns=colunas)
+        lon, lat = self.lon[linhas], self.lat[linhas]
+        largura = max(lon.max() - lon.min(), 1e-9) / divisoes
+        altura = max(lat.max() - lat.min(), 1e-9) / divisoes
+        coluna = np.minimum(((lon - lon.min()) / largura).astype(np.int64), divisoes - 1)
+        faixa = np.minimum(((lat - lat.min()) / altura).astype(np.int64), divisoes - 1)
+        celula = faixa * divisoes + coluna
+
+        contagem = np.bincount(celula, minlength=divisoes * divisoes)
+        ocupadas = np.flatnonzero(contagem)
+        grupos = {
+            'Longitude': np.bincount(celula, weights=lon, minlength=divisoes * divisoes)[ocupadas] / contagem[ocupadas],
+            'Latitude': np.bincount(celula, weights=lat, minlength=divisoes * divisoes)[ocupadas] / contagem[ocupadas],
+            'restaurantes': contagem[ocupadas],
+        }
+        if notas is not None:
+            valores = np.asarray(notas, dtype=float)[linhas]
+            com_nota = ~np.isnan(valores)
+            soma = np.bincount(celula[com_nota], weights=valores[com_nota], minlength=divisoes * divisoes)
+            quantidade = np.bincount(celula[com_nota], minlength=divisoes * divisoes)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                grupos['nota_media'] = soma[ocupadas] / quantidade[ocupadas]
+        return pd.DataFrame(grupos, columns=colunas)
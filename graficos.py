@@ -0,0 +1,73 @@
+import hashlib
+import threading
+import time
+
+import pandas as pd
+import plotly.io as pio
+
+from cache_resultados import CacheLRU
+
+
+def hash_dados(*objetos):
+    """Hash do conteúdo (valores, índice e nomes) dos dados de um gráfico."""
+    sha = hashlib.sha256()
+    for objeto in objetos:
+        if isinstance(objeto, (pd.Series, pd.DataFrame)):
+            sha.update(pd.util.hash_pandas_object(objeto, index=True).to_numpy().tobytes())
+            nomes = objeto.columns.tolist() if isinstance(objeto, pd.DataFrame) else [objeto.name]
+            sha.update(repr(nomes).encode())
+        else:
+            sha.update(repr(objeto).encode())
+    return sha.hexdigest()
+
+
+class FabricaGraficos:
+    """
+    Constrói figuras Plotly uma única vez por conteúdo de dados.
+
+    As figuras ficam num cache LRU compartilhado, com chave (nome do
+    gráfico, hash dos dados e dos parâmetros); sessões que mostram os
+    mesmos dados reutilizam o mesmo objeto Figure, que não deve ser
+    alterado depois de construído. Tudo o que `construir` usa além dos
+    dados (centro, zoom, ...) deve ir em `parametros`.
+    Para cada gráfico registra quanto custou construir e serializar.
+    """
+
+    def __init__(self, max_itens=128):
+        self._cache = CacheLRU(max_itens=max_itens, ttl=float('inf'))
+        self._trava = threading.Lock()
+        self._tempos = {}
+
+    def obter(self, nome, dados, construir, parametros=None):
+        """
+        Figura do gráfico `nome` para `dados` e `parametros`, construída
+        com `construir()` se preciso.
+        """
+        with self._trava:
+            self._tempos.setdefault(nome, {
+                'construcoes': 0, 'usos': 0, 'construcao_ms': 0.0, 'serializacao_ms': 0.0,
+            })['usos'] += 1
+        return self._cache.obter((nome, hash_dados(dados, parametros)), lambda: self._construir(nome, construir))
+
+    def _construir(self, nome, construir):
+        inicio = time.perf_counter()
+        figura = construir()
+        construida = time.perf_counter()
+        # Mesmo caminho usado pelo st.plotly_chart para enviar a figura
+        pio.to_json(figura.to_dict(), validate=False)
+        serializada = time.perf_counter()
+
+        with self._trava:
+            tempos = self._tempos[nome]
+            tempos['construcoes'] += 1
+            tempos['construcao_ms'] = (construida - inicio) * 1000
+            tempos['serializacao_ms'] = (serializada - construida) * 1000
+        return figura
+
+    def tempos(self):
+        """Custo da última construção de cada gráfico, em milissegundos."""
+        with self._trava:
+            return pd.DataFrame.from_dict(self._tempos, orient='index')
+
+    def estatisticas(self):
+        return self._cache.estatisticas()
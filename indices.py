@@ -0,0 +1,287 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Valores que aparecem em pelo menos 1/32 das linhas viram bitmap; os demais
+# ficam como lista ordenada de linhas (mesma ideia dos "Roaring bitmaps").
+# Assim a memória do índice fica limitada a poucos bytes por linha.
+fracao_bitmap = 32
+
+
+def _para_bitmap(linhas, n):
+    """Converte posições de linhas em um bitset compactado (1 bit por linha)."""
+    mascara = np.zeros(n, dtype=bool)
+    mascara[linhas] = True
+    return np.packbits(mascara, bitorder='little')
+
+
+def _testar_bits(bitmap, linhas):
+    """Retorna quais das `linhas` estão marcadas no bitmap."""
+    return ((bitmap[linhas >> 3] >> (linhas & 7).astype(np.uint8)) & 1).astype(bool)
+
+
+def _intersectar(curta, longa):
+    """Interseção de duas listas ordenadas: busca binária da curta na longa."""
+    if not len(curta) or not len(longa):
+        return curta[:0]
+    posicoes = np.searchsorted(longa, curta)
+    posicoes[posicoes == len(longa)] = 0
+    return curta[longa[posicoes] == curta]
+
+
+def _juntar(linhas, novas):
+    """Insere posições novas (ordenadas, sem repetir) numa lista ordenada."""
+    return np.insert(linhas, np.searchsorted(linhas, novas), novas)
+
+
+def _grupos(codigos, valores, linhas):
+    """Divide `linhas` pelo código de cada uma: {valor: linhas ordenadas}."""
+    ordem = np.argsort(codigos, kind='stable')
+    contagens = np.bincount(codigos[codigos >= 0], minlength=len(valores))
+    inicio = np.searchsorted(codigos[ordem], 0)
+    grupos = {}
+    for valor, contagem in zip(valores, contagens):
+        grupos[valor] = linhas[ordem[inicio:inicio + contagem]]
+        inicio += contagem
+    return grupos
+
+
+class IndiceFiltros:
+    """
+    Índice invertido para os filtros da Página Principal.
+
+    Para cada coluna categórica guarda, por valor, um bitmap de linhas
+    (valores frequentes) ou a lista ordenada de linhas (valores raros).
+    Para a avaliação guarda as notas ordenadas, de modo que "nota >= x"
+    é resolvido com uma busca binária. Uma combinação de filtros é
+    resolvida intersectando esses conjuntos, sem copiar o DataFrame.
+    """
+
+    def __init__(self, df, colunas, coluna_nota='Aggregate rating'):
+        self.n = len(df)
+        self.colunas = list(colunas)
+        self.coluna_nota = coluna_nota
+        self._bitmaps = {}
+        self._listas = {}
+
+        for coluna in self.colunas:
+            codigos, valores = pd.factorize(df[coluna])
+            self._classificar(coluna, _grupos(codigos, valores, np.arange(self.n)))
+
+        # Notas ordenadas (NaN ficam no fim e nunca passam no filtro)
+        self._notas = df[coluna_nota].to_numpy(dtype=float)
+        self._ordem_notas = np.argsort(self._notas, kind='stable')
+        self._notas_ordenadas = self._notas[self._ordem_notas]
+        self._n_notas_validas = int(np.count_nonzero(~np.isnan(self._notas)))
+        self._bitmaps_notas = {}
+
+    def _classificar(self, coluna, conjuntos):
+        """Guarda cada conjunto de linhas como bitmap (frequente) ou lista."""
+        bitmaps, listas = {}, {}
+        for valor, linhas in conjuntos.items():
+            if not len(linhas):
+                continue
+            if len(linhas) * fracao_bitmap >= self.n:
+                bitmaps[valor] = _para_bitmap(linhas, self.n)
+            else:
+                listas[valor] = linhas
+        self._bitmaps[coluna] = bitmaps
+        self._listas[coluna] = listas
+
+    def atualizar(self, df, alteracao):
+        """
+        Índice do `df` resultante de um delta (ver ingestao.Alteracao): as
+        linhas mantidas só são renumeradas e apenas as linhas adicionadas
+        são classificadas, sem refatorar nem reordenar a base inteira.
+        """
+        novo = copy.copy(self)
+        novo.n = len(df)
+        novo._bitmaps, novo._listas = {}, {}
+        adicionadas = alteracao.adicionadas
+
+        for coluna in self.colunas:
+            conjuntos = {valor: alteracao.remapear(linhas) for valor, linhas in self._listas[coluna].items()}
+            for valor, bitmap in self._bitmaps[coluna].items():
+                linhas = np.flatnonzero(np.unpackbits(bitmap, count=self.n, bitorder='little'))
+                conjuntos[valor] = alteracao.remapear(linhas)
+            codigos, valores = pd.factorize(df[coluna].iloc[adicionadas])
+            for valor, novas in _grupos(codigos, valores, adicionadas).items():
+                conjuntos[valor] = _juntar(conjuntos.get(valor, np.empty(0, dtype=np.int64)), novas)
+            novo._classificar(coluna, conjuntos)
+
+        # Notas: tira as removidas da ordem e encaixa as novas por busca binária
+        mantidas = ~alteracao.removidas[self._ordem_notas]
+        ordem_notas = alteracao.posicao_nova[self._ordem_notas[mantidas]]
+        notas_ordenadas = self._notas_ordenadas[mantidas]
+        novo._notas = df[self.coluna_nota].to_numpy(dtype=float)
+        notas_novas = novo._notas[adicionadas]
+        ordem = np.argsort(notas_novas, kind='stable')
+        posicoes = np.searchsorted(notas_ordenadas, notas_novas[ordem], side='right')
+        novo._notas_ordenadas = np.insert(notas_ordenadas, posicoes, notas_novas[ordem])
+        novo._ordem_notas = np.insert(ordem_notas, posicoes, adicionadas[ordem])
+        novo._n_notas_validas = int(np.count_nonzero(~np.isnan(novo._notas)))
+        novo._bitmaps_notas = {}
+        return novo
+
+    def _bitmap_nota(self, inicio):
+        """Bitmap das linhas com nota >= notas_ordenadas[inicio] (memoizado)."""
+        if inicio not in self._bitmaps_notas:
+            linhas = self._ordem_notas[inicio:self._n_notas_validas]
+            self._bitmaps_notas[inicio] = _para_bitmap(linhas, self.n)
+        return self._bitmaps_notas[inicio]
+
+    def filtrar(self, filtros, nota_minima=None, restringir_a=None):
+        """
+        Retorna as posições (ordenadas) das linhas que atendem a todos os
+        filtros de igualdade `{coluna: valor}` e a nota >= `nota_minima`.
+        `restringir_a` (posições ordenadas, ex.: de outro índice) limita o
+        resultado a essas linhas.
+        """
+        bitmaps, listas = [], []
+        if restringir_a is not None:
+            listas.append(np.asarray(restringir_a, dtype=np.int64))
+        for coluna, valor in filtros.items():
+            if valor in self._listas[coluna]:
+                listas.append(self._listas[coluna][valor])
+            elif valor in self._bitmaps[coluna]:
+                bitmaps.append(self._bitmaps[coluna][valor])
+            else:
+                return np.empty(0, dtype=np.int64)
+
+        inicio_nota = None
+        if nota_minima is not None:
+            inicio_nota = int(np.searchsorted(self._notas_ordenadas[:self._n_notas_validas], nota_minima, side='left'))
+            if inicio_nota == 0 and self._n_notas_validas == self.n:
+                inicio_nota = None  # todas as linhas passam
+
+        if listas:
+            # Partir da lista mais seletiva e testar os demais conjuntos nela
+            listas.sort(key=len)
+            linhas = listas[0]
+            for outra in listas[1:]:
+                linhas = _intersectar(linhas, outra)
+            for bitmap in bitmaps:
+                linhas = linhas[_testar_bits(bitmap, linhas)]
+            if nota_minima is not None:
+                linhas = linhas[self._notas[linhas] >= nota_minima]
+            return linhas.astype(np.int64, copy=False)
+
+        if not bitmaps:
+            if inicio_nota is None:
+                return np.arange(self.n, dtype=np.int64)
+            return np.sort(self._ordem_notas[inicio_nota:self._n_notas_validas]).astype(np.int64, copy=False)
+
+        if inicio_nota is not None:
+            bitmaps.append(self._bitmap_nota(inicio_nota))
+        resultado = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            resultado = resultado & bitmap
+        return np.flatnonzero(np.unpackbits(resultado, count=self.n, bitorder='little'))
+
+
+class IndiceCulinarias:
+    """
+    Índice invertido culinária padronizada -> linhas dos restaurantes.
+
+    Construído a partir da lista Arrow de Cuisines_Padronizadas (offsets +
+    códigos do dicionário), sem percorrer as listas em Python: as linhas
+    são ordenadas pelo código da culinária e cada culinária vira uma fatia
+    contígua e ordenada dessas linhas (a sua "posting list"). "Qualquer
+    uma" é a união das fatias e "todas" a interseção.
+    """
+
+    def __init__(self, df, coluna='Cuisines_Padronizadas'):
+        self.n = len(df)
+        listas = pa.array(df[coluna])
+        if isinstance(listas, pa.ChunkedArray):
+            listas = listas.combine_chunks()
+        valores = listas.flatten()
+        if not pa.types.is_dictionary(valores.type):
+            valores = valores.dictionary_encode()
+        # Listas nulas contam como vazias
+        tamanhos = listas.value_lengths().fill_null(0).to_numpy(zero_copy_only=False).astype(np.int64)
+        codigos = valores.indices.to_numpy(zero_copy_only=False)
+        nomes = valores.dictionary.to_pylist()
+
+        # Ordenação estável pelos códigos (inteiros curtos: radix sort), então
+        # dentro de cada culinária as linhas já saem em ordem crescente
+        ordem = np.argsort(codigos, kind='stable')
+        linhas = np.repeat(np.arange(self.n, dtype=np.int64), tamanhos)[ordem]
+        codigos = codigos[ordem].astype(np.int64)
+        # Uma culinária repetida na mesma lista não pode duplicar a linha
+        repetida = np.zeros(len(linhas), dtype=bool)
+        repetida[1:] = (codigos[1:] == codigos[:-1]) & (linhas[1:] == linhas[:-1])
+        linhas, codigos = linhas[~repetida], codigos[~repetida]
+        self._montar(nomes, linhas, np.bincount(codigos, minlength=len(nomes)))
+
+    def _montar(self, nomes, linhas, contagens):
+        """Guarda as listas (concatenadas na ordem de `nomes`) e os bitmaps."""
+        contagens = np.asarray(contagens, dtype=np.int64)
+        self._linhas = linhas
+        self._inicio = np.concatenate(([0], np.cumsum(contagens))).astype(np.int64)
+        self._codigo = {nome: i for i, nome in enumerate(nomes)}
+        self.culinarias = sorted(nome for nome, contagem in zip(nomes, contagens) if contagem)
+        # Culinárias frequentes também ganham bitmap (como no IndiceFiltros)
+        self._bitmaps = {
+            codigo: _para_bitmap(self._linhas[self._inicio[codigo]:self._inicio[codigo + 1]], self.n)
+            for codigo in np.flatnonzero(contagens * fracao_bitmap >= self.n)
+        }
+
+    def atualizar(self, df, alteracao):
+        """
+        Índice do `df` resultante de um delta: as listas existentes são
+        renumeradas e só as culinárias das linhas adicionadas são lidas.
+        """
+        adicionadas = alteracao.adicionadas
+        delta = IndiceCulinarias(df.iloc[adicionadas])
+        nomes = list(dict.fromkeys(list(self._codigo) + list(delta._codigo)))
+        listas = [
+            _juntar(alteracao.remapear(self.linhas(nome)), adicionadas[delta.linhas(nome)])
+            for nome in nomes
+        ]
+        novo = copy.copy(self)
+        novo.n = len(df)
+        novo._montar(nomes, np.concatenate(listas) if listas else np.empty(0, dtype=np.int64), [len(lista) for lista in listas])
+        return novo
+
+    def linhas(self, culinaria):
+        """Posições (ordenadas) dos restaurantes que servem a culinária."""
+        codigo = self._codigo.get(culinaria)
+        if codigo is None:
+            return np.empty(0, dtype=np.int64)
+        return self._linhas[self._inicio[codigo]:self._inicio[codigo + 1]]
+
+    def filtrar(self, culinarias, todas=False):
+        """
+        Posições (ordenadas) dos restaurantes que servem qualquer uma das
+        `culinarias` ou, com `todas=True`, todas elas.
+        """
+        nomes = sorted(set(culinarias), key=lambda nome: len(self.linhas(nome)))
+        listas = [self.linhas(nome) for nome in nomes]
+        if not listas:
+            return np.arange(self.n, dtype=np.int64)
+        if todas:
+            # Partir da lista mais curta; a interseção só diminui
+            resultado = listas[0]
+            for nome, outra in zip(nomes[1:], listas[1:]):
+                if not len(resultado):
+                    break
+                bitmap = self._bitmaps.get(self._codigo[nome])
+                if bitmap is not None:
+                    resultado = resultado[_testar_bits(bitmap, resultado)]
+                else:
+                    resultado = _intersectar(resultado, outra)
+            return resultado
+        if len(listas) == 1:
+            return listas[0]
+        total = sum(len(lista) for lista in listas)
+        if total * fracao_bitmap >= self.n:
+            # Uniões grandes: marcar numa máscara sai mais barato que ordenar
+            mascara = np.zeros(self.n, dtype=bool)
+            for lista in listas:
+                mascara[lista] = True
+            return np.flatnonzero(mascara)
+        linhas = np.sort(np.concatenate(listas))
+        return linhas[np.concatenate(([True], linhas[1:] != linhas[:-1]))]
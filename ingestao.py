@@ -0,0 +1,469 @@
+"""
+Ingestão incremental do dataset a partir de arquivos de delta.
+
+Um delta é um CSV com as colunas do dataset_atualizado.csv e mais a coluna
+`Operacao`:
+- "atualizar": insere o restaurante ou substitui o que tem o mesmo
+  Restaurant ID (linha completa, como no CSV original)
+- "remover": remove o restaurante (basta o Restaurant ID)
+Se um restaurante aparece mais de uma vez no delta vale a última linha.
+
+Os deltas ficam em `pasta_deltas` e são aplicados em ordem de nome sobre o
+dataset carregado, limpando e padronizando apenas as linhas tocadas e
+atualizando os índices e o cubo sem reconstruí-los.
+
+Uso (valida os deltas e mede a aplicação sobre o dataset atual):
+    python ingestao.py deltas/2024-05-01.csv
+"""
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from agregacoes import CuboAgregado
+from busca import IndiceBusca
+from catalogo import CatalogoDimensoes
+from dados import (DatasetCompartilhado, _juntar_partes, carregar_dados, compactar_dados, fingerprint,
+                   gravar_snapshot, ler_em_blocos, ler_em_partes, ler_snapshot, limpar_dados, linhas_por_bloco,
+                   numero_processos)
+from espacial import IndiceEspacial
+from indices import IndiceCulinarias, IndiceFiltros
+from tabela import TabelaPaginada
+
+# Pasta onde o pipeline deixa os deltas diários
+pasta_deltas = 'deltas'
+
+operacoes = ('atualizar', 'remover')
+
+# Colunas com índice de filtros na Página Principal
+colunas_filtros = ['Country', 'City', 'Cuisine_Principal', 'Price Type']
+
+
+class Alteracao:
+    """
+    Como as posições mudam ao aplicar um delta.
+
+    O novo dataset é o antigo sem as linhas removidas ou atualizadas
+    (na mesma ordem) seguido das linhas gravadas pelo delta.
+    - removidas: máscara das posições antigas que saíram
+    - posicao_nova: posição nova de cada posição antiga mantida
+    - adicionadas: posições novas (ordenadas) das linhas gravadas
+    - antigas: as linhas removidas, com os valores de antes
+    """
+
+    def __init__(self, removidas, adicionadas, antigas):
+        self.removidas = removidas
+        self.posicao_nova = np.cumsum(~removidas) - 1
+        self.adicionadas = adicionadas
+        self.antigas = antigas
+
+    def remapear(self, linhas):
+        """Posições novas das `linhas` antigas que foram mantidas."""
+        return self.posicao_nova[linhas[~self.removidas[linhas]]]
+
+
+def ler_delta(caminho):
+    """Lê e valida um arquivo de delta."""
+    delta = pd.read_csv(caminho)
+    if 'Restaurant ID' not in delta or 'Operacao' not in delta:
+        raise ValueError(f"{caminho}: o delta precisa das colunas 'Restaurant ID' e 'Operacao'")
+    delta['Operacao'] = delta['Operacao'].astype(str).str.strip().str.lower()
+    invalidas = sorted(set(delta['Operacao']) - set(operacoes))
+    if invalidas:
+        raise ValueError(f"{caminho}: operações desconhecidas {invalidas} (use {', '.join(operacoes)})")
+    return delta
+
+
+def _concatenar(mantidas, novas):
+    """Junta dois datasets compactados mantendo os categóricos."""
+    if novas is None or not len(novas):
+        return mantidas.reset_index(drop=True)
+    colunas = {}
+    for coluna in mantidas.columns:
+        antiga, nova = mantidas[coluna], novas[coluna]
+        if isinstance(antiga.dtype, pd.CategoricalDtype):
+            # Categorias em ordem, como no carregamento completo
+            colunas[coluna] = union_categoricals([antiga.array, nova.astype('category').array], sort_categories=True)
+        elif pd.api.types.is_integer_dtype(antiga.dtype) and pd.api.types.is_float_dtype(nova.dtype):
+            # O CSV do delta lê inteiros como float quando há linhas de remoção
+            limites = np.iinfo(antiga.dtype)
+            if nova.notna().all() and (nova % 1 == 0).all() and nova.between(limites.min, limites.max).all():
+                nova = nova.astype(antiga.dtype)
+            colunas[coluna] = pd.concat([antiga, nova], ignore_index=True).array
+        else:
+            colunas[coluna] = pd.concat([antiga, nova], ignore_index=True).array
+    return pd.DataFrame(colunas)
+
+
+def aplicar_delta(df, delta):
+    """
+    Aplica o `delta` (ver ler_delta) ao dataset compactado `df`.
+
+    Só as linhas gravadas pelo delta passam por limpar_dados e
+    compactar_dados. Retorna o novo dataset, a Alteracao de posições e
+    as contagens de inseridos, atualizados e removidos.
+    """
+    delta = delta.drop_duplicates('Restaurant ID', keep='last')
+    posicoes = pd.Index(df['Restaurant ID']).get_indexer(delta['Restaurant ID'])
+    gravar = (delta['Operacao'] == 'atualizar').to_numpy()
+
+    removidas = np.zeros(len(df), dtype=bool)
+    removidas[posicoes[posicoes >= 0]] = True
+
+    novas = None
+    if gravar.any():
+        faltando = [coluna for coluna in colunas_brutas(df) if coluna not in delta]
+        if faltando:
+            raise ValueError(f"o delta não tem as colunas {faltando} para as linhas a atualizar")
+        brutas = delta.loc[gravar, colunas_brutas(df)].reset_index(drop=True)
+        novas = compactar_dados(limpar_dados(brutas))
+
+    mantidas = df.iloc[np.flatnonzero(~removidas)]
+    df_novo = _concatenar(mantidas, novas)
+    alteracao = Alteracao(
+        removidas,
+        np.arange(len(mantidas), len(df_novo), dtype=np.int64),
+        df.iloc[np.flatnonzero(removidas)],
+    )
+    contagens = {
+        'inseridos': int((gravar & (posicoes < 0)).sum()),
+        'atualizados': int((gravar & (posicoes >= 0)).sum()),
+        'removidos': int((~gravar & (posicoes >= 0)).sum()),
+        'ignorados': int((~gravar & (posicoes < 0)).sum()),
+    }
+    return df_novo, alteracao, contagens
+
+
+def colunas_brutas(df):
+    """Colunas do CSV original (as derivadas são recalculadas na limpeza)."""
+    derivadas = {'Cuisines_Padronizadas', 'Cuisine_Principal', 'Total_Cuisines'}
+    return [coluna for coluna in df.columns if coluna not in derivadas]
+
+
+def deltas_pendentes(pasta=pasta_deltas, aplicados=()):
+    """Arquivos de delta da pasta ainda não aplicados, em ordem de nome."""
+    if not os.path.isdir(pasta):
+        return []
+    nomes = sorted(nome for nome in os.listdir(pasta) if nome.endswith('.csv'))
+    return [os.path.join(pasta, nome) for nome in nomes if nome not in aplicados]
+
+
+class BaseDados:
+    """
+    Dataset limpo e tudo que é derivado dele, numa mesma versão.
+
+    Somente leitura: aplicar um delta devolve uma nova BaseDados (com
+    versão + 1) e a antiga continua válida para quem ainda a usa.
+    """
+
+    # Tudo em memória (ver particionado.BaseParticionada para o outro modo)
+    fora_da_memoria = False
+    # Sem modo aproximado: o cubo em memória já responde qualquer seleção
+    cubo_aproximado = None
+
+    def __init__(self, df, indice_filtros, indice_culinarias, indice_busca, indice_espacial, cubo, catalogo,
+                 versao=1, deltas=()):
+        self.dataset = DatasetCompartilhado(df)
+        self.indice_filtros = indice_filtros
+        self.indice_culinarias = indice_culinarias
+        self.indice_busca = indice_busca
+        self.indice_espacial = indice_espacial
+        self.cubo = cubo
+        self.catalogo = catalogo
+        # Os postos de ordenação da tabela são calculados sob demanda
+        self.tabela = TabelaPaginada(df)
+        self.versao = versao
+        self.deltas = tuple(deltas)
+
+    @classmethod
+    def construir(cls, df, versao=1):
+        cubo = CuboAgregado(df)
+        return cls(
+            df,
+            IndiceFiltros(df, colunas_filtros),
+            IndiceCulinarias(df),
+            IndiceBusca(df),
+            IndiceEspacial(df),
+            cubo,
+            CatalogoDimensoes.construir(df, cubo),
+            versao=versao,
+        )
+
+    @property
+    def df(self):
+        return self.dataset.df
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def valores(self, coluna, filtros=None):
+        """
+        Valores distintos (ordenados) da coluna nas linhas dos `filtros`;
+        na lista de culinárias servidas, as culinárias.
+        """
+        if coluna == 'Cuisines_Padronizadas':
+            return list(self.indice_culinarias.culinarias)
+        if self.catalogo.responde(coluna, filtros):
+            return self.catalogo.valores(coluna, filtros)
+        serie = self.df[coluna]
+        if filtros:
+            serie = serie.iloc[self.indice_filtros.filtrar(filtros)]
+        return sorted(serie.unique().tolist())
+
+    def resumo(self):
+        """Países, cidades, restaurantes, culinárias principais e nota média do dataset."""
+        return self.catalogo.resumo()
+
+    def aplicar_delta(self, delta, nome=None):
+        """Nova BaseDados com o delta aplicado e as contagens da operação."""
+        antigo = self.dataset.df
+        df, alteracao, contagens = aplicar_delta(antigo, delta)
+        adicionadas = df.iloc[alteracao.adicionadas]
+        cubo = self.cubo.atualizar(alteracao.antigas, adicionadas)
+        base = BaseDados(
+            df,
+            self.indice_filtros.atualizar(df, alteracao),
+            self.indice_culinarias.atualizar(df, alteracao),
+            self.indice_busca.atualizar(df, alteracao),
+            self.indice_espacial.atualizar(df, alteracao),
+            cubo,
+            self.catalogo.atualizar(cubo, alteracao.antigas, adicionadas),
+            versao=self.versao + 1,
+            deltas=self.deltas + ((nome,) if nome else ()),
+        )
+        return base, contagens
+
+    def aplicar_pendentes(self, pasta=pasta_deltas):
+        """Aplica, em ordem, os deltas da pasta que ainda não foram aplicados."""
+        base, resumo = self, []
+        for caminho in deltas_pendentes(pasta, self.deltas):
+            inicio = time.perf_counter()
+            base, contagens = base.aplicar_delta(ler_delta(caminho), nome=os.path.basename(caminho))
+            resumo.append({'arquivo': os.path.basename(caminho), **contagens,
+                           'segundos': time.perf_counter() - inicio})
+        return base, resumo
+
+
+class BaseCompartilhada:
+    """
+    Referência à BaseDados atual, compartilhada entre as sessões.
+
+    Cada rerun lê `atual` uma vez e usa essa versão do começo ao fim; a
+    troca por uma versão nova é uma única atribuição. Com `iniciar_monitor`
+    uma thread em segundo plano acompanha o CSV e a pasta de deltas e
+    prepara a versão nova fora das requisições: ninguém espera a recarga
+    e, se ela falhar (ex: CSV pela metade), a versão atual continua no ar.
+    """
+
+    def __init__(self, base, caminho=None, pasta=pasta_deltas, origem=None):
+        self._base = base
+        self._trava = threading.Lock()
+        self._trava_verificacao = threading.Lock()
+        self.caminho = caminho
+        self.pasta = pasta
+        # Fingerprint do CSV de que a base foi construída
+        self._origem = origem or (fingerprint(caminho) if caminho else None)
+        self._parar = threading.Event()
+        self._monitor = None
+        self.ultima_verificacao = None
+        self.ultimo_erro = None
+
+    @classmethod
+    def carregar(cls, caminho, pasta=pasta_deltas):
+        """Carrega o CSV (via snapshot Parquet) e aplica os deltas pendentes."""
+        # Fingerprint tirado antes da leitura: se o CSV mudar durante a
+        # carga, a primeira verificação do monitor recarrega
+        origem = fingerprint(caminho)
+        base, _ = BaseDados.construir(carregar_dados(caminho)).aplicar_pendentes(pasta)
+        return cls(base, caminho, pasta, origem)
+
+    @property
+    def atual(self):
+        return self._base
+
+    def aplicar_pendentes(self, pasta=None):
+        # Uma aplicação de cada vez; os leitores nunca esperam
+        with self._trava:
+            base, resumo = self._base.aplicar_pendentes(pasta or self.pasta)
+            self._base = base
+        return resumo
+
+    def verificar(self):
+        """
+        Recarrega tudo se o conteúdo do CSV mudou; senão só aplica os deltas
+        novos. A versão continua crescendo, então as chaves de cache da
+        versão anterior nunca são reaproveitadas. Retorna o resumo dos
+        deltas aplicados.
+        """
+        # Uma verificação de cada vez; a trava da base só é tomada para trocar
+        # a versão, então quem aplica deltas não espera a recarga do CSV
+        with self._trava_verificacao:
+            self.ultima_verificacao = time.time()
+            resumo = []
+            if self.caminho:
+                origem = fingerprint(self.caminho, self._origem)
+                if origem['sha256'] != self._origem['sha256']:
+                    nova = BaseDados.construir(carregar_dados(self.caminho))
+                    with self._trava:
+                        # Deltas aplicados durante a montagem também entram na versão nova
+                        nova.versao = self._base.versao + 1
+                        self._base, resumo = nova.aplicar_pendentes(self.pasta)
+                        self._origem = origem
+                    resumo.insert(0, {'arquivo': os.path.basename(self.caminho), 'recarga': True})
+                else:
+                    self._origem = origem
+            with self._trava:
+                if deltas_pendentes(self.pasta, self._base.deltas):
+                    self._base, aplicados = self._base.aplicar_pendentes(self.pasta)
+                    resumo += aplicados
+            self.ultimo_erro = None
+        return resumo
+
+    def _monitorar(self, intervalo):
+        while not self._parar.wait(intervalo):
+            try:
+                self.verificar()
+            except Exception as erro:
+                # Arquivo incompleto ou inválido: tenta de novo no próximo ciclo
+                self.ultimo_erro = f"{type(erro).__name__}: {erro}"
+
+    def iniciar_monitor(self, intervalo=10.0):
+        """Verifica o CSV e a pasta de deltas a cada `intervalo` segundos em uma thread."""
+        if self._monitor is None or not self._monitor.is_alive():
+            self._parar.clear()
+            self._monitor = threading.Thread(target=self._monitorar, args=(intervalo,),
+                                             name='monitor-base', daemon=True)
+            self._monitor.start()
+
+    def parar_monitor(self):
+        self._parar.set()
+        if self._monitor is not None:
+            self._monitor.join()
+
+
+class CargaProgressiva:
+    """
+    Carga inicial da base em uma thread, com resultados parciais.
+
+    Sem snapshot Parquet válido o CSV é lido e limpo em blocos (ver
+    ler_em_blocos) ou, com mais de um processo (ver numero_processos),
+    nas partes da leitura em paralelo, na ordem do arquivo (ver
+    ler_em_partes). A cada bloco o cubo parcial soma só as linhas novas e
+    `parcial` passa a ter as métricas gerais das linhas já lidas, a
+    primeira página da tabela e o progresso da leitura: o app mostra isso
+    enquanto a carga continua, então a primeira tela depende do tamanho do
+    bloco e não do dataset. No fim a BaseDados completa é montada (com os
+    deltas pendentes) e fica em `compartilhada`. Com snapshot não há
+    leitura em blocos nem parcial: a base fica pronta em pouco tempo.
+    """
+
+    def __init__(self, caminho, pasta=pasta_deltas, linhas_bloco=linhas_por_bloco, linhas_pagina=50, processos=None):
+        self.caminho = caminho
+        self.pasta = pasta
+        self.linhas_bloco = linhas_bloco
+        self.processos = processos
+        self.linhas_pagina = linhas_pagina
+        # Trocado por inteiro a cada bloco: quem lê vê sempre um estado completo
+        self.parcial = None
+        self.compartilhada = None
+        self.erro = None
+        # Definido depois de tentar o snapshot: `em_blocos` diz se o CSV é lido em blocos
+        self.em_blocos = False
+        self._decidida = threading.Event()
+        self._pronta = threading.Event()
+        self._thread = None
+
+    @property
+    def pronta(self):
+        return self._pronta.is_set()
+
+    def iniciar(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._carregar, name='carga-base', daemon=True)
+            self._thread.start()
+        return self
+
+    def aguardar(self, timeout=None):
+        """BaseCompartilhada completa, esperando o fim da carga (o erro da carga é repassado)."""
+        self.iniciar()
+        self._pronta.wait(timeout)
+        if self.erro is not None:
+            raise self.erro
+        return self.compartilhada
+
+    def em_andamento(self, espera=1.0):
+        """
+        True se vale mostrar o parcial: a carga lê o CSV em blocos e não
+        terminou em `espera` segundos. Com snapshot devolve False assim que
+        ele é lido (montar os índices leva pouco tempo).
+        """
+        self.iniciar()
+        self._decidida.wait()
+        if not self.em_blocos:
+            return False
+        return not self._pronta.wait(espera)
+
+    def _carregar(self):
+        try:
+            df, origem = ler_snapshot(self.caminho)
+            self.em_blocos = df is None
+            self._decidida.set()
+            if df is None:
+                df = compactar_dados(self._ler_em_blocos())
+                gravar_snapshot(self.caminho, df, origem)
+            self.parcial = {**(self.parcial or {}), 'etapa': 'indices'}
+            base, _ = BaseDados.construir(df).aplicar_pendentes(self.pasta)
+            self.compartilhada = BaseCompartilhada(base, self.caminho, self.pasta, origem)
+        except Exception as erro:
+            self.erro = erro
+        finally:
+            self._decidida.set()
+            self._pronta.set()
+
+    def _ler_em_blocos(self):
+        tamanho = os.path.getsize(self.caminho)
+        partes, cubo, precos = [], None, pd.Series(dtype='int64')
+        for bloco, posicao in self._blocos():
+            partes.append(bloco)
+            cubo = CuboAgregado(bloco) if cubo is None else cubo.atualizar(bloco.iloc[:0], bloco)
+            precos = precos.add(bloco['Price Type'].value_counts(), fill_value=0)
+            self.parcial = {
+                'etapa': 'leitura',
+                'resumo': CatalogoDimensoes(cubo.celulas, precos).resumo(),
+                'pagina': partes[0].head(self.linhas_pagina),
+                'progresso': min(posicao / tamanho, 1.0) if tamanho else 1.0,
+            }
+        return _juntar_partes(partes)
+
+    def _blocos(self):
+        """Blocos limpos na ordem do arquivo, com a posição (em bytes) já lida."""
+        processos = numero_processos(self.caminho, self.processos)
+        if processos > 1:
+            yield from ler_em_partes(self.caminho, processos)
+            return
+        with open(self.caminho, 'rb') as arquivo:
+            for bloco in ler_em_blocos(arquivo, self.linhas_bloco):
+                yield bloco, arquivo.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('deltas', nargs='+', help='arquivos de delta, aplicados na ordem dada')
+    parser.add_argument('--dataset', default='dataset_atualizado.csv')
+    args = parser.parse_args()
+
+    base = BaseDados.construir(carregar_dados(args.dataset))
+    print(f"Base carregada: {len(base.dataset)} restaurantes")
+    for caminho in args.deltas:
+        inicio = time.perf_counter()
+        base, contagens = base.aplicar_delta(ler_delta(caminho), nome=os.path.basename(caminho))
+        print(f"{caminho}: {contagens} em {time.perf_counter() - inicio:.3f}s "
+              f"-> {len(base.dataset)} restaurantes")
+
+
+if __name__ == '__main__':
+    main()
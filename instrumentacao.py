@@ -0,0 +1,121 @@
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Um registro JSON por rerun; configure este logger para exportar as métricas
+logger = logging.getLogger('rango_serpa.perfil')
+
+# O tracemalloc é do processo inteiro: fica ligado enquanto algum rerun
+# mede memória e só é desligado por quem o ligou, quando o último termina
+_trava_tracemalloc = threading.Lock()
+_medicoes_memoria = 0
+_iniciou_tracemalloc = False
+
+
+def _iniciar_tracemalloc():
+    global _medicoes_memoria, _iniciou_tracemalloc
+    with _trava_tracemalloc:
+        if _medicoes_memoria == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _iniciou_tracemalloc = True
+        _medicoes_memoria += 1
+
+
+def _parar_tracemalloc():
+    global _medicoes_memoria, _iniciou_tracemalloc
+    with _trava_tracemalloc:
+        _medicoes_memoria -= 1
+        if _medicoes_memoria == 0 and _iniciou_tracemalloc:
+            tracemalloc.stop()
+            _iniciou_tracemalloc = False
+
+
+class PerfilRerun:
+    """
+    Mede as etapas de um rerun (carga, filtro, agregação, gráficos, ...).
+
+    Cada etapa registra o tempo em milissegundos, as linhas processadas
+    (quando informadas) e, com `medir_memoria=True`, a memória alocada
+    segundo o tracemalloc. As etapas não devem ser aninhadas. Chame
+    `finalizar` uma vez, mesmo se o rerun for interrompido (try/finally):
+    é ele que libera o tracemalloc. Com reruns simultâneos medindo memória,
+    a alocação de uma etapa inclui a das outras sessões no mesmo intervalo.
+    """
+
+    def __init__(self, pagina, medir_memoria=False):
+        self.pagina = pagina
+        self.etapas = []
+        self.medir_memoria = medir_memoria
+        self._finalizado = False
+        if medir_memoria:
+            _iniciar_tracemalloc()
+        self._inicio = time.perf_counter()
+
+    @contextmanager
+    def etapa(self, nome, linhas=None):
+        if self.medir_memoria:
+            memoria_antes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        registro = {'etapa': nome, 'ms': None, 'linhas': linhas}
+        inicio = time.perf_counter()
+        try:
+            # Quem mede pode preencher registro['linhas'] depois de processar
+            yield registro
+        finally:
+            registro['ms'] = (time.perf_counter() - inicio) * 1000
+            if self.medir_memoria:
+                registro['alocado_bytes'] = max(tracemalloc.get_traced_memory()[1] - memoria_antes, 0)
+            self.etapas.append(registro)
+
+    def finalizar(self):
+        """Fecha o rerun, grava o registro no log e o devolve."""
+        if self.medir_memoria and not self._finalizado:
+            _parar_tracemalloc()
+        self._finalizado = True
+        registro = {
+            'pagina': self.pagina,
+            'inicio': time.time() - (time.perf_counter() - self._inicio),
+            'total_ms': (time.perf_counter() - self._inicio) * 1000,
+            'etapas': self.etapas,
+        }
+        logger.info(json.dumps(registro, ensure_ascii=False))
+        return registro
+
+    def tabela(self):
+        return pd.DataFrame(self.etapas)
+
+
+class HistoricoPerfis:
+    """Últimos registros de rerun do processo, para resumo por etapa."""
+
+    def __init__(self, max_registros=500):
+        self._registros = deque(maxlen=max_registros)
+        self._trava = threading.Lock()
+
+    def adicionar(self, registro):
+        with self._trava:
+            self._registros.append(registro)
+
+    def resumo(self):
+        """Quantidade, média e percentis do tempo de cada etapa."""
+        with self._trava:
+            linhas = [
+                {'pagina': registro['pagina'], **etapa}
+                for registro in self._registros
+                for etapa in registro['etapas']
+            ]
+        if not linhas:
+            return pd.DataFrame()
+        tempos = pd.DataFrame(linhas).groupby(['pagina', 'etapa'])['ms']
+        return pd.DataFrame({
+            'reruns': tempos.size(),
+            'media_ms': tempos.mean(),
+            'p50_ms': tempos.quantile(0.5),
+            'p95_ms': tempos.quantile(0.95),
+        })
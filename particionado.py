@@ -0,0 +1,470 @@
+"""
+Modo fora da memória para datasets maiores que a RAM de uma réplica.
+
+O CSV é lido em lotes, limpo com as mesmas regras de dados.py e gravado
+como Parquet particionado por país (uma pasta Country=... por país). Em
+cada lote as linhas são ordenadas por cidade, tipo de preço e nota, então
+as estatísticas (mínimo e máximo) de cada row group ficam estreitas. As
+consultas leem só as pastas dos países pedidos, só os row groups cujas
+estatísticas podem atender os filtros de cidade, preço e nota e só as
+colunas usadas:
+- Página Principal: métricas e páginas da tabela calculadas em um
+  percurso pelos lotes, sem guardar o resultado inteiro
+- Países e Cidades: o cubo de agregados é somado lote a lote, apenas
+  com os países selecionados; no modo aproximado (opcional) as páginas
+  respondem pela amostra estratificada gravada junto, sem ler os lotes
+
+O modo em memória continua o padrão. O particionado é usado quando o CSV
+passa de `limite_memoria_mb` ou quando a variável de ambiente
+RANGO_MODO_DADOS é "particionado" ("memoria" força o modo em memória).
+A busca textual, o mapa e os deltas dependem dos índices em memória e
+ficam indisponíveis nesse modo.
+
+Uso (grava o armazenamento e mostra quantos row groups cada filtro lê):
+    python particionado.py --dataset dataset_atualizado.csv
+"""
+import argparse
+import functools
+import operator
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from agregacoes import CuboAgregado, dimensoes, medidas
+from aproximado import AmostraEstratificada, CuboAproximado, arquivo_estratos
+from cache_resultados import CacheLRU
+from catalogo import CatalogoDimensoes
+from dados import _escrever_json, _ler_metadados, fingerprint, hash_regras, limpar_dados, pasta_cache
+
+# Pasta do armazenamento particionado (dentro do cache em disco)
+pasta_particionada = os.path.join(pasta_cache, 'particionado')
+
+# Variável de ambiente que escolhe o modo: "memoria", "particionado" ou "auto"
+variavel_modo = 'RANGO_MODO_DADOS'
+
+# No modo "auto", CSVs maiores que isto usam o armazenamento particionado
+limite_memoria_mb = 1024
+
+# Linhas lidas do CSV por vez ao gravar e linhas por row group
+linhas_por_lote = 250_000
+linhas_por_grupo = 64 * 1024
+
+# Ordem das linhas dentro de cada lote gravado
+ordem_gravacao = ['City', 'Price Type', 'Aggregate rating']
+
+coluna_nota = 'Aggregate rating'
+coluna_culinarias = 'Cuisines_Padronizadas'
+
+particionamento = ds.partitioning(pa.schema([('Country', pa.string())]), flavor='hive')
+
+
+def modo_dados(caminho):
+    """'memoria' ou 'particionado' para o CSV em `caminho`."""
+    modo = os.environ.get(variavel_modo, 'auto').strip().lower()
+    if modo in ('memoria', 'particionado'):
+        return modo
+    try:
+        tamanho_mb = os.path.getsize(caminho) / 2 ** 20
+    except OSError:
+        return 'memoria'
+    return 'particionado' if tamanho_mb > limite_memoria_mb else 'memoria'
+
+
+def _esquema(esquema):
+    """Esquema fixo do armazenamento a partir do primeiro lote limpo."""
+    campos = []
+    for campo in esquema:
+        tipo = campo.type
+        if pa.types.is_large_string(tipo) or pa.types.is_null(tipo):
+            tipo = pa.string()
+        campos.append(pa.field(campo.name, tipo))
+    return pa.schema(campos)
+
+
+def gravar_particionado(caminho, pasta=pasta_particionada, linhas_lote=linhas_por_lote):
+    """
+    Lê o CSV em lotes de `linhas_lote` linhas, limpa cada lote e grava o
+    Parquet particionado por país em `pasta`, com a amostra estratificada
+    do modo aproximado (ver aproximado.py). A pasta é montada ao lado e
+    trocada no fim, então quem lê nunca vê um armazenamento pela metade.
+    Retorna a quantidade de linhas gravadas.
+    """
+    origem = fingerprint(caminho)
+    temporaria = f"{pasta}.{os.getpid()}.tmp"
+    shutil.rmtree(temporaria, ignore_errors=True)
+    os.makedirs(temporaria)
+
+    esquema, total = None, 0
+    amostra = AmostraEstratificada()
+    try:
+        for numero, bruto in enumerate(pd.read_csv(caminho, chunksize=linhas_lote)):
+            limpo = limpar_dados(bruto).sort_values(['Country'] + ordem_gravacao, kind='stable')
+            amostra.adicionar(limpo)
+            if esquema is None:
+                esquema = _esquema(pa.Schema.from_pandas(limpo, preserve_index=False)).remove_metadata()
+            tabela = pa.Table.from_pandas(limpo, schema=esquema, preserve_index=False)
+            ds.write_dataset(
+                tabela, temporaria, format='parquet', partitioning=particionamento,
+                basename_template=f'lote-{numero:05d}-{{i}}.parquet',
+                existing_data_behavior='overwrite_or_ignore',
+                max_rows_per_group=linhas_por_grupo, min_rows_per_group=min(linhas_por_grupo, linhas_lote),
+            )
+            total += len(tabela)
+        amostra.gravar(temporaria)
+        _escrever_json(os.path.join(temporaria, '_metadados.json'),
+                       {**origem, 'regras': hash_regras(), 'linhas': total})
+
+        antiga = f"{pasta}.{os.getpid()}.antiga"
+        if os.path.exists(pasta):
+            os.replace(pasta, antiga)
+        os.replace(temporaria, pasta)
+        shutil.rmtree(antiga, ignore_errors=True)
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+    return total
+
+
+def expressao_filtros(filtros=None, nota_minima=None, paises=None):
+    """
+    Expressão Arrow dos filtros: igualdade `{coluna: valor}`, nota >=
+    `nota_minima` (notas nulas não passam) e país entre os `paises`.
+    """
+    condicoes = [pc.field(coluna) == valor for coluna, valor in (filtros or {}).items()]
+    if paises:
+        condicoes.append(pc.field('Country').isin(list(paises)))
+    if nota_minima is not None:
+        condicoes.append(pc.field(coluna_nota) >= float(nota_minima))
+    return functools.reduce(operator.and_, condicoes) if condicoes else None
+
+
+def _mascara_culinarias(listas, culinarias, todas=False):
+    """Linhas do lote que servem qualquer uma (ou todas) das `culinarias`."""
+    if isinstance(listas, pa.ChunkedArray):
+        listas = listas.combine_chunks()
+    valores = pc.list_flatten(listas)
+    pais = pc.list_parent_indices(listas).to_numpy()
+    mascaras = [
+        np.bincount(pais[pc.equal(valores, nome).fill_null(False).to_numpy(zero_copy_only=False)],
+                    minlength=len(listas)) > 0
+        for nome in set(culinarias)
+    ]
+    return np.logical_and.reduce(mascaras) if todas else np.logical_or.reduce(mascaras)
+
+
+class ArmazemParticionado:
+    """
+    Leitura do Parquet particionado com poda de pastas, row groups e
+    colunas.
+
+    Os fragmentos (um por arquivo) e as estatísticas dos row groups são
+    lidos uma vez; cada consulta escolhe as pastas dos países pela
+    expressão de partição e, dentro delas, só os row groups cujas
+    estatísticas podem atender a expressão.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self.arquivos = ds.dataset(pasta, format='parquet', partitioning=particionamento)
+        self._fragmentos = {}
+        for fragmento in self.arquivos.get_fragments():
+            fragmento.ensure_complete_metadata()
+            self._fragmentos[fragmento.path] = fragmento
+        self.grupos_total = sum(fragmento.num_row_groups for fragmento in self._fragmentos.values())
+
+    def paises(self):
+        """Países com pasta no armazenamento (sem ler nenhum arquivo)."""
+        return sorted({
+            ds.get_partition_keys(fragmento.partition_expression)['Country']
+            for fragmento in self._fragmentos.values()
+        })
+
+    def grupos(self, expressao=None):
+        """Row groups que uma consulta com a `expressao` precisa ler, em ordem."""
+        caminhos = sorted(fragmento.path for fragmento in self.arquivos.get_fragments(filter=expressao))
+        grupos = []
+        for caminho in caminhos:
+            fragmento = self._fragmentos[caminho]
+            grupos.extend(fragmento.split_by_row_group(expressao, schema=self.arquivos.schema))
+        return grupos
+
+    def lotes(self, colunas, expressao=None, culinarias=(), todas=False):
+        """
+        RecordBatches com as `colunas` das linhas que atendem a `expressao`
+        e, se houver, ao filtro de culinárias servidas; sempre na mesma
+        ordem (arquivo e row group).
+        """
+        colunas = list(dict.fromkeys(colunas))
+        lidas = colunas + [coluna_culinarias] if culinarias and coluna_culinarias not in colunas else colunas
+        for grupo in self.grupos(expressao):
+            for lote in grupo.to_batches(schema=self.arquivos.schema, columns=lidas, filter=expressao,
+                                           use_threads=False):
+                if culinarias and len(lote):
+                    lote = lote.filter(pa.array(_mascara_culinarias(lote.column(coluna_culinarias), culinarias, todas)))
+                    if lidas is not colunas:
+                        lote = lote.select(colunas)
+                if len(lote):
+                    yield lote
+
+
+class SelecaoParticionada:
+    """
+    Resultado de um filtro no modo particionado: a expressão e o filtro de
+    culinárias (reaplicados ao ler cada página) e o total de linhas.
+    """
+
+    def __init__(self, expressao, culinarias=(), todas=False, total=0):
+        self.expressao = expressao
+        self.culinarias = tuple(culinarias)
+        self.todas = todas
+        self.total = total
+
+    def __len__(self):
+        return self.total
+
+
+class TabelaParticionada:
+    """
+    Tabela paginada lida do armazenamento. Sem ordenação, a leitura para
+    assim que a página é preenchida; com ordenação, só as `numero *
+    tamanho` primeiras linhas ficam em memória enquanto os lotes passam.
+    Empates e a ordem sem ordenação seguem a ordem do armazenamento.
+    """
+
+    def __init__(self, armazem):
+        self.armazem = armazem
+
+    def pagina(self, selecao, colunas, numero=1, tamanho=50, ordenar_por=None, crescente=True):
+        """Mesma página de TabelaPaginada.pagina, para uma SelecaoParticionada."""
+        inicio = (numero - 1) * tamanho
+        fim = min(inicio + tamanho, len(selecao))
+        lidas = list(colunas) + ([ordenar_por] if ordenar_por is not None else [])
+        lotes = self.armazem.lotes(lidas, selecao.expressao, selecao.culinarias, selecao.todas)
+
+        partes = []
+        if inicio < fim and ordenar_por is None:
+            vistas = 0
+            for lote in lotes:
+                if vistas + len(lote) > inicio:
+                    partes.append(lote.slice(max(inicio - vistas, 0), fim - max(inicio, vistas)))
+                vistas += len(lote)
+                if vistas >= fim:
+                    break
+        elif inicio < fim:
+            # Nulos no fim; a ordenação é estável e quem já estava à frente
+            # ganha os empates, como na ordem do armazenamento
+            ordem = [(ordenar_por, 'ascending' if crescente else 'descending')]
+            primeiras = None
+            for lote in lotes:
+                juntas = pa.Table.from_batches([lote])
+                if primeiras is not None:
+                    juntas = pa.concat_tables([primeiras, juntas])
+                if len(juntas) > fim:
+                    juntas = juntas.take(pc.sort_indices(juntas, sort_keys=ordem)[:fim])
+                primeiras = juntas
+            if primeiras is not None:
+                primeiras = primeiras.take(pc.sort_indices(primeiras, sort_keys=ordem))
+                partes = primeiras.slice(inicio, fim - inicio).to_batches()
+
+        if partes:
+            pagina = pa.Table.from_batches(partes).to_pandas()
+        else:
+            pagina = pd.DataFrame(columns=list(colunas))
+        pagina.index = pd.RangeIndex(inicio, inicio + len(pagina))
+        return pagina[list(colunas)]
+
+
+class CuboParticionado:
+    """
+    Mesma interface do CuboAgregado, com o cubo de cada seleção de países
+    somado lote a lote a partir das pastas desses países. Os cubos das
+    últimas seleções ficam guardados (Países e Cidades usam a mesma).
+    """
+
+    def __init__(self, armazem, max_selecoes=16):
+        self.armazem = armazem
+        self._cubos = CacheLRU(max_itens=max_selecoes, ttl=600)
+
+    def _cubo(self, paises):
+        chave = tuple(sorted(paises)) if paises else ()
+        colunas = dimensoes + list(medidas.values())
+
+        def somar():
+            lotes = self.armazem.lotes(colunas, expressao_filtros(paises=chave))
+            return CuboAgregado.de_lotes(lote.to_pandas() for lote in lotes)
+
+        return self._cubos.obter(chave, somar)
+
+    def selecionar(self, paises=None):
+        return self._cubo(paises).selecionar(paises)
+
+    def totais(self, paises=None):
+        return self._cubo(paises).totais(paises)
+
+    def por_pais(self, paises=None):
+        return self._cubo(paises).por_pais(paises)
+
+    def por_cidade(self, paises=None):
+        return self._cubo(paises).por_cidade(paises)
+
+    def por_culinaria(self, paises=None):
+        return self._cubo(paises).por_culinaria(paises)
+
+
+class BaseParticionada:
+    """
+    Base do modo fora da memória, com a interface usada pelas páginas
+    Principal, Países e Cidades (valores dos filtros, métricas gerais,
+    consulta da Página Principal, tabela e cubo).
+    """
+
+    fora_da_memoria = True
+
+    def __init__(self, pasta=pasta_particionada, versao=1):
+        self.pasta = pasta
+        self.versao = versao
+        self.deltas = ()
+        self.armazem = ArmazemParticionado(pasta)
+        self.tabela = TabelaParticionada(self.armazem)
+        self.cubo = CuboParticionado(self.armazem)
+        # Sem ler o armazenamento, com margem de erro (None se gravado sem amostra)
+        self.cubo_aproximado = CuboAproximado.abrir(pasta)
+        self.linhas = (_ler_metadados(os.path.join(pasta, '_metadados.json')) or {}).get('linhas')
+        if self.linhas is None:
+            self.linhas = self.armazem.arquivos.count_rows()
+        self._valores = {}
+        self._catalogo = None
+        self._trava = threading.Lock()
+
+    @classmethod
+    def carregar(cls, caminho, pasta=pasta_particionada):
+        """
+        Abre o armazenamento do CSV, regravando-o se o conteúdo do CSV ou
+        as regras de limpeza mudaram desde a última gravação.
+        """
+        metadados = _ler_metadados(os.path.join(pasta, '_metadados.json'))
+        origem = fingerprint(caminho, metadados)
+        if (not metadados or metadados.get('sha256') != origem['sha256'] or metadados.get('regras') != hash_regras()
+                or not os.path.exists(os.path.join(pasta, arquivo_estratos))):
+            gravar_particionado(caminho, pasta)
+        return cls(pasta)
+
+    def __len__(self):
+        return self.linhas
+
+    @property
+    def catalogo(self):
+        """Catálogo das dimensões, montado no primeiro uso a partir do cubo de todos os países."""
+        with self._trava:
+            if self._catalogo is None:
+                precos = {}
+                for lote in self.armazem.lotes(['Price Type']):
+                    for contagem in pc.value_counts(lote.column(0)).to_pylist():
+                        if contagem['values'] is not None:
+                            precos[contagem['values']] = precos.get(contagem['values'], 0) + contagem['counts']
+                self._catalogo = CatalogoDimensoes(self.cubo.selecionar(), pd.Series(precos, dtype='int64'))
+            return self._catalogo
+
+    def valores(self, coluna, filtros=None):
+        """
+        Valores distintos (ordenados) da coluna nas linhas dos `filtros`;
+        na lista de culinárias servidas, as culinárias.
+        """
+        if self.catalogo.responde(coluna, filtros):
+            return self.catalogo.valores(coluna, filtros)
+        chave = (coluna, tuple(sorted((filtros or {}).items())))
+        with self._trava:
+            if chave not in self._valores:
+                distintos = set()
+                for lote in self.armazem.lotes([coluna], expressao_filtros(filtros)):
+                    valores = lote.column(0)
+                    if pa.types.is_list(valores.type):
+                        valores = pc.list_flatten(valores)
+                    distintos.update(pc.unique(valores).drop_null().to_pylist())
+                self._valores[chave] = sorted(distintos)
+            return list(self._valores[chave])
+
+    def resumo(self):
+        """Países, cidades, restaurantes, culinárias principais e nota média do dataset."""
+        return self.catalogo.resumo()
+
+    @staticmethod
+    def _estatisticas(lotes):
+        cidades, culinarias = set(), set()
+        total, soma_notas, n_notas = 0, 0.0, 0
+        for lote in lotes:
+            total += len(lote)
+            cidades.update(pc.unique(lote.column('City')).drop_null().to_pylist())
+            culinarias.update(pc.unique(lote.column('Cuisine_Principal')).drop_null().to_pylist())
+            notas = lote.column(coluna_nota)
+            soma_notas += pc.sum(notas).as_py() or 0.0
+            n_notas += len(notas) - notas.null_count
+        return {
+            'total': total,
+            'cidades': len(cidades),
+            'culinarias': len(culinarias),
+            'nota_media': soma_notas / n_notas if n_notas else np.nan,
+        }
+
+    def consultar_principal(self, filtros, nota_minima=0.0, culinarias=(), todas_culinarias=False, termos=()):
+        """Mesmo resultado de consultas.consultar_principal, calculado em um percurso pelos lotes."""
+        if termos:
+            raise ValueError("a busca textual não está disponível no modo particionado")
+        selecao = SelecaoParticionada(expressao_filtros(filtros, nota_minima), culinarias, todas_culinarias)
+        estatisticas = self._estatisticas(self.armazem.lotes(
+            ['City', 'Cuisine_Principal', coluna_nota], selecao.expressao, selecao.culinarias, selecao.todas))
+        selecao.total = estatisticas['total']
+        return {
+            'linhas': selecao,
+            'cidades': estatisticas['cidades'],
+            'culinarias': estatisticas['culinarias'],
+            'nota_media': estatisticas['nota_media'],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', default='dataset_atualizado.csv')
+    parser.add_argument('--pasta', default=pasta_particionada)
+    parser.add_argument('--linhas-lote', type=int, default=linhas_por_lote)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    total = gravar_particionado(args.dataset, args.pasta, args.linhas_lote)
+    print(f"{total} restaurantes gravados em {args.pasta} em {time.perf_counter() - inicio:.2f}s")
+
+    base = BaseParticionada(args.pasta)
+    # O país com mais row groups mostra melhor a poda por cidade, preço e nota
+    pais = max(base.armazem.paises(), key=lambda nome: len(base.armazem.grupos(expressao_filtros({'Country': nome}))))
+    cidade = base.valores('City', {'Country': pais})[0]
+    exemplos = {
+        'sem filtros': {},
+        f'Country={pais}': {'Country': pais},
+        f'Country={pais}, City={cidade}': {'Country': pais, 'City': cidade},
+        f'Country={pais}, Price Type=gourmet': {'Country': pais, 'Price Type': 'gourmet'},
+        'nota >= 4.5': {'nota_minima': 4.5},
+    }
+    print(f"Row groups no armazenamento: {base.armazem.grupos_total}")
+    for nome, filtros in exemplos.items():
+        nota_minima = filtros.pop('nota_minima', None)
+        expressao = expressao_filtros(filtros, nota_minima)
+        inicio = time.perf_counter()
+        resultado = base.consultar_principal(filtros, nota_minima)
+        print(f"  {nome:<40} {len(base.armazem.grupos(expressao)):>5} row groups lidos, "
+              f"{len(resultado['linhas']):>9} restaurantes em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    # Países e Cidades com todos os países: cubo exato (sem cache) x amostra estratificada
+    for nome, cubo in (('exato', CuboParticionado(base.armazem)), ('aproximado', base.cubo_aproximado)):
+        inicio = time.perf_counter()
+        cubo.por_pais(), cubo.por_cidade(), cubo.por_culinaria()
+        print(f"  Países e Cidades, todos os países ({nome}): {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
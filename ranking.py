@@ -0,0 +1,47 @@
+"""
+Rankings (top-k e bottom-k) sem ordenar a série inteira.
+
+Os gráficos de ranking mostram poucas barras de séries com uma linha por
+cidade. Em vez de ordenar tudo e cortar com head, `topo` faz uma seleção
+parcial (np.partition, O(n)) e ordena só as escolhidas e os empates com
+a última delas. O desempate é configurável e sempre determinístico.
+"""
+import numpy as np
+
+# 'indice': empates pela ordem do índice (nome da cidade)
+# 'ordem': empates pela posição na série
+desempates = ('indice', 'ordem')
+
+
+def tamanho_ranking(total, opcoes):
+    """Maior dos tamanhos em `opcoes` que cabe em `total` (ou `total`, se nenhum couber)."""
+    return next((k for k in sorted(opcoes, reverse=True) if total >= k), total)
+
+
+def topo(serie, k, crescente=False, desempate='indice'):
+    """
+    As `k` primeiras posições da série: os maiores valores (os menores com
+    `crescente`), do primeiro ao último, sem os nulos.
+    """
+    if desempate not in desempates:
+        raise ValueError(f"desempate deve ser um de {desempates}: {desempate!r}")
+    serie = serie.dropna()
+    k = min(k, len(serie))
+    if k <= 0:
+        return serie.iloc[:0]
+
+    valores = serie.to_numpy(dtype=np.float64)
+    chave = valores if crescente else -valores
+    if k < len(serie):
+        # Todos os empatados com a k-ésima entram na disputa do desempate
+        limite = np.partition(chave, k - 1)[k - 1]
+        candidatas = np.flatnonzero(chave <= limite)
+    else:
+        candidatas = np.arange(len(serie))
+
+    if desempate == 'indice':
+        segunda = serie.index[candidatas].argsort().argsort()
+    else:
+        segunda = candidatas
+    ordem = candidatas[np.lexsort((segunda, chave[candidatas]))[:k]]
+    return serie.iloc[ordem]
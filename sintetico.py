@@ -0,0 +1,95 @@
+"""
+Gerador de dataset sintético no formato do dataset_atualizado.csv.
+
+Cada restaurante sintético parte de uma linha real sorteada (mesmo país,
+moeda, faixa de preço, avaliação, votos, ...) e recebe um novo ID, uma
+cidade, uma combinação de culinárias e coordenadas próprias. Conforme o
+tamanho cresce surgem novas cidades em cada país e novas combinações de
+culinárias, como numa base real maior. Valores "sujos" do dataset real
+(cidades corrompidas, Cuisines vazias) continuam aparecendo.
+
+Uso:
+    python sintetico.py --linhas 1000000 --saida sintetico_1m.csv
+"""
+import argparse
+import csv
+
+import numpy as np
+import pandas as pd
+
+
+def _zipf(rng, tamanho, quantidade, expoente=1.1):
+    """Sorteia `quantidade` posições em [0, tamanho) com popularidade tipo Zipf."""
+    pesos = 1.0 / np.arange(1, tamanho + 1) ** expoente
+    return rng.choice(tamanho, size=quantidade, p=pesos / pesos.sum())
+
+
+def _combinacoes_culinarias(rng, base, quantidade):
+    """Gera `quantidade` strings de Cuisines com tokens e tamanhos como os reais."""
+    cuisines = base['Cuisines'].dropna()
+    tokens = cuisines.str.split(',').explode().str.strip()
+    frequencia = tokens.value_counts(normalize=True)
+    tamanhos = cuisines.str.count(',').add(1).value_counts(normalize=True)
+
+    n_tokens = rng.choice(tamanhos.index.to_numpy(), size=quantidade, p=tamanhos.to_numpy())
+    sorteados = rng.choice(frequencia.index.to_numpy(dtype=object), size=int(n_tokens.sum()), p=frequencia.to_numpy())
+    inicio = np.cumsum(n_tokens) - n_tokens
+    return np.array(
+        [', '.join(dict.fromkeys(sorteados[i:i + n])) for i, n in zip(inicio, n_tokens)],
+        dtype=object
+    )
+
+
+def gerar_dataset(linhas, seed=42, caminho_base='dataset_atualizado.csv'):
+    """Retorna um DataFrame bruto (antes da limpeza) com `linhas` restaurantes."""
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(caminho_base)
+
+    # Linhas reais usadas como modelo (mantém a distribuição por país)
+    df = base.iloc[rng.integers(0, len(base), linhas)].reset_index(drop=True)
+    df['Restaurant ID'] = rng.permutation(linhas) + 1
+
+    # Cidades: as reais do país e, com mais linhas, uma cauda de cidades novas
+    cidades_extras = int(np.sqrt(linhas) / 10)
+    if cidades_extras:
+        cidades_reais = base.groupby('Country')['City'].nunique()
+        fracao_nova = cidades_extras / (cidades_extras + df['Country'].map(cidades_reais).to_numpy())
+        nova = rng.random(linhas) < fracao_nova
+        numero = _zipf(rng, cidades_extras, int(nova.sum())) + 1
+        df.loc[nova, 'City'] = df.loc[nova, 'Country'].to_numpy(dtype=object) + ' City ' + numero.astype(str).astype(object)
+
+    # Culinárias: combinações (que crescem com o tamanho) com popularidade Zipf
+    quantidade_combinacoes = max(2_000, linhas // 200)
+    combinacoes = _combinacoes_culinarias(rng, base, quantidade_combinacoes)
+    cuisines = combinacoes[_zipf(rng, quantidade_combinacoes, linhas)]
+    vazias = df['Cuisines'].isna().to_numpy()
+    df['Cuisines'] = np.where(vazias, None, cuisines)
+
+    # Coordenadas próximas às do restaurante modelo
+    df['Longitude'] = df['Longitude'] + rng.normal(0, 0.02, linhas)
+    df['Latitude'] = df['Latitude'] + rng.normal(0, 0.02, linhas)
+
+    return df
+
+
+def salvar_csv(df, caminho):
+    """
+    Grava o dataset sintético em CSV. Todos os textos vão entre aspas: o
+    dataset real tem endereços com quebra de linha (\\r) que o to_csv padrão
+    não protege.
+    """
+    df.to_csv(caminho, index=False, quoting=csv.QUOTE_NONNUMERIC)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, required=True)
+    parser.add_argument('--saida', required=True)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    salvar_csv(gerar_dataset(args.linhas, seed=args.seed), args.saida)
+
+
+if __name__ == '__main__':
+    main()
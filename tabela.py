@@ -0,0 +1,58 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class TabelaPaginada:
+    """
+    Tabela de restaurantes ordenada e paginada no servidor.
+
+    Para cada coluna de ordenação guarda (sob demanda) a posição de cada
+    linha na ordem global da coluna. Ordenar um resultado filtrado vira
+    comparar inteiros, e só as linhas da página pedida são ordenadas por
+    completo e copiadas do DataFrame.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._postos = {}
+        self._trava = threading.Lock()
+
+    def _posto(self, coluna, crescente):
+        """Posição de cada linha na ordem da coluna (nulos sempre no fim)."""
+        chave = (coluna, crescente)
+        with self._trava:
+            if chave not in self._postos:
+                # Códigos na ordem dos valores; empates mantêm a ordem original
+                codigos, valores = pd.factorize(self.df[coluna], sort=True)
+                if not crescente:
+                    codigos = np.where(codigos >= 0, len(valores) - 1 - codigos, codigos)
+                codigos = np.where(codigos >= 0, codigos, len(valores))
+                ordem = np.lexsort((np.arange(len(codigos)), codigos))
+                postos = np.empty(len(ordem), dtype=np.int64)
+                postos[ordem] = np.arange(len(ordem))
+                self._postos[chave] = postos
+            return self._postos[chave]
+
+    def pagina(self, linhas, colunas, numero=1, tamanho=50, ordenar_por=None, crescente=True):
+        """
+        Retorna a página `numero` (começando em 1) das `linhas`, apenas com
+        as `colunas` pedidas, ordenada por `ordenar_por` se informado.
+        """
+        inicio = (numero - 1) * tamanho
+        fim = min(inicio + tamanho, len(linhas))
+        if inicio >= fim:
+            selecionadas = linhas[:0]
+        elif ordenar_por is None:
+            selecionadas = linhas[inicio:fim]
+        else:
+            postos = self._posto(ordenar_por, crescente)[linhas]
+            # Separa as `fim` primeiras sem ordenar o resto, depois ordena só essas
+            if fim < len(postos):
+                primeiras = np.argpartition(postos, fim - 1)[:fim]
+            else:
+                primeiras = np.arange(len(postos))
+            primeiras = primeiras[np.argsort(postos[primeiras])]
+            selecionadas = linhas[primeiras[inicio:fim]]
+        return self.df.iloc[selecionadas, self.df.columns.get_indexer(colunas)]
@@ -0,0 +1,353 @@
+"""
+Teste de carga do dashboard com sessões simultâneas.
+
+Sobe um servidor `streamlit run Streamlit_project.py` (ou usa um já no ar
+com --url) e abre N sessões pelo mesmo websocket que o navegador usa:
+cada sessão guarda o valor dos widgets como o frontend e, a cada
+interação, envia o estado de todos eles e espera o fim do rerun. As
+sessões seguem roteiros de uso sorteados: trocar de página, escolher
+país, arrastar o slider de avaliação (um rerun por passo), "Limpar
+Filtros" e escolher países nas páginas Países e Cidades.
+
+Para cada nível de concorrência mostra a latência dos reruns (p50, p95,
+p99), a vazão em reruns por segundo e a memória do processo do servidor.
+
+Uso:
+    python teste_carga.py
+    python teste_carga.py --sessoes 1 4 16 --interacoes 30 --saida carga.json
+    python teste_carga.py --url ws://localhost:8501 --pid 12345
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.NumberInput_pb2 import NumberInput
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from websockets.sync.client import connect
+
+script_app = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Streamlit_project.py')
+
+# Widgets usados pelo app (os demais elementos não guardam estado)
+tipos_widget = ('selectbox', 'multiselect', 'slider', 'radio', 'text_input', 'number_input', 'button')
+
+
+def memoria_processo_mb(pid):
+    """Memória residente (RSS) do processo em MB, ou None fora do Linux."""
+    try:
+        with open(f'/proc/{pid}/status', encoding='ascii') as arquivo:
+            for linha in arquivo:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _estado_inicial(tipo, proto):
+    """WidgetState que o frontend enviaria para o widget recém-desenhado."""
+    estado = WidgetState(id=proto.id)
+    if tipo in ('selectbox', 'radio'):
+        if proto.HasField('raw_value'):
+            estado.string_value = proto.raw_value
+        elif proto.HasField('default') and proto.options:
+            estado.string_value = proto.options[proto.default]
+    elif tipo == 'multiselect':
+        valores = proto.raw_values if proto.set_value else [proto.options[i] for i in proto.default]
+        estado.string_array_value.data[:] = list(valores)
+    elif tipo == 'slider':
+        estado.double_array_value.data[:] = list(proto.value if proto.set_value else proto.default)
+    elif tipo == 'text_input':
+        estado.string_value = proto.value if proto.HasField('value') else proto.default
+    elif tipo == 'number_input':
+        valor = proto.value if proto.HasField('value') else proto.default
+        if proto.data_type == NumberInput.INT:
+            estado.int_value = int(valor)
+        else:
+            estado.double_value = valor
+    elif tipo == 'button':
+        estado.trigger_value = False
+    return estado
+
+
+class SessaoNavegador:
+    """
+    Uma sessão do dashboard falando o protocolo do navegador: abre o
+    websocket, pede reruns com o estado dos widgets e lê as mensagens até
+    o fim do script.
+    """
+
+    def __init__(self, conexao, timeout=300):
+        self.conexao = conexao
+        self.timeout = timeout
+        self.widgets = {}
+        self.estados = {}
+        self.erro = None
+
+    def rerun(self, gatilho=None):
+        """Pede um rerun; `gatilho` é o id de um botão clicado. Devolve os segundos."""
+        mensagem = BackMsg()
+        mensagem.rerun_script.query_string = ''
+        for id_widget, estado in self.estados.items():
+            enviado = mensagem.rerun_script.widget_states.widgets.add()
+            enviado.CopyFrom(estado)
+            if id_widget == gatilho:
+                enviado.trigger_value = True
+
+        inicio = time.perf_counter()
+        self.conexao.send(mensagem.SerializeToString())
+        widgets, self.erro = {}, None
+        while True:
+            recebida = ForwardMsg()
+            recebida.ParseFromString(self.conexao.recv(timeout=self.timeout))
+            if recebida.WhichOneof('type') == 'script_finished':
+                # st.rerun() no script: o servidor já começou outra execução
+                if recebida.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    widgets = {}
+                    continue
+                break
+            if recebida.HasField('delta') and recebida.delta.WhichOneof('type') == 'new_element':
+                elemento = recebida.delta.new_element
+                tipo = elemento.WhichOneof('type')
+                if tipo == 'exception':
+                    self.erro = f"{elemento.exception.type}: {elemento.exception.message}"
+                elif tipo in tipos_widget:
+                    widgets[getattr(elemento, tipo).id] = (tipo, getattr(elemento, tipo))
+        segundos = time.perf_counter() - inicio
+
+        # Como o frontend: mantém o valor dos widgets que continuam na tela,
+        # a não ser que o script tenha definido um valor novo
+        estados = {}
+        for id_widget, (tipo, proto) in widgets.items():
+            definido = getattr(proto, 'set_value', False)
+            if id_widget in self.estados and not definido:
+                estados[id_widget] = self.estados[id_widget]
+            else:
+                estados[id_widget] = _estado_inicial(tipo, proto)
+        self.widgets, self.estados = widgets, estados
+        return segundos
+
+    def _achar(self, tipo, rotulo=None, chave=None):
+        for id_widget, (tipo_widget, proto) in self.widgets.items():
+            if tipo_widget != tipo:
+                continue
+            # O id de um widget com key termina com a key
+            if (chave is not None and id_widget.endswith(f'-{chave}')) or (rotulo is not None and rotulo in proto.label):
+                return id_widget
+        raise LookupError(f"widget {tipo} {rotulo or chave!r} não está na tela")
+
+    def escolher(self, valor, rotulo=None, chave=None):
+        """Seleciona `valor` num selectbox (texto) ou multiselect (lista)."""
+        tipo = 'multiselect' if isinstance(valor, (list, tuple)) else 'selectbox'
+        id_widget = self._achar(tipo, rotulo, chave)
+        estado = WidgetState(id=id_widget)
+        if tipo == 'selectbox':
+            estado.string_value = valor
+        else:
+            estado.string_array_value.data[:] = list(valor)
+        self.estados[id_widget] = estado
+        return self.rerun()
+
+    def deslizar(self, valor, rotulo=None, chave=None):
+        id_widget = self._achar('slider', rotulo, chave)
+        estado = WidgetState(id=id_widget)
+        estado.double_array_value.data[:] = [valor]
+        self.estados[id_widget] = estado
+        return self.rerun()
+
+    def clicar(self, rotulo):
+        return self.rerun(gatilho=self._achar('button', rotulo=rotulo))
+
+
+@contextmanager
+def abrir_sessao(url, timeout=300):
+    """Conecta ao websocket do servidor e fecha a conexão no fim."""
+    with connect(f"{url.rstrip('/')}/_stcore/stream", subprotocols=['streamlit'],
+                 max_size=None, open_timeout=timeout) as conexao:
+        yield SessaoNavegador(conexao, timeout)
+
+
+def roteiro(rng, paises, interacoes):
+    """
+    Sequência de `interacoes` ações (nome, função que recebe a sessão e
+    devolve os segundos do rerun), montada por blocos de uso realistas.
+    """
+    def pagina(nome):
+        return f"pagina:{nome}", lambda sessao: sessao.escolher(nome, rotulo='Navegação')
+
+    def principal():
+        pais = rng.choice(paises[:10])
+        acoes = [pagina("Página Principal"), ('pais', lambda sessao: sessao.escolher(pais, chave='f_country'))]
+        # Arrastar o slider gera um rerun por valor intermediário
+        nota = 0.0
+        for _ in range(rng.randint(2, 5)):
+            nota = round(min(nota + rng.choice([0.5, 1.0]), 4.9), 1)
+            acoes.append(('slider_nota', lambda sessao, nota=nota: sessao.deslizar(nota, chave='f_min_rating')))
+        if rng.random() < 0.7:
+            acoes.append(('limpar_filtros', lambda sessao: sessao.clicar('Limpar Filtros')))
+        return acoes
+
+    def agregados(nome):
+        escolhidos = rng.sample(paises, rng.randint(1, 5))
+        return [pagina(nome), ('paises', lambda sessao: sessao.escolher(escolhidos, rotulo='Países'))]
+
+    acoes = []
+    while len(acoes) < interacoes:
+        bloco = rng.choice(['principal', 'principal', 'paises', 'cidades'])
+        acoes += principal() if bloco == 'principal' else agregados('Países' if bloco == 'paises' else 'Cidades')
+    return acoes[:interacoes]
+
+
+def executar_sessao(indice, url, paises, interacoes, seed, pausa, registros, timeout):
+    """Abre uma sessão e executa o roteiro dela, registrando cada rerun."""
+    rng = random.Random(seed * 1000 + indice)
+    with abrir_sessao(url, timeout) as sessao:
+        segundos = sessao.rerun()
+        registros.append({'sessao': indice, 'acao': 'abertura', 'ms': segundos * 1000, 'erro': sessao.erro})
+        for nome, acao in roteiro(rng, paises, interacoes):
+            if pausa:
+                time.sleep(rng.uniform(0, pausa))
+            inicio = time.perf_counter()
+            try:
+                segundos, erro = acao(sessao), sessao.erro
+            except Exception as excecao:
+                segundos, erro = time.perf_counter() - inicio, f"{type(excecao).__name__}: {excecao}"
+            registros.append({'sessao': indice, 'acao': nome, 'ms': segundos * 1000, 'erro': erro})
+
+
+def medir_nivel(sessoes, url, pid, paises, interacoes, seed, pausa, timeout):
+    """Roda `sessoes` sessões ao mesmo tempo e resume as latências."""
+    registros = []
+    threads = [
+        threading.Thread(target=executar_sessao, args=(i, url, paises, interacoes, seed, pausa, registros, timeout))
+        for i in range(sessoes)
+    ]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    tabela = pd.DataFrame(registros)
+    reruns = tabela[tabela['acao'] != 'abertura']
+    p50, p95, p99 = np.percentile(reruns['ms'], [50, 95, 99]) if len(reruns) else (np.nan,) * 3
+    return {
+        'sessoes': sessoes,
+        'reruns': len(tabela),
+        'erros': int(tabela['erro'].notna().sum()),
+        'mensagens_erro': tabela['erro'].dropna().value_counts().head(5).to_dict(),
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'p99_ms': p99,
+        'reruns_por_s': len(tabela) / duracao,
+        'memoria_mb': memoria_processo_mb(pid) if pid else None,
+        'por_acao': reruns.groupby('acao')['ms'].quantile(0.95).round(1).to_dict(),
+    }
+
+
+def _porta_livre():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def iniciar_servidor(timeout):
+    """Sobe o dashboard num processo próprio e espera o websocket aceitar conexões."""
+    porta = _porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', script_app, '--server.headless', 'true',
+         '--server.port', str(porta), '--browser.gatherUsageStats', 'false'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f'ws://127.0.0.1:{porta}'
+    limite = time.monotonic() + timeout
+    while True:
+        try:
+            with abrir_sessao(url, timeout):
+                return processo, url
+        except OSError:
+            if processo.poll() is not None or time.monotonic() > limite:
+                processo.kill()
+                raise RuntimeError("o servidor do Streamlit não subiu") from None
+            time.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessoes', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help="Níveis de concorrência (sessões simultâneas)")
+    parser.add_argument('--interacoes', type=int, default=20, help="Reruns por sessão, além da abertura")
+    parser.add_argument('--pausa', type=float, default=0.0,
+                        help="Pausa máxima (s) entre as interações de uma sessão, sorteada")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--timeout', type=float, default=300, help="Tempo máximo de um rerun (s)")
+    parser.add_argument('--url', help="Servidor já no ar (ex: ws://localhost:8501); sem ela um é iniciado")
+    parser.add_argument('--pid', type=int, help="Processo do servidor dado em --url, para medir a memória")
+    parser.add_argument('--saida', help="Grava os resultados em JSON")
+    args = parser.parse_args()
+
+    processo = None
+    url, pid = args.url, args.pid
+    if url is None:
+        processo, url = iniciar_servidor(args.timeout)
+        pid = processo.pid
+
+    try:
+        # Sessão de aquecimento: carrega a base e os caches fora da medição
+        # (reruns até os filtros aparecerem: antes disso a tela é a da carga)
+        with abrir_sessao(url, args.timeout) as aquecimento:
+            limite = time.monotonic() + args.timeout
+            while True:
+                aquecimento.rerun()
+                filtro = next((proto for tipo, proto in aquecimento.widgets.values()
+                               if tipo == 'selectbox' and proto.id.endswith('-f_country')), None)
+                if filtro is not None:
+                    break
+                if aquecimento.erro or time.monotonic() > limite:
+                    raise RuntimeError(f"o dashboard não mostrou os filtros: {aquecimento.erro or 'tempo esgotado'}")
+                time.sleep(0.5)
+            paises = list(filtro.options[1:])
+        memoria = memoria_processo_mb(pid) if pid else None
+        print(f"Aquecimento concluído; memória do servidor {memoria or 0:.0f} MB")
+
+        resultados = []
+        print(f"{'sessões':>8} {'reruns':>7} {'erros':>6} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} "
+              f"{'reruns/s':>9} {'memória (MB)':>13}")
+        for sessoes in args.sessoes:
+            resultado = medir_nivel(sessoes, url, pid, paises, args.interacoes, args.seed, args.pausa, args.timeout)
+            resultados.append(resultado)
+            print(f"{sessoes:>8} {resultado['reruns']:>7} {resultado['erros']:>6} {resultado['p50_ms']:>9.0f} "
+                  f"{resultado['p95_ms']:>9.0f} {resultado['p99_ms']:>9.0f} {resultado['reruns_por_s']:>9.2f} "
+                  f"{resultado['memoria_mb'] or 0:>13.0f}")
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+
+    for resultado in resultados:
+        for mensagem, quantidade in resultado['mensagens_erro'].items():
+            print(f"Erro com {resultado['sessoes']} sessões ({quantidade}x): {mensagem[:200]}")
+
+    print("\np95 (ms) por ação no maior nível:")
+    for acao, ms in sorted(resultados[-1]['por_acao'].items(), key=lambda item: -item[1]):
+        print(f"  {acao:<24} {ms:>9.1f}")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
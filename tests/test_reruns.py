@@ -0,0 +1,89 @@
+"""
+Memória alocada por rerun do app, rodando o Streamlit_project.py de verdade
+(streamlit.testing.v1.AppTest) sobre datasets sintéticos de dois tamanhos.
+
+Com a base compartilhada e os caches quentes, um rerun só lê a versão
+atual e os resultados já calculados: o que ele aloca não pode crescer com
+o número de linhas. Cada tamanho roda num processo próprio, porque os
+caches do Streamlit e o monitor da base valem para o processo inteiro.
+
+Uso direto (mede o diretório atual, que deve ter o dataset_atualizado.csv):
+    python tests/test_reruns.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+
+raiz = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(raiz))
+
+# Linhas dos dois datasets e quanto o maior pode alocar a mais por rerun
+linhas_pequeno = 20_000
+linhas_grande = 200_000
+tolerancia = 1.5
+# Abaixo disso a diferença é ruído (strings, protobufs, estado da sessão)
+piso_bytes = 2 * 2 ** 20
+
+paginas = ("Página Principal", "Países", "Cidades", "Mapa", "Administração")
+
+
+def medir_reruns(repeticoes=3):
+    """
+    Maior memória alocada (bytes, pico do tracemalloc) num rerun de cada
+    página com os caches quentes; o menor valor entre `repeticoes` reruns.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    from dados import carregar_dados
+
+    # Com o snapshot pronto o app não passa pela tela da carga em blocos
+    carregar_dados('dataset_atualizado.csv')
+    app = AppTest.from_file(str(raiz / 'Streamlit_project.py'), default_timeout=600)
+    app.query_params['admin'] = '1'
+    app.run()
+    assert not app.exception, app.exception
+
+    tracemalloc.start()
+    alocado = {}
+    for pagina in paginas:
+        next(caixa for caixa in app.sidebar.selectbox if caixa.label == "📱 Navegação").set_value(pagina)
+        app.run()
+        assert not app.exception, (pagina, app.exception)
+        medidas = []
+        for _ in range(repeticoes):
+            antes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            app.run()
+            medidas.append(tracemalloc.get_traced_memory()[1] - antes)
+        alocado[pagina] = min(medidas)
+    tracemalloc.stop()
+    return alocado
+
+
+def _medir_em_processo(pasta, linhas):
+    from sintetico import gerar_dataset, salvar_csv
+
+    pasta.mkdir()
+    salvar_csv(gerar_dataset(linhas, caminho_base=raiz / 'dataset_atualizado.csv'), pasta / 'dataset_atualizado.csv')
+    os.symlink(raiz / 'img', pasta / 'img')
+    processo = subprocess.run([sys.executable, __file__], cwd=pasta, capture_output=True, text=True, timeout=1800)
+    assert processo.returncode == 0, processo.stderr[-2000:]
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def test_alocacao_por_rerun_nao_cresce_com_o_dataset(tmp_path):
+    pequeno = _medir_em_processo(tmp_path / 'pequeno', linhas_pequeno)
+    grande = _medir_em_processo(tmp_path / 'grande', linhas_grande)
+    for pagina in paginas:
+        limite = tolerancia * max(pequeno[pagina], piso_bytes)
+        assert grande[pagina] <= limite, (
+            f"{pagina}: {grande[pagina]:,} bytes por rerun com {linhas_grande:,} linhas, "
+            f"{pequeno[pagina]:,} com {linhas_pequeno:,}"
+        )
+
+
+if __name__ == '__main__':
+    print(json.dumps(medir_reruns(), ensure_ascii=False))